@@ -0,0 +1,355 @@
+"""
+Local JSON API over the shipments snapshot.
+
+Serves the dashboard's numbers to other tools:
+
+    GET /api/kpis                         the KPI row
+    GET /api/files                        one summary per File Number
+    GET /api/shipments/<Unique ID>/trucks one shipment's truck table
+
+/api/kpis and /api/files take the dashboard's filters as query parameters: `client` and
+`file_number` (repeatable), `start` / `end` (submission dates, YYYY-MM-DD) and `as_of`
+(price demurrage as it stood at the end of that day). Dates are ISO strings and costs are
+plain numbers.
+
+Inside the Streamlit app (set `api_port` in secrets) it serves the process-wide snapshot
+the sessions read; on its own it loads one from MongoDB (or a saved snapshot file):
+
+    python api_server.py --mongo-uri mongodb://... --port 8502
+    python api_server.py --snapshot data/shipments.arrow
+"""
+import argparse
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+import pandas as pd
+from filter_index import FilterIndex
+from seamaster_core import MemoryCache, PricingCache, compute_demurrage, file_summaries, kpi_summary, truck_rows, truck_table_columns
+
+logger = logging.getLogger(__name__)
+
+# --- Conditional responses ---
+# Each response body is cached per snapshot, day (open stays accrue daily) and request, and
+# its ETag is a hash of the body. A refresh that leaves the numbers unchanged therefore keeps
+# the ETag, and a polling client that sends If-None-Match (or If-Modified-Since) gets a 304
+# without anything being recomputed. Last-Modified is when the body last changed: the load
+# time of the snapshot it first came from, or midnight if only the day moved on.
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _json_ready(value):
+    """`value` with dates as ISO strings, numpy scalars as Python numbers and NaN / NaT as None."""
+    if isinstance(value, dict):
+        return {str(k): _json_ready(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_ready(v) for v in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat() if pd.notna(value) else None
+    if isinstance(value, float) and value != value:
+        return None
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)  # ObjectId and the like
+
+
+def _parse_day(query, name):
+    values = query.get(name)
+    if not values:
+        return None
+    try:
+        return date.fromisoformat(values[-1])
+    except ValueError:
+        raise ApiError(400, f"'{name}' must be a date (YYYY-MM-DD)")
+
+
+def _http_date(moment):
+    # Snapshot times are naive local times
+    return format_datetime(moment.astimezone(timezone.utc).replace(microsecond=0), usegmt=True)
+
+
+class ShipmentApi:
+    """Answers API requests from the snapshot of a SnapshotStore, with cached bodies and ETags."""
+
+    def __init__(self, store=None, cache_size=256):
+        self.store = store
+        self.pricing = PricingCache("API truck pricing")
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._indexed = None  # (snapshot, FilterIndex, {Unique ID: row})
+        self.bodies = MemoryCache("API bodies", max_entries=cache_size)  # (snapshot key, day, request) -> (etag, body)
+        self._changed = OrderedDict()  # request -> (etag, last modified)
+        self.not_modified = 0
+
+    def attach(self, store):
+        """Serves `store` from now on (the app switches between the live and the offline store)."""
+        self.store = store
+
+    def _index(self, snapshot):
+        indexed = self._indexed
+        if indexed is None or indexed[0] is not snapshot:
+            filters = FilterIndex(snapshot.df, name="API filters")
+            rows = {}
+            frame = filters.frame
+            if "Unique ID" in frame.columns:
+                # The latest submission wins for a collection not yet moved to versions
+                if "Date Submitted" in frame.columns:
+                    order = frame["Date Submitted"].to_numpy().argsort(kind="stable")
+                else:
+                    order = range(len(frame))
+                unique_ids = frame["Unique ID"].astype(str).to_numpy()
+                for position in order:
+                    rows[unique_ids[position]] = position
+            indexed = (snapshot, filters, rows)
+            self._indexed = indexed
+        return indexed[1], indexed[2]
+
+    # --- Resources ---
+
+    def _selection(self, filters, query, today):
+        """The dashboard's filters from the query string, as FilterIndex arguments and an as-of day."""
+        date_range = None
+        start, end = _parse_day(query, "start"), _parse_day(query, "end")
+        bounds = filters.date_bounds()
+        if (start or end) and bounds is not None:
+            start, end = start or bounds[0], end or bounds[1]
+            date_range = (datetime.combine(start, datetime.min.time()), datetime.combine(end, datetime.max.time()))
+
+        as_of = _parse_day(query, "as_of")
+        if as_of is not None and as_of > today:
+            raise ApiError(400, "'as_of' cannot be in the future")
+        until = datetime.combine(as_of, datetime.max.time()) if as_of is not None and as_of < today else None
+
+        # Query values are strings; match them to the stored values (File Numbers may be numbers)
+        selected = {}
+        for column, name in (("Client", "client"), ("File Number", "file_number")):
+            wanted = set(query.get(name, []))
+            selected[column] = tuple(value for value in filters.options(column) if str(value) in wanted)
+            if wanted and not selected[column]:
+                selected[column] = (None,)  # None of the requested values exist: match nothing
+        return date_range, until, selected["Client"], selected["File Number"], as_of if until else None
+
+    def _priced(self, filters, query, today):
+        date_range, until, clients, file_numbers, as_of = self._selection(filters, query, today)
+        shipments = filters.select(date_range, until, clients, file_numbers)
+        if shipments.empty:
+            return shipments, [], None
+        priced, totals = compute_demurrage(shipments, as_of=as_of, cache=self.pricing)
+        return shipments, priced, totals
+
+    def kpis(self, snapshot, query, today):
+        filters, _ = self._index(snapshot)
+        shipments, _, totals = self._priced(filters, query, today)
+        return kpi_summary(shipments, totals)
+
+    def files(self, snapshot, query, today):
+        filters, _ = self._index(snapshot)
+        _, priced, _ = self._priced(filters, query, today)
+        return file_summaries(priced)
+
+    def trucks(self, snapshot, unique_id, today):
+        filters, rows = self._index(snapshot)
+        if unique_id not in rows:
+            raise ApiError(404, f"No shipment with Unique ID {unique_id}")
+        shipment = filters.frame.iloc[[rows[unique_id]]]
+        [priced], _ = compute_demurrage(shipment, cache=self.pricing)
+        trucks = priced.get("Trucks") if isinstance(priced.get("Trucks"), list) else []
+        _, columns = truck_table_columns(trucks)
+        return {
+            "unique_id": unique_id,
+            "file_number": priced.get("File Number"),
+            "client": priced.get("Client"),
+            "transporter": priced.get("Transporter"),
+            "columns": columns,
+            "active": truck_rows([t for t in trucks if not t.get("Cancel")], columns),
+            "cancelled": truck_rows([t for t in trucks if t.get("Cancel")], columns),
+        }
+
+    def _body(self, snapshot, path, query, today):
+        if path == "/api/kpis":
+            payload = self.kpis(snapshot, query, today)
+        elif path == "/api/files":
+            payload = self.files(snapshot, query, today)
+        elif path.startswith("/api/shipments/") and path.endswith("/trucks"):
+            payload = self.trucks(snapshot, unquote(path[len("/api/shipments/"):-len("/trucks")]), today)
+        else:
+            raise ApiError(404, f"Unknown resource {path}")
+        return json.dumps(_json_ready(payload), separators=(",", ":")).encode("utf-8")
+
+    # --- Requests ---
+
+    def _representation(self, snapshot, path, query):
+        """(etag, last modified, body) of a request, computed once per snapshot and day."""
+        today = date.today()
+        request = (path, tuple(sorted((k, tuple(v)) for k, v in query.items())))
+        key = (snapshot.version, snapshot.loaded_at, today, request)
+
+        def representation():
+            body = self._body(snapshot, path, query, today)
+            return f'"{hashlib.sha1(body).hexdigest()[:20]}"', body
+
+        etag, body = self.bodies.get_or_set(key, representation)
+
+        with self._lock:
+            previous = self._changed.get(request)
+            if previous is not None and previous[0] == etag:
+                last_modified = previous[1]
+            else:
+                midnight = datetime.combine(today, datetime.min.time())
+                last_modified = max(snapshot.loaded_at or midnight, midnight)
+                self._changed[request] = (etag, last_modified)
+            self._changed.move_to_end(request)
+            if len(self._changed) > self.cache_size:
+                self._changed.popitem(last=False)
+        return etag, last_modified, body
+
+    def handle(self, method, target, headers):
+        """Answers one request. Returns (status, headers, body)."""
+        url = urlsplit(target)
+        if method not in ("GET", "HEAD"):
+            return self._error(405, "Only GET and HEAD are supported")
+        store = self.store
+        snapshot = store.current() if store is not None else None
+        if snapshot is None or not snapshot.version:
+            return self._error(503, "No shipment data has been loaded yet")
+        try:
+            etag, last_modified, body = self._representation(snapshot, url.path.rstrip("/"), parse_qs(url.query))
+        except ApiError as e:
+            return self._error(e.status, str(e))
+        except Exception:
+            logger.exception("Failed to answer %s %s", method, target)
+            return self._error(500, "Internal error; see the server log")
+
+        response_headers = {
+            "ETag": etag,
+            "Last-Modified": _http_date(last_modified),
+            "Cache-Control": "no-cache",  # Revalidate every time; unchanged data costs a 304
+            "X-Snapshot-Version": str(snapshot.version),
+            "X-Snapshot-Read-Only": "true" if snapshot.read_only else "false",
+        }
+        if self._not_modified(headers, etag, last_modified):
+            with self._lock:
+                self.not_modified += 1
+            return 304, response_headers, b""
+        response_headers["Content-Type"] = "application/json"
+        return 200, response_headers, body
+
+    @staticmethod
+    def _not_modified(headers, etag, last_modified):
+        if_none_match = headers.get("If-None-Match")
+        if if_none_match is not None:
+            # If-None-Match wins over If-Modified-Since; weak comparison, as for a GET
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            return "*" in tags or etag in tags
+        if_modified_since = headers.get("If-Modified-Since")
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            if since.tzinfo is None:
+                since = since.replace(tzinfo=timezone.utc)
+            return last_modified.astimezone(timezone.utc).replace(microsecond=0) <= since
+        return False
+
+    @staticmethod
+    def _error(status, message):
+        body = json.dumps({"error": message}).encode("utf-8")
+        return status, {"Content-Type": "application/json", "Cache-Control": "no-store"}, body
+
+
+# --- HTTP server ---
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    api = None  # Set on the subclass made by start_server
+    protocol_version = "HTTP/1.1"  # Keep-alive, so polling clients reuse their connection
+
+    def _respond(self):
+        status, headers, body = self.api.handle(self.command, self.path, self.headers)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if self.command not in ("GET", "HEAD"):
+            # The request body is never read, so the connection cannot carry another request
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        if status != 304:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_GET(self):
+        self._respond()
+
+    def do_HEAD(self):
+        self._respond()
+
+    def do_POST(self):
+        self._respond()
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+def start_server(api, host="127.0.0.1", port=8502):
+    """Serves `api` from a daemon thread and returns the server (server_address has the bound port)."""
+    handler = type("ApiRequestHandler", (_RequestHandler,), {"api": api})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="json-api", daemon=True)
+    thread.start()
+    logger.info("JSON API listening on http://%s:%d/api/", *server.server_address[:2])
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--mongo-uri", help="MongoDB URI (a mongomock:// URI for the in-process stand-in)")
+    source.add_argument("--snapshot", help="Serve a saved snapshot file instead, read-only")
+    parser.add_argument("--database", default="seamaster")
+    parser.add_argument("--collection", default="shipments")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    parser.add_argument("--refresh-seconds", type=float, default=60)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    from snapshot import SnapshotStore
+
+    if args.snapshot:
+        from arrow_snapshot import open_snapshot
+        store = SnapshotStore(loader=None).publish(open_snapshot(args.snapshot))
+    else:
+        from data_source import connect, load_shipments
+        collection = connect(args.mongo_uri)[args.database][args.collection]
+        store = SnapshotStore(
+            loader=lambda: load_shipments(collection),
+            refresh_interval=args.refresh_seconds,
+            watch_collection=collection,
+        ).start()
+
+    server = start_server(ShipmentApi(store), args.host, args.port)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
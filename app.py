@@ -1,123 +1,240 @@
+import argparse
+import os
+import sys
 import streamlit as st
-import pandas as pd
-from datetime import datetime
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
-import pandas as pd
-import streamlit as st
-from dashboard_view import render_dashboard
-from generateId_view import render_generateID
-from pastShipments_view import render_shipments
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import perf
+
+# pandas, pymongo and PyMuPDF are imported where they are first needed (the connection
+# thread, the data load and the views), so the title and sidebar paint without them.
 
 # This should be the very first Streamlit command called.
 st.set_page_config(page_title="Seamaster Dashboard", layout="wide")
 
+# Start timing this rerun; spans from the views are collected on the same trace
+_ctx = get_script_run_ctx()
+perf.start_rerun(session_id=_ctx.session_id if _ctx else None, view=st.session_state.get("view"))
+
 # --- MongoDB Connection ---
-mongo_uri = st.secrets["mongo_uri"]
-client = MongoClient(mongo_uri)
-db = client["seamaster"]
-shipments_collection = db["shipments"]
+def _connect_and_ping(mongo_uri):
+    """Runs off the script thread: imports the driver, connects and pings. Returns (client, error)."""
+    from data_source import connect
 
-@st.cache_resource
-def init_connection():
-    """Initializes and caches the MongoDB connection."""
     try:
-        # Ensure secrets are available
-        if "mongo_uri" not in st.secrets:
-            st.error("🚫 MongoDB URI not found in Streamlit secrets.")
-            return None
-
-        # Use the connection string from secrets
-        client = MongoClient(st.secrets["mongo_uri"])
-
+        client = connect(mongo_uri)
         # It confirms that the client can connect to MongoDB.
         client.admin.command('ping')
-        st.success("✅ Connected to MongoDB!")
-        return client
-
-    except ConnectionFailure as e:
-        st.error(f"🚫 Could not connect to MongoDB: {e}")
-        st.info("Please check your MongoDB connection string and network access.")
-        return None
+        return client, None
     except Exception as e:
-        st.error(f"🚫 An unexpected error occurred during MongoDB connection: {e}")
+        return None, e
+
+@st.cache_resource
+def init_connection():
+    """Starts connecting to MongoDB in the background and caches the pending result."""
+    # Ensure secrets are available
+    if "mongo_uri" not in st.secrets:
         return None
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mongo-connect")
+    return executor.submit(_connect_and_ping, st.secrets["mongo_uri"])
+
+def wait_for_connection(pending, status):
+    """Waits for the background connection and reports the outcome in the `status` slot."""
+    from pymongo.errors import ConnectionFailure
 
-# Attempt to initialize connection immediately when the script runs
-client = init_connection()
+    if pending is None:
+        status.error("🚫 MongoDB URI not found in Streamlit secrets.")
+        return None
+    with perf.span("connect.wait"):
+        client, error = pending.result()
+    if isinstance(error, ConnectionFailure):
+        with status.container():
+            st.error(f"🚫 Could not connect to MongoDB: {error}")
+            st.info("Please check your MongoDB connection string and network access.")
+        return None
+    if error is not None:
+        status.error(f"🚫 An unexpected error occurred during MongoDB connection: {error}")
+        return None
+    status.success("✅ Connected to MongoDB!")
+    return client
 
-# Initialize database and collection variables;
-db = None
-collection = None
+@st.cache_resource
+def ensure_shipment_indexes(_collection):
+    """
+    Creates the shipments' unique Unique ID index and the version history index once per
+    process. A failure (no index rights, or duplicates that version-shipments has not moved
+    yet) is logged.
+    """
+    import logging
+    from seamaster_core import create_version_indexes
 
-if client is not None:
     try:
-        db = client.get_database("seamaster")
-        collection = db.get_collection("shipments")
-        # print(f"Collection found: {collection.name}") # For debugging
+        create_version_indexes(_collection)
+        return True
     except Exception as e:
-        st.error(f"🚫 Error accessing database or collection: {e}")
-        db = None
-        collection = None
+        logging.getLogger(__name__).warning("Could not create the shipment indexes: %s", e)
+        return False
+
+# --- Offline snapshot ---
+# Each successful load is saved as a memory-mapped Arrow file (`snapshot_path`, default
+# data/shipments.arrow). `streamlit run app.py -- --snapshot [path]` opens it without
+# contacting MongoDB; otherwise it is the fallback when the database is unreachable.
+def parse_app_args():
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--snapshot", nargs="?", const="", default=None)
+    args, _ = parser.parse_known_args(sys.argv[1:])
+    return args
+
+app_args = parse_app_args()
+snapshot_path = app_args.snapshot or st.secrets.get("snapshot_path", os.path.join("data", "shipments.arrow"))
+snapshot_only = app_args.snapshot is not None
+
+# Start connecting now; the result is collected after the title and sidebar are drawn
+pending_connection = None if snapshot_only else init_connection()
+connection_status = st.empty()
 
 # --- Data Loading from MongoDB ---
-def load_data():
-    """Loads data from the MongoDB collection into a pandas DataFrame."""
-    if collection is None:
-        return pd.DataFrame()  # Return an empty DataFrame if no connection/collection
+@st.cache_resource
+def get_snapshot_store(_collection):
+    """
+    Creates the process-wide shipments snapshot, shared by every session and refreshed
+    in the background (every `snapshot_refresh_seconds`, default 60, and on change events).
+    """
+    from arrow_snapshot import SnapshotSaver
+    from data_source import load_shipments
+    from snapshot import SnapshotStore
 
-    try:
-        # Retrieve all documents from the collection
-        items = collection.find()
-        # Convert the cursor to a list and then to a DataFrame
-        df = pd.DataFrame(list(items))
-
-        # --- Data Cleaning and Type Conversion ---
-        if not df.empty:
-            # Convert MongoDB ObjectId to string for easier handling/display
-            if '_id' in df.columns:
-                df['_id'] = df['_id'].astype(str)
-
-            # List of columns expected to contain dates/datetimes
-            date_cols = [
-                "Date Submitted", "Date", "Load Start Date", "Load End Date",
-                "ETA", "Actual arrival date", "Actual loading date",
-                "Offloading arrival", "Date offloaded"
-                ] + [col for col in df.columns if "arrival at" in col.lower() or "dispatch from" in col.lower()] # Include dynamic border columns
-
-            for col in date_cols:
-                if col in df.columns:
-                    # Convert to datetime, coercing errors (invalid dates become NaT)
-                    df[col] = pd.to_datetime(df[col], errors="coerce")
-
-            # List of columns expected to contain numeric values
-            numeric_cols = [
-                "Truck Count", "Truck Number", "Load capacity",
-                "Gross weight", "Net weight", "Standing time billable days",
-                "Standing time charges", "Whiskey in", "Whiskey out",
-                "Standing days", "Billable standing days", "Rate per Ton",
-                "Free Days at Border", "Free Days at Offloading Point", "Days on site"
-                ]
-
-            for col in numeric_cols:
-                if col in df.columns:
-                    # Convert to numeric, coercing errors (invalid values become NaN)
-                    df[col] = pd.to_numeric(df[col], errors="coerce")
-
-        return df
+    store = SnapshotStore(
+        loader=lambda: load_shipments(_collection),
+        refresh_interval=float(st.secrets.get("snapshot_refresh_seconds", 60)),
+        watch_collection=_collection,
+    ).start()
+    # Keep the offline copy current (refreshes that changed nothing are not rewritten); a
+    # failed save is logged and the app carries on
+    store.add_listener(SnapshotSaver(snapshot_path, store))
+    return store
+
+@st.cache_resource
+def get_offline_store(path):
+    """Opens the saved snapshot at `path` once per process, as a store that is never refreshed."""
+    from arrow_snapshot import open_snapshot
+    from snapshot import SnapshotStore
+
+    return SnapshotStore(loader=None).publish(open_snapshot(path))
+
+# The derived structures below are cached per read_only flag, so the live store and the
+# offline one each get their own.
+@st.cache_resource
+def get_daily_rollup(_store, read_only=False):
+    """
+    Creates the process-wide daily demurrage rollup. It is kept in step with every new
+    snapshot, re-reading only the trucks whose stays changed.
+    """
+    from seamaster_core.rollups import DailyRollup
+
+    rollup = DailyRollup()
+    _store.add_listener(lambda snapshot: rollup.sync(snapshot.df))
+    return rollup
 
+@st.cache_resource
+def get_alert_scheduler(_store, read_only=False):
+    """
+    Creates the process-wide free-days alert scheduler. Each new snapshot re-reads the
+    changed trucks and raises the alerts that came due, appending them to the outbox file
+    (`alerts_outbox`, default logs/alerts.jsonl).
+    """
+    from seamaster_core.alerts import AlertOutbox, AlertScheduler
+
+    scheduler = AlertScheduler(
+        lead_days=int(st.secrets.get("alert_lead_days", 1)),
+        # A read-only snapshot may be stale, so its alerts are shown but never sent
+        outbox=None if read_only else AlertOutbox(st.secrets.get("alerts_outbox", "logs/alerts.jsonl")),
+    )
+
+    def on_snapshot(snapshot):
+        scheduler.sync(snapshot.df)
+        scheduler.tick()
+
+    _store.add_listener(on_snapshot)
+    return scheduler
+
+@st.cache_resource
+def get_dwell_stats(_store, read_only=False):
+    """Creates the process-wide border dwell-time sketches, rebuilt per changed File Number on each snapshot."""
+    from seamaster_core.dwell import DwellStats
+
+    dwell = DwellStats()
+    _store.add_listener(lambda snapshot: dwell.sync(snapshot.df))
+    return dwell
+
+@st.cache_resource(max_entries=2)
+def get_filter_index(_df, version, read_only):
+    """Builds the sidebar filter index once per snapshot version, from the first session to need it."""
+    from filter_index import FilterIndex
+    return FilterIndex(_df)
+
+def open_store(collection):
+    """
+    The snapshot store to read from: the live one while MongoDB has served data, else the
+    saved offline snapshot (always, with --snapshot). None when neither is available.
+    """
+    if collection is not None:
+        store = get_snapshot_store(collection)
+        if store.last_error is not None:
+            st.error(f"⚠️ Error loading data from MongoDB: {store.last_error}")
+        if store.current().version:
+            return store
+    if not os.path.exists(snapshot_path):
+        if snapshot_only:
+            st.error(f"🚫 No saved snapshot found at {snapshot_path}.")
+        return None
+    try:
+        with perf.span("load_data.open_snapshot"):
+            return get_offline_store(snapshot_path)
     except Exception as e:
-        st.error(f"⚠️ Error loading data from MongoDB: {e}")
-        return pd.DataFrame()
+        st.error(f"🚫 Could not open the saved snapshot {snapshot_path}: {e}")
+        return None
 
-st.title("📦 Seamaster Shipment Dashboard")
+# --- JSON API ---
+# With `api_port` in secrets, api_server.py answers JSON requests for the KPIs, File Number
+# summaries and truck tables from this process, reading the same snapshot store as the sessions.
+@st.cache_resource
+def get_json_api():
+    """Starts the JSON API once per process, or returns None when it is not configured."""
+    if "api_port" not in st.secrets:
+        return None
+    import logging
+    from api_server import ShipmentApi, start_server
+
+    api = ShipmentApi()
+    try:
+        start_server(api, st.secrets.get("api_host", "127.0.0.1"), int(st.secrets["api_port"]))
+    except OSError as e:
+        logging.getLogger(__name__).warning("JSON API not started: %s", e)
+        return None
+    return api
 
-# This function is called every time the script reruns
-df = load_data()
+@perf.timed("load_data")
+def load_data(store):
+    """Returns this session's zero-copy view of the shared shipments snapshot, and the snapshot."""
+    import pandas as pd
+    from snapshot import Snapshot
+
+    if store is None:
+        # An empty DataFrame if there is no connection and no saved snapshot
+        return pd.DataFrame(), Snapshot(pd.DataFrame(), 0, None, 0.0)
+
+    # Pin one snapshot so the view and its version agree even if a refresh lands now
+    snapshot = store.current()
+    return snapshot.df.copy(deep=False), snapshot
+
+st.title("📦 Seamaster Shipment Dashboard")
 
 # --- Sidebar Navigation ---
 st.session_state.setdefault("view", "Dashboard")
 
+debug_mode = perf.debug_enabled()
+
 with st.sidebar:
     st.markdown("### 🥝 Navigation")
     btn_style = {"use_container_width": True}
@@ -127,16 +244,64 @@ with st.sidebar:
         st.session_state.view = "Generate ID"
     if st.button("All Past Shipment Metadata", **btn_style):
         st.session_state.view = "All Past Shipment Metadata"
+    if st.button("Truck Explorer", **btn_style):
+        st.session_state.view = "Truck Explorer"
 
 view = st.session_state.view
 st.title(f"📍 {view}")
 
-# --- Content Area based on View Selection ---
-if st.session_state.get("view") == "Generate ID":
-    render_generateID(df)
+try:
+    # --- Database and collection ---
+    client = None if snapshot_only else wait_for_connection(pending_connection, connection_status)
+    collection = None
+
+    if client is not None:
+        try:
+            db = client.get_database("seamaster")
+            collection = db.get_collection("shipments")
+            ensure_shipment_indexes(collection)
+        except Exception as e:
+            st.error(f"🚫 Error accessing database or collection: {e}")
+            collection = None
+
+    # This function is called every time the script reruns
+    store = open_store(collection)
+    json_api = get_json_api()
+    if json_api is not None and store is not None:
+        json_api.attach(store)
+    df, snapshot = load_data(store)
+    if snapshot.read_only:
+        st.warning(f"📴 Read-only snapshot from {snapshot.loaded_at:%Y-%m-%d %H:%M}. "
+                   "Changes cannot be saved until MongoDB is reachable.")
+
+    # --- Content Area based on View Selection ---
+    # Each view module (and its pandas/PyMuPDF imports) loads the first time it is shown
+    with perf.span(f"render {view}", rows=len(df)):
+        if st.session_state.get("view") == "Generate ID":
+            from generateId_view import render_generateID
+            render_generateID(df, collection)
+
+        elif view == "All Past Shipment Metadata":
+            from pastShipments_view import render_shipments
+            # Version history is read from MongoDB, so it is not offered offline
+            render_shipments(df, None if snapshot.read_only else collection)
 
-elif view == "All Past Shipment Metadata":
-    render_shipments(df)
+        elif view == "Truck Explorer":
+            from truckExplorer_view import render_truck_explorer
+            # Queries MongoDB page by page, so it is not offered offline
+            render_truck_explorer(None if snapshot.read_only else collection)
 
-if view == "Dashboard":
-    render_dashboard(df)
\ No newline at end of file
+        if view == "Dashboard":
+            from dashboard_view import render_dashboard
+            rollup = alerts = dwell = filters = None
+            if store is not None:
+                rollup = get_daily_rollup(store, snapshot.read_only)
+                alerts = get_alert_scheduler(store, snapshot.read_only)
+                dwell = get_dwell_stats(store, snapshot.read_only)
+                filters = get_filter_index(df, snapshot.version, snapshot.read_only)
+            render_dashboard(df, rollup=rollup, alerts=alerts, dwell=dwell, filters=filters)
+finally:
+    # Runs even when a view calls st.stop(), so every rerun is accounted for
+    perf_record = perf.finish_rerun(log_path=perf.DEFAULT_LOG_PATH if debug_mode else None)
+    if debug_mode:
+        perf.render_debug_panel(perf_record)
@@ -0,0 +1,166 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from snapshot import Snapshot
+
+logger = logging.getLogger(__name__)
+
+# --- Offline snapshot file ---
+# Every successful load is saved as an uncompressed Arrow IPC file, so the dashboard can
+# start from it read-only when MongoDB is down (or with `--snapshot`). The file is opened
+# with a memory map: flat columns (dates, numbers, strings) are read straight from the
+# mapped pages without copying or parsing. Columns holding documents (Trucks, Borders,
+# Trailers) or mixed value types are stored as one BSON document per row, {"v": value}, the
+# format they were loaded from. BSON only describes data, so a tampered file can at worst
+# hold wrong values. The documents of a column sit back to back in the mapped data buffer
+# and are decoded in one call per column chunk.
+
+DEFAULT_SNAPSHOT_PATH = os.path.join("data", "shipments.arrow")
+
+_SAVED_AT_KEY = b"seamaster.saved_at"
+_OBJECT_COLUMNS_KEY = b"seamaster.bson_columns"
+
+
+def _needs_bson(series):
+    if series.dtype != object:
+        return False
+    return pd.api.types.infer_dtype(series, skipna=True) not in ("string", "empty")
+
+
+def _bson_fallback(value):
+    """Values pandas may leave in an object column, as the BSON types MongoDB returns."""
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    if isinstance(value, np.generic):
+        return value.item()
+    if value is pd.NaT:
+        return None
+    raise TypeError(f"Cannot store {type(value).__name__} in a snapshot")
+
+
+def _codec_options():
+    from bson.codec_options import CodecOptions, TypeRegistry
+
+    return CodecOptions(type_registry=TypeRegistry(fallback_encoder=_bson_fallback))
+
+
+def _decode_column(column, codec_options):
+    """The values of a binary column of {"v": value} documents, decoded a chunk at a time."""
+    import bson
+    import pyarrow as pa
+
+    values = []
+    for chunk in column.chunks:
+        if len(chunk) == 0:
+            continue
+        _, offsets, data = chunk.buffers()
+        offsets = np.frombuffer(offsets, dtype=np.int64 if pa.types.is_large_binary(chunk.type) else np.int32)
+        data = memoryview(data)[offsets[chunk.offset]:offsets[chunk.offset + len(chunk)]]
+        values.extend(document["v"] for document in bson.decode_all(data, codec_options))
+    return values
+
+
+def save_snapshot(snapshot, path=DEFAULT_SNAPSHOT_PATH):
+    """Writes `snapshot` to `path` (atomically, via a temporary file next to it)."""
+    import pyarrow as pa
+
+    import bson
+
+    df = snapshot.df
+    object_columns = [column for column in df.columns if _needs_bson(df[column])]
+    if object_columns:
+        codec_options = _codec_options()
+        df = df.assign(**{
+            column: [bson.encode({"v": value}, codec_options=codec_options) for value in df[column]]
+            for column in object_columns
+        })
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    loaded_at = snapshot.loaded_at or datetime.now()
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        _SAVED_AT_KEY: loaded_at.isoformat().encode(),
+        _OBJECT_COLUMNS_KEY: json.dumps([str(column) for column in object_columns]).encode(),
+    })
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # A temporary file of its own per save, so saves from different threads never share one
+    fd, temporary = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory or ".")
+    os.close(fd)
+    try:
+        with pa.OSFile(temporary, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        # A reader that has the old file mapped keeps its pages; new readers see the new file
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+def snapshot_fingerprint(df):
+    """(rows, largest _id): added and deleted shipments change it, edits in place do not."""
+    if "_id" not in df.columns or df.empty:
+        return len(df), None
+    return len(df), df["_id"].max()
+
+
+class SnapshotSaver:
+    """
+    Snapshot listener that keeps the file at `path` current without rewriting it for every
+    refresh. A snapshot is saved when its fingerprint or the store's count of change events
+    differs from the last save, or when that save is older than `max_age` seconds, so edits
+    in place reach the file within that time even without change streams.
+    """
+
+    def __init__(self, path=DEFAULT_SNAPSHOT_PATH, store=None, max_age=900):
+        self.path = path
+        self.store = store
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._saved = None  # (version, fingerprint and change count, time.monotonic() of the save)
+
+    def __call__(self, snapshot):
+        # add_listener's first call (script thread) can overlap a refresh (refresher thread)
+        with self._lock:
+            key = (snapshot_fingerprint(snapshot.df), getattr(self.store, "changes_seen", None))
+            if self._saved is not None:
+                version, saved_key, saved_at = self._saved
+                if snapshot.version <= version:
+                    return  # A newer snapshot is already on disk
+                if key == saved_key and time.monotonic() - saved_at < self.max_age:
+                    logger.debug("Snapshot %d unchanged, not saved", snapshot.version)
+                    return
+            save_snapshot(snapshot, self.path)
+            self._saved = (snapshot.version, key, time.monotonic())
+
+
+def open_snapshot(path=DEFAULT_SNAPSHOT_PATH):
+    """
+    Opens a saved snapshot with a memory map and returns it as a read-only Snapshot whose
+    loaded_at is the time the data was originally loaded from MongoDB.
+    """
+    import pyarrow as pa
+
+    started = time.perf_counter()
+    table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    metadata = table.schema.metadata or {}
+    object_columns = json.loads(metadata.get(_OBJECT_COLUMNS_KEY, b"[]"))
+    codec_options = _codec_options()
+    decoded = {column: _decode_column(table.column(column), codec_options) for column in object_columns}
+    # split_blocks keeps each column in its own block, so null-free columns map zero-copy
+    df = table.drop_columns(object_columns).to_pandas(split_blocks=True)
+    if decoded:
+        df = df.assign(**decoded)[table.column_names]
+
+    saved_at = metadata.get(_SAVED_AT_KEY)
+    loaded_at = datetime.fromisoformat(saved_at.decode()) if saved_at else datetime.fromtimestamp(os.path.getmtime(path))
+    logger.info("Opened offline snapshot %s (%d rows)", path, len(df))
+    return Snapshot(df, 1, loaded_at, time.perf_counter() - started, read_only=True)
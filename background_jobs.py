@@ -0,0 +1,97 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# --- Background jobs ---
+# Slow work started from a view (saving a shipment, rendering its PDF) runs on a small
+# process-wide thread pool, so the rerun that started it returns at once and the session
+# polls the job for progress. Jobs are keyed by an idempotency key chosen by the caller:
+# submitting a key that is already running or done returns that job instead of starting a
+# second one, so a double click or a retried request does the work once.
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class Job:
+    """The progress and outcome of one background job. Written by the worker, read by sessions."""
+
+    def __init__(self, key):
+        self.key = key
+        self.status = PENDING
+        self.stage = "Waiting to start"
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.timings = {}  # stage -> seconds
+        self.submitted_at = time.perf_counter()
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+    def update(self, stage, progress):
+        self.stage = stage
+        self.progress = progress
+
+    @contextmanager
+    def timed(self, name):
+        """Records the seconds spent in the enclosed block as `name`."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = time.perf_counter() - started
+
+
+class JobRunner:
+    """Runs keyed jobs on a thread pool and keeps the most recent `keep` of them for polling."""
+
+    def __init__(self, max_workers=2, keep=200):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="background-job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self.keep = keep
+
+    def submit(self, key, func, *args):
+        """
+        Runs `func(job, *args)` in the background and returns its Job. A key that is already
+        pending, running or done returns the existing job; a failed one is run again.
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.status != FAILED:
+                return job
+            job = Job(key)
+            self._jobs[key] = job
+            self._jobs.move_to_end(key)
+            while len(self._jobs) > self.keep:
+                oldest = next(iter(self._jobs.values()))
+                if not oldest.finished:
+                    break  # Never forget a job that is still running
+                self._jobs.popitem(last=False)
+        self._executor.submit(self._run, job, func, args)
+        return job
+
+    def get(self, key):
+        return self._jobs.get(key)
+
+    def _run(self, job, func, args):
+        job.status = RUNNING
+        try:
+            job.result = func(job, *args)
+            job.status = DONE
+        except Exception as e:
+            logger.warning("Background job %s failed: %s", job.key, e)
+            job.error = e
+            job.status = FAILED
+        finally:
+            job.finished_at = time.perf_counter()
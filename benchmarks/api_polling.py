@@ -0,0 +1,117 @@
+"""
+JSON API polling benchmark.
+
+Seeds a synthetic dataset into the in-process mongomock stand-in, serves it with
+api_server.py on a free port and polls each resource the way a scraping client would,
+recording the server round trip and the bytes sent:
+
+  first        the first request (prices the selection and caches the body)
+  repeat       the same request again without validators (a cached body)
+  conditional  the same request with If-None-Match (a 304, no body)
+  refreshed    a conditional request after the snapshot reloaded unchanged data (still a 304)
+
+    python -m benchmarks.api_polling --dataset 300x10x3 --repeat 20
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.cold_start import free_port
+from benchmarks.synthetic_data import generate_shipments
+from data_source import connect, load_shipments
+
+MOCK_URI = "mongomock://api-polling"
+
+
+def fetch(url, etag=None):
+    """GETs `url` and returns (ms, status, bytes, ETag)."""
+    request = urllib.request.Request(url, headers={"If-None-Match": etag} if etag else {})
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request) as response:
+            body = response.read()
+            status, headers = response.status, response.headers
+    except urllib.error.HTTPError as e:  # urllib raises for a 304
+        body, status, headers = e.read(), e.code, e.headers
+    return (time.perf_counter() - started) * 1000, status, len(body), headers.get("ETag")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default="300x10x3", help="shipments x trucks x borders")
+    parser.add_argument("--repeat", type=int, default=20, help="Requests per resource and mode")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None,
+                        help="JSON results file (default: benchmarks/results/api-<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    from api_server import ShipmentApi, start_server
+    from snapshot import SnapshotStore
+
+    n_shipments, n_trucks, n_borders = (int(x) for x in args.dataset.split("x"))
+    shipments = generate_shipments(n_shipments, n_trucks, n_borders, seed=args.seed)
+    collection = connect(MOCK_URI)["seamaster"]["shipments"]
+    collection.delete_many({})
+    collection.insert_many(shipments)
+
+    store = SnapshotStore(loader=lambda: load_shipments(collection), refresh_interval=3600).start()
+    api = ShipmentApi(store)
+    server = start_server(api, port=free_port())
+    base = "http://%s:%d" % server.server_address[:2]
+    client = shipments[0]["Client"]
+    resources = {
+        "kpis": "/api/kpis",
+        "kpis_client": f"/api/kpis?client={urllib.request.quote(client)}",
+        "files": "/api/files",
+        "trucks": f"/api/shipments/{urllib.request.quote(shipments[0]['Unique ID'])}/trucks",
+    }
+
+    summary = {}
+    try:
+        for name, path in resources.items():
+            url = base + path
+            first_ms, status, size, etag = fetch(url)
+            assert status == 200, f"{path} answered {status}"
+            repeat = [fetch(url) for _ in range(args.repeat)]
+            conditional = [fetch(url, etag) for _ in range(args.repeat)]
+            store.refresh()
+            refreshed = [fetch(url, etag) for _ in range(args.repeat)]
+            summary[name] = {
+                "first_ms": round(first_ms, 2),
+                "repeat_ms": round(statistics.median(r[0] for r in repeat), 2),
+                "conditional_ms": round(statistics.median(r[0] for r in conditional), 2),
+                "refreshed_ms": round(statistics.median(r[0] for r in refreshed), 2),
+                "body_bytes": size,
+                "conditional_status": sorted({r[1] for r in conditional}),
+                "refreshed_status": sorted({r[1] for r in refreshed}),
+            }
+    finally:
+        server.shutdown()
+        store.stop()
+
+    print(f"JSON API polling at {args.dataset} ({args.repeat} requests each):")
+    print(f"  {'resource':<12} {'first':>9} {'repeat':>9} {'304':>9} {'refreshed':>10} {'bytes':>9}")
+    for name, s in summary.items():
+        print(f"  {name:<12} {s['first_ms']:>7.2f}ms {s['repeat_ms']:>7.2f}ms {s['conditional_ms']:>7.2f}ms "
+              f"{s['refreshed_ms']:>8.2f}ms {s['body_bytes']:>9}  statuses {s['conditional_status']} {s['refreshed_status']}")
+    print(f"  body cache: {api.bodies.hits} hits, {api.bodies.misses} misses, {api.not_modified} not modified")
+
+    output = args.output or os.path.join(REPO_ROOT, "benchmarks", "results", f"api-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as fh:
+        json.dump({"timestamp": datetime.now().isoformat(timespec="seconds"), "dataset": args.dataset,
+                   "repeat": args.repeat, "summary": summary}, fh, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
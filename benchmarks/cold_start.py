@@ -0,0 +1,146 @@
+"""
+Cold-start benchmark: process start to first paint.
+
+Starts `streamlit run app.py` in a fresh process, opens a browser-style websocket
+session and records, from the moment the process was spawned:
+
+  server_ready   the health endpoint answers
+  first_paint    the first element of the page arrives (the page title)
+  sidebar        the navigation buttons have arrived
+  script_done    the first full run of the script has finished
+
+By default the app connects to an empty in-process stand-in (a mongomock:// URI);
+pass --mongo-uri to time a cold start against a real database:
+
+    python -m benchmarks.cold_start --runs 5
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MILESTONES = ["server_ready", "first_paint", "sidebar", "script_done"]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_health(port, process, timeout):
+    deadline = time.perf_counter() + timeout
+    url = f"http://127.0.0.1:{port}/_stcore/health"
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"streamlit exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            pass
+        time.sleep(0.02)
+    raise TimeoutError("streamlit did not become healthy in time")
+
+
+async def watch_first_run(port, started, timeout):
+    """Requests a script run over the websocket and timestamps the first messages."""
+    from streamlit.proto.BackMsg_pb2 import BackMsg
+    from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+    from websockets import connect
+
+    request = BackMsg()
+    request.rerun_script.query_string = ""
+    request.rerun_script.page_script_hash = ""
+
+    marks = {}
+    deadline = time.perf_counter() + timeout
+    async with connect(f"ws://127.0.0.1:{port}/_stcore/stream", subprotocols=["streamlit"], max_size=None) as conn:
+        await conn.send(request.SerializeToString())
+        while "script_done" not in marks and time.perf_counter() < deadline:
+            raw = await conn.recv()
+            msg = ForwardMsg()
+            msg.ParseFromString(raw)
+            elapsed = time.perf_counter() - started
+            kind = msg.WhichOneof("type")
+            if kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                marks.setdefault("first_paint", elapsed)
+                element = msg.delta.new_element
+                if element.WhichOneof("type") == "button" and element.button.label == "Dashboard":
+                    marks.setdefault("sidebar", elapsed)
+            elif kind == "script_finished":
+                marks["script_done"] = elapsed
+    return marks
+
+
+def measure_once(app_dir, mongo_uri, timeout):
+    import asyncio
+
+    with tempfile.TemporaryDirectory() as tmp:
+        secrets = os.path.join(tmp, "secrets.toml")
+        with open(secrets, "w", encoding="utf-8") as fh:
+            fh.write(f'mongo_uri = "{mongo_uri}"\n')
+        port = free_port()
+        command = [
+            sys.executable, "-m", "streamlit", "run", os.path.join(app_dir, "app.py"),
+            "--server.headless", "true", "--server.port", str(port),
+            "--browser.gatherUsageStats", "false", "--secrets.files", secrets,
+        ]
+        started = time.perf_counter()
+        process = subprocess.Popen(command, cwd=app_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for_health(port, process, timeout)
+            marks = {"server_ready": time.perf_counter() - started}
+            marks.update(asyncio.run(watch_first_run(port, started, timeout)))
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
+    return {name: round(seconds * 1000, 1) for name, seconds in marks.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="Cold starts to measure; the median is reported")
+    parser.add_argument("--mongo-uri", default="mongomock://coldstart")
+    parser.add_argument("--app-dir", default=REPO_ROOT, help="Checkout whose app.py is measured")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds to wait for each milestone")
+    parser.add_argument("--output", default=None,
+                        help="JSON results file (default: benchmarks/results/coldstart-<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    app_dir = os.path.abspath(args.app_dir)
+    runs = [measure_once(app_dir, args.mongo_uri, args.timeout) for _ in range(args.runs)]
+    summary = {
+        name: round(statistics.median(r[name] for r in runs), 1)
+        for name in MILESTONES if all(name in r for r in runs)
+    }
+
+    results = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "app_dir": app_dir,
+        "median_ms": summary,
+        "runs": runs,
+    }
+    print(f"Cold start of {app_dir} (median of {args.runs}): "
+          + ", ".join(f"{name} {ms:.0f} ms" for name, ms in summary.items()))
+
+    output = args.output or os.path.join(
+        REPO_ROOT, "benchmarks", "results", f"coldstart-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as fh:
+        json.dump(results, fh, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Interaction latency benchmark: server time per widget interaction.
+
+Starts `streamlit run app.py` with a synthetic dataset seeded into the in-process
+mongomock stand-in, opens a browser-style websocket session and replays interactions
+the way the frontend sends them (all widget states, plus the fragment the widget
+belongs to), timing each from the request to the end of the run it triggers:
+
+  page_load       first full run of the Dashboard
+  client_filter   pick one client in the sidebar filter, then clear it again
+  shipment_panel  open one shipment's panel (a checkout without stateful panels
+                  reruns on the panel's CSV download button instead)
+  pdf_id          type a shipment ID into the PDF generator of the metadata view
+
+Compare two checkouts by running it once per --app-dir:
+
+    python -m benchmarks.interaction_latency --scale 300x10x3
+    python -m benchmarks.interaction_latency --app-dir ../seamaster-before --scale 300x10x3
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.cold_start import free_port, wait_for_health
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside the server process: seeds the shared mongomock store, then starts Streamlit
+LAUNCHER = '''
+import importlib.util, sys
+sys.path.insert(0, {app_dir!r})
+spec = importlib.util.spec_from_file_location("synthetic_data", {synthetic!r})
+synthetic = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(synthetic)
+import data_source
+shipments = synthetic.generate_shipments({n_shipments}, {n_trucks}, {n_borders}, seed={seed},
+                                       legacy_borders={legacy_borders})
+data_source.connect({mongo_uri!r})["seamaster"]["shipments"].insert_many(shipments)
+from streamlit.web import cli
+sys.argv = ["streamlit", "run", {app!r}] + {options!r}
+sys.exit(cli.main())
+'''
+
+
+class Session:
+    """A minimal Streamlit frontend: sends reruns with widget states and records the widgets it is sent."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.states = {}  # widget id -> WidgetState, re-sent with every rerun like the browser does
+        self.widgets = {}  # (kind, label) -> (proto, fragment id), first occurrence wins
+
+    def _record(self, msg):
+        delta = msg.delta
+        kind = delta.WhichOneof("type")
+        if kind == "new_element":
+            element = getattr(delta.new_element, delta.new_element.WhichOneof("type"))
+            label = getattr(element, "label", None)
+            if getattr(element, "id", ""):
+                self.widgets.setdefault((delta.new_element.WhichOneof("type"), label), (element, delta.fragment_id))
+        elif kind == "add_block" and delta.add_block.WhichOneof("type") == "expandable":
+            expandable = delta.add_block.expandable
+            self.widgets.setdefault(("expandable", expandable.label), (expandable, delta.fragment_id))
+
+    def find(self, kind, predicate=lambda label: True):
+        for (widget_kind, label), found in self.widgets.items():
+            if widget_kind == kind and predicate(label or ""):
+                return found
+        return None, None
+
+    async def rerun(self, changes=(), fragment_id="", triggers=()):
+        """Applies `changes` (WidgetStates), requests a rerun and returns (seconds, deltas) until it finishes."""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        for state in changes:
+            self.states[state.id] = state
+        request = BackMsg()
+        request.rerun_script.query_string = ""
+        request.rerun_script.page_script_hash = ""
+        request.rerun_script.fragment_id = fragment_id
+        request.rerun_script.widget_states.widgets.extend(list(self.states.values()) + list(triggers))
+
+        started = time.perf_counter()
+        await self.conn.send(request.SerializeToString())
+        deltas = 0
+        while True:
+            msg = ForwardMsg()
+            msg.ParseFromString(await self.conn.recv())
+            kind = msg.WhichOneof("type")
+            if kind == "delta":
+                deltas += 1
+                self._record(msg)
+            elif kind == "script_finished" and msg.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                return time.perf_counter() - started, deltas
+
+
+def widget_state(widget_id, **value):
+    from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+    state = WidgetState(id=widget_id)
+    for field, v in value.items():
+        if field == "string_array_value":
+            state.string_array_value.data.extend(v)
+        else:
+            setattr(state, field, v)
+    return state
+
+
+async def replay(port, repeat):
+    from websockets import connect
+
+    timings = {}
+
+    def record(name, result):
+        timings.setdefault(name, []).append({"ms": round(result[0] * 1000, 1), "deltas": result[1]})
+
+    async with connect(f"ws://127.0.0.1:{port}/_stcore/stream", subprotocols=["streamlit"], max_size=None) as conn:
+        session = Session(conn)
+        record("page_load", await session.rerun())
+
+        clients, clients_fragment = session.find("multiselect", lambda label: "Client" in label)
+        panel, panel_fragment = session.find("expandable", lambda label: "**" in label and "|" in label)
+        if panel is not None and not panel.id:
+            panel = None  # Not state-tracked: opening it is client-side only
+        download, download_fragment = session.find("download_button", lambda label: "this Shipment" in label)
+
+        for _ in range(repeat):
+            if clients is not None:
+                record("client_filter", await session.rerun(
+                    [widget_state(clients.id, string_array_value=[clients.options[0]])], clients_fragment))
+                record("client_filter", await session.rerun(
+                    [widget_state(clients.id, string_array_value=[])], clients_fragment))
+            if panel is not None:
+                record("shipment_panel", await session.rerun([widget_state(panel.id, bool_value=True)], panel_fragment))
+                await session.rerun([widget_state(panel.id, bool_value=False)], panel_fragment)
+            elif download is not None:
+                record("shipment_panel", await session.rerun(
+                    fragment_id=download_fragment, triggers=[widget_state(download.id, trigger_value=True)]))
+
+        # Switch to the metadata view (not timed) and type shipment IDs into the PDF generator
+        nav, _ = session.find("button", lambda label: label == "All Past Shipment Metadata")
+        await session.rerun(triggers=[widget_state(nav.id, trigger_value=True)])
+        pdf_input, pdf_fragment = session.find("text_input", lambda label: "Shipment ID" in label)
+        for i in range(repeat):
+            record("pdf_id", await session.rerun([widget_state(pdf_input.id, string_value=f"SM-ID-{i}")], pdf_fragment))
+    return timings
+
+
+def measure(app_dir, scale, repeat, seed, timeout, legacy_borders=False):
+    n_shipments, n_trucks, n_borders = (int(x) for x in scale.split("x"))
+    with tempfile.TemporaryDirectory() as tmp:
+        secrets = os.path.join(tmp, "secrets.toml")
+        mongo_uri = "mongomock://latency"
+        with open(secrets, "w", encoding="utf-8") as fh:
+            fh.write(f'mongo_uri = "{mongo_uri}"\nalerts_outbox = "{os.path.join(tmp, "alerts.jsonl")}"\n')
+        port = free_port()
+        launcher = os.path.join(tmp, "launch.py")
+        with open(launcher, "w", encoding="utf-8") as fh:
+            fh.write(LAUNCHER.format(
+                app_dir=app_dir, synthetic=os.path.join(REPO_ROOT, "benchmarks", "synthetic_data.py"),
+                n_shipments=n_shipments, n_trucks=n_trucks, n_borders=n_borders, seed=seed,
+                legacy_borders=legacy_borders, mongo_uri=mongo_uri, app=os.path.join(app_dir, "app.py"),
+                options=["--server.headless", "true", "--server.port", str(port),
+                         "--browser.gatherUsageStats", "false", "--secrets.files", secrets],
+            ))
+        process = subprocess.Popen([sys.executable, launcher], cwd=app_dir,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for_health(port, process, timeout)
+            return asyncio.run(asyncio.wait_for(replay(port, repeat), timeout))
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", default="300x10x3", help="shipments x trucks x borders")
+    parser.add_argument("--repeat", type=int, default=3, help="Times each interaction is replayed")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--app-dir", default=REPO_ROOT, help="Checkout whose app.py is measured")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--legacy-borders", action="store_true",
+                        help="Seed borders as keyed-date dicts, for checkouts from before border records")
+    parser.add_argument("--output", default=None,
+                        help="JSON results file (default: benchmarks/results/latency-<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    app_dir = os.path.abspath(args.app_dir)
+    timings = measure(app_dir, args.scale, args.repeat, args.seed, args.timeout, args.legacy_borders)
+    summary = {
+        name: {
+            "median_ms": round(statistics.median(r["ms"] for r in runs), 1),
+            "deltas": int(statistics.median(r["deltas"] for r in runs)),
+        }
+        for name, runs in timings.items()
+    }
+    print(f"Interaction latency of {app_dir} at {args.scale}:")
+    for name, s in summary.items():
+        print(f"  {name:<15} {s['median_ms']:>9.1f} ms  {s['deltas']:>6} deltas")
+
+    output = args.output or os.path.join(
+        REPO_ROOT, "benchmarks", "results", f"latency-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as fh:
+        json.dump({"timestamp": datetime.now().isoformat(timespec="seconds"), "app_dir": app_dir,
+                   "scale": args.scale, "summary": summary, "runs": timings}, fh, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Headless load test for the Streamlit app.
+
+Runs app.py through streamlit.testing.v1.AppTest against the in-process Mongo
+stand-in (a mongomock:// URI), with many simulated sessions in parallel. Each
+session switches views, changes the sidebar filters and generates PDFs; the
+latency of every interaction is recorded and reported as percentiles, along
+with the process CPU and memory use over the run:
+
+    python -m benchmarks.load_test --sessions 15 --interactions 20 --dataset 300x10x3
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.synthetic_data import generate_shipments
+from data_source import connect
+
+APP_PATH = os.path.join(REPO_ROOT, "app.py")
+MOCK_URI = "mongomock://loadtest"
+VIEWS = ["Dashboard", "Generate ID", "All Past Shipment Metadata"]
+
+
+def seed_database(spec, seed):
+    n_shipments, n_trucks, n_borders = (int(x) for x in spec.split("x"))
+    shipments = generate_shipments(n_shipments, n_trucks, n_borders, seed=seed)
+    collection = connect(MOCK_URI)["seamaster"]["shipments"]
+    collection.delete_many({})
+    collection.insert_many(shipments)
+    return shipments
+
+
+def percentiles(values):
+    ordered = sorted(values)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 1)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered), 1),
+        "p50_ms": pick(0.50),
+        "p90_ms": pick(0.90),
+        "p99_ms": pick(0.99),
+        "max_ms": round(ordered[-1], 1),
+    }
+
+
+class ResourceSampler(threading.Thread):
+    """Samples process CPU and RSS while the load test runs (uses psutil when installed)."""
+
+    def __init__(self, interval=0.25):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples = []
+        self._stop_event = threading.Event()
+        try:
+            import psutil
+            self.process = psutil.Process()
+            self.process.cpu_percent(None)
+        except ImportError:
+            self.process = None
+
+    def run(self):
+        last_cpu, last_wall = sum(os.times()[:2]), time.perf_counter()
+        while not self._stop_event.wait(self.interval):
+            if self.process is not None:
+                cpu = self.process.cpu_percent(None)
+                rss_mb = self.process.memory_info().rss / 2**20
+            else:
+                cpu_now, wall_now = sum(os.times()[:2]), time.perf_counter()
+                cpu = 100 * (cpu_now - last_cpu) / (wall_now - last_wall)
+                last_cpu, last_wall = cpu_now, wall_now
+                rss_mb = None
+            self.samples.append((cpu, rss_mb))
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        cpu = [c for c, _ in self.samples]
+        rss = [r for _, r in self.samples if r is not None]
+        return {
+            "cpu_percent_mean": round(statistics.fmean(cpu), 1) if cpu else None,
+            "cpu_percent_max": round(max(cpu), 1) if cpu else None,
+            "rss_mb_max": round(max(rss), 1) if rss else None,
+            "rss_mb_last": round(rss[-1], 1) if rss else None,
+        }
+
+
+class Session:
+    """One simulated user driving their own AppTest instance."""
+
+    def __init__(self, index, shipments, timeout, seed):
+        from streamlit.testing.v1 import AppTest
+
+        self.rnd = random.Random(seed + index)
+        self.shipments = shipments
+        self.at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        self.at.secrets["mongo_uri"] = MOCK_URI
+        self.latencies = defaultdict(list)
+        self.errors = []
+
+    def timed(self, name, action):
+        start = time.perf_counter()
+        try:
+            action()
+        except Exception as e:  # Record and keep the session going
+            self.errors.append(f"{name}: {e}")
+            return
+        self.latencies[name].append((time.perf_counter() - start) * 1000)
+        for exc in self.at.exception:
+            self.errors.append(f"{name}: {exc.value}")
+
+    def current_view(self):
+        return self.at.session_state["view"] if "view" in self.at.session_state else "Dashboard"
+
+    def switch_view(self):
+        target = self.rnd.choice([v for v in VIEWS if v != self.current_view()])
+        button = next(b for b in self.at.sidebar.button if b.label == target)
+        button.click().run()
+
+    def change_filters(self):
+        if self.current_view() != "Dashboard":
+            next(b for b in self.at.sidebar.button if b.label == "Dashboard").click().run()
+        choice = self.rnd.random()
+        if choice < 0.4:
+            widget = self.at.multiselect(key="filter_clients")
+        elif choice < 0.8:
+            widget = self.at.multiselect(key="filter_file_numbers")
+        else:
+            widget = None
+
+        if widget is None:
+            dates = self.at.date_input(key="filter_date_range")
+            low, high = dates.min, dates.max
+            start = low + (high - low) * self.rnd.uniform(0, 0.5)
+            dates.set_value((start, start + (high - low) / 2)).run()
+        else:
+            picks = self.rnd.sample(widget.options, k=min(len(widget.options), self.rnd.randint(0, 2)))
+            widget.set_value(picks).run()
+
+    def generate_pdf(self):
+        if self.current_view() != "All Past Shipment Metadata":
+            next(b for b in self.at.sidebar.button if b.label == "All Past Shipment Metadata").click().run()
+        shipment = self.rnd.choice(self.shipments)
+        self.at.text_input(key="manual_shipment_id_input").input(shipment["Unique ID"]).run()
+        self.at.button(key="manual_generate_pdf_button").click().run()
+
+    def run(self, interactions):
+        self.timed("initial_load", self.at.run)
+        actions = [
+            ("switch_view", self.switch_view, 0.4),
+            ("change_filters", self.change_filters, 0.4),
+            ("generate_pdf", self.generate_pdf, 0.2),
+        ]
+        for _ in range(interactions):
+            roll, acc = self.rnd.random(), 0.0
+            for name, action, weight in actions:
+                acc += weight
+                if roll < acc:
+                    self.timed(name, action)
+                    break
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=10, help="Concurrent simulated sessions")
+    parser.add_argument("--interactions", type=int, default=15, help="Interactions per session")
+    parser.add_argument("--dataset", default="200x10x3", help="SHIPMENTSxTRUCKSxBORDERS to seed")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=300, help="Per-rerun timeout in seconds")
+    parser.add_argument("--output", default=None,
+                        help="JSON results file (default: benchmarks/results/loadtest-<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    shipments = seed_database(args.dataset, args.seed)
+    sessions = [Session(i, shipments, args.timeout, args.seed) for i in range(args.sessions)]
+    threads = [threading.Thread(target=s.run, args=(args.interactions,)) for s in sessions]
+
+    sampler = ResourceSampler()
+    sampler.start()
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall_s = time.perf_counter() - started
+    resources = sampler.stop()
+
+    merged = defaultdict(list)
+    errors = []
+    for s in sessions:
+        for name, values in s.latencies.items():
+            merged[name].extend(values)
+        errors.extend(s.errors)
+
+    results = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "sessions": args.sessions,
+        "interactions_per_session": args.interactions,
+        "dataset": args.dataset,
+        "wall_seconds": round(wall_s, 2),
+        "latency": {name: percentiles(values) for name, values in sorted(merged.items())},
+        "resources": resources,
+        "errors": errors[:50],
+        "error_count": len(errors),
+    }
+
+    print(f"{args.sessions} sessions × {args.interactions} interactions on {args.dataset} in {wall_s:.1f}s")
+    for name, stats in results["latency"].items():
+        print(f"  {name:<15} n={stats['count']:<4} p50 {stats['p50_ms']:>8.1f} ms  "
+              f"p90 {stats['p90_ms']:>8.1f} ms  p99 {stats['p99_ms']:>8.1f} ms")
+    print(f"  CPU mean {resources['cpu_percent_mean']}%, max {resources['cpu_percent_max']}%; "
+          f"peak RSS {resources['rss_mb_max']} MB; errors: {len(errors)}")
+
+    output = args.output or os.path.join(
+        REPO_ROOT, "benchmarks", "results", f"loadtest-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as fh:
+        json.dump(results, fh, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Peak-memory benchmark for a full app rerun.
+
+Each measurement runs in a fresh subprocess: it seeds a large synthetic dataset
+into an in-process Mongo stand-in, runs app.py headless with AppTest, and reports
+the peak RSS of every rerun (sampled every few milliseconds) and of the whole
+process. --tracemalloc adds the peak Python/NumPy allocation per rerun, at a
+large slowdown. Pass --baseline-dir to measure an older checkout the same way,
+e.g. before and after a change:
+
+    git worktree add /tmp/seamaster-before <commit>
+    python -m benchmarks.memory_benchmark --baseline-dir /tmp/seamaster-before --dataset 2000x10x3
+"""
+import argparse
+import functools
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def current_rss_mb():
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return None
+
+
+class PeakRssSampler(threading.Thread):
+    """Records the highest RSS seen while running, sampled every `interval` seconds."""
+
+    def __init__(self, interval=0.005):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak_mb = current_rss_mb() or 0.0
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, current_rss_mb() or 0.0)
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        return round(max(self.peak_mb, current_rss_mb() or 0.0), 1)
+
+
+def run_child(app_dir, dataset, view, reruns, seed, trace_allocations):
+    """Measures reruns of `app_dir`/app.py in this process and prints the results as JSON."""
+    import resource
+    import tracemalloc
+
+    sys.path.insert(0, REPO_ROOT)
+    from benchmarks.synthetic_data import generate_shipments
+
+    # Older checkouts connect with pymongo.MongoClient directly, so patch it to the stand-in
+    # rather than relying on the mongomock:// URI support of the current tree.
+    import mongomock
+    import pymongo
+    from mongomock.mongo_client import ServerStore
+    pymongo.MongoClient = functools.partial(mongomock.MongoClient, _store=ServerStore())
+
+    n_shipments, n_trucks, n_borders = (int(x) for x in dataset.split("x"))
+    pymongo.MongoClient()["seamaster"]["shipments"].insert_many(
+        generate_shipments(n_shipments, n_trucks, n_borders, seed=seed)
+    )
+
+    sys.path.insert(0, app_dir)
+    from streamlit.testing.v1 import AppTest
+
+    rss_before = current_rss_mb()
+    at = AppTest.from_file(os.path.join(app_dir, "app.py"), default_timeout=600)
+    at.secrets["mongo_uri"] = "mongodb://localhost:27017"
+    at.session_state["view"] = view
+
+    runs = []
+    if trace_allocations:
+        tracemalloc.start()
+    for _ in range(reruns):
+        rss_start = current_rss_mb()
+        sampler = PeakRssSampler()
+        sampler.start()
+        if trace_allocations:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        at.run()
+        run = {
+            "seconds": round(time.perf_counter() - start, 3),
+            "rss_start_mb": round(rss_start or 0, 1),
+            "peak_rss_mb": sampler.stop(),
+            "exceptions": [str(e.value) for e in at.exception],
+        }
+        if trace_allocations:
+            run["tracemalloc_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+        runs.append(run)
+    if trace_allocations:
+        tracemalloc.stop()
+
+    print(json.dumps({
+        "rss_before_mb": round(rss_before or 0, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "reruns": runs,
+    }))
+
+
+def measure(app_dir, args):
+    command = [
+        sys.executable, "-m", "benchmarks.memory_benchmark", "--child",
+        "--app-dir", app_dir, "--dataset", args.dataset, "--view", args.view,
+        "--reruns", str(args.reruns), "--seed", str(args.seed),
+    ] + (["--tracemalloc"] if args.tracemalloc else [])
+    completed = subprocess.run(command, cwd=REPO_ROOT, capture_output=True, text=True)
+    if completed.returncode != 0:
+        sys.exit(f"Benchmark of {app_dir} failed:\n{completed.stderr[-2000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default="2000x10x3", help="SHIPMENTSxTRUCKSxBORDERS to seed")
+    parser.add_argument("--view", default="Dashboard",
+                        choices=["Dashboard", "Generate ID", "All Past Shipment Metadata"])
+    parser.add_argument("--reruns", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--tracemalloc", action="store_true", help="Also trace allocation peaks (slow)")
+    parser.add_argument("--app-dir", default=REPO_ROOT, help="Checkout whose app.py is measured")
+    parser.add_argument("--baseline-dir", default=None, help="Older checkout to measure for comparison")
+    parser.add_argument("--output", default=None,
+                        help="JSON results file (default: benchmarks/results/memory-<timestamp>.json)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_child(os.path.abspath(args.app_dir), args.dataset, args.view, args.reruns, args.seed, args.tracemalloc)
+        return
+
+    targets = [("after", os.path.abspath(args.app_dir))]
+    if args.baseline_dir:
+        targets.insert(0, ("before", os.path.abspath(args.baseline_dir)))
+
+    results = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "dataset": args.dataset,
+        "view": args.view,
+        "measurements": {},
+    }
+    for label, app_dir in targets:
+        result = measure(app_dir, args)
+        result["app_dir"] = app_dir
+        results["measurements"][label] = result
+        per_rerun = ", ".join(f"{r['peak_rss_mb']} MB" for r in result["reruns"])
+        print(f"[{label}] {app_dir}: process peak RSS {result['peak_rss_mb']} MB "
+              f"(started at {result['rss_before_mb']} MB); peak RSS per rerun: {per_rerun}")
+
+    output = args.output or os.path.join(
+        REPO_ROOT, "benchmarks", "results", f"memory-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as fh:
+        json.dump(results, fh, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Transport order PDF benchmark.
+
+Generates one synthetic shipment per truck count and times, per order:
+
+  rows      formatting the truck manifest rows (manifest_rows)
+  manifest  drawing the manifest pages onto the opened template (append_truck_manifest)
+  order     the whole transport order as the app builds it (generate_pdf_with_template)
+
+    python -m benchmarks.pdf_manifest --trucks 10 100 1000 --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.synthetic_data import generate_shipments
+from generateId_view import generate_pdf_with_template
+from truck_manifest import append_truck_manifest, manifest_rows
+
+TEMPLATE_PATH = os.path.join(REPO_ROOT, "transport_order_template.pdf")
+
+
+def median_ms(func, repeat):
+    """Median milliseconds of `func()` over `repeat` runs, and its last result."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(timings), 2), result
+
+
+def draw_manifest(shipment):
+    import fitz  # PyMuPDF
+
+    with fitz.open(TEMPLATE_PATH) as doc:
+        return append_truck_manifest(doc, shipment)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trucks", nargs="+", type=int, default=[10, 100, 1000], help="Trucks per order")
+    parser.add_argument("--borders", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement; the median is reported")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None,
+                        help="JSON results file (default: benchmarks/results/pdf-manifest-<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    draw_manifest(generate_shipments(1, 1, args.borders, seed=args.seed)[0])  # Load PyMuPDF and its fonts
+
+    summary = {}
+    for n_trucks in args.trucks:
+        shipment = generate_shipments(1, n_trucks, args.borders, seed=args.seed)[0]
+        rows_ms, rows = median_ms(lambda: manifest_rows(shipment), args.repeat)
+        manifest_ms, pages = median_ms(lambda: draw_manifest(shipment), args.repeat)
+        order_ms, stream = median_ms(lambda: generate_pdf_with_template(
+            TEMPLATE_PATH, shipment, shipment["Unique ID"], shipment["Shipment Type"]), args.repeat)
+        summary[n_trucks] = {
+            "listed_trucks": len(rows),
+            "manifest_pages": pages,
+            "rows_ms": rows_ms,
+            "manifest_ms": manifest_ms,
+            "order_ms": order_ms,
+            "pdf_bytes": len(stream.getvalue()),
+        }
+
+    print(f"Transport order PDFs ({args.borders} borders, median of {args.repeat}):")
+    print(f"  {'trucks':>7} {'pages':>6} {'rows':>9} {'manifest':>10} {'order':>10} {'bytes':>10}")
+    for n_trucks, s in summary.items():
+        print(f"  {n_trucks:>7} {s['manifest_pages']:>6} {s['rows_ms']:>7.1f}ms {s['manifest_ms']:>8.1f}ms "
+              f"{s['order_ms']:>8.1f}ms {s['pdf_bytes']:>10}")
+
+    output = args.output or os.path.join(REPO_ROOT, "benchmarks", "results",
+                                         f"pdf-manifest-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as fh:
+        json.dump({"timestamp": datetime.now().isoformat(timespec="seconds"), "borders": args.borders,
+                   "repeat": args.repeat, "summary": summary}, fh, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
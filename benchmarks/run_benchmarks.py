@@ -0,0 +1,193 @@
+"""
+Benchmark suite for the dashboard's data paths.
+
+Generates synthetic shipments at several scales, loads them into an in-process
+Mongo stand-in (mongomock) and times the stages a dashboard rerun goes through.
+Results are written as JSON so runs can be compared between releases:
+
+    python -m benchmarks.run_benchmarks --scales 100x10x2 1000x20x3
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.synthetic_data import generate_shipments
+from dashboard_view import build_truck_table, file_workbook
+from data_source import load_shipments
+from pastShipments_view import current_shipments, generate_pdf_with_template, shipment_pdf_data
+from pdf_preview import OrderCache, order_key
+from seamaster_core import MemoryCache, PricingCache, compute_demurrage, content_key, truck_table_columns
+
+DEFAULT_SCALES = ["100x10x2", "500x10x3", "2000x20x3"]
+TEMPLATE_PATH = os.path.join(REPO_ROOT, "transport_order_template.pdf")
+PDF_SAMPLE_SIZE = 20
+
+
+def make_collection(shipments):
+    """Loads the documents into a fresh mongomock collection."""
+    try:
+        import mongomock
+    except ImportError:
+        sys.exit("mongomock is required for the benchmarks: pip install -r requirements-dev.txt")
+    collection = mongomock.MongoClient()["seamaster"]["shipments"]
+    collection.insert_many(shipments)
+    return collection
+
+
+def time_stage(func, repeat):
+    """Runs `func` `repeat` times and returns timing stats in milliseconds plus the last result."""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - start) * 1000)
+    stats = {
+        "min_ms": round(min(timings), 3),
+        "median_ms": round(statistics.median(timings), 3),
+        "max_ms": round(max(timings), 3),
+        "repeat": repeat,
+    }
+    return stats, result
+
+
+def build_all_truck_tables(processed_shipments, cache=None):
+    rows = 0
+    for shipment in processed_shipments:
+        trucks = shipment.get("Trucks", [])
+        if not trucks:
+            continue
+        border_names, desired_columns = truck_table_columns(trucks)
+        if cache is None:
+            rows += len(build_truck_table(trucks, border_names, desired_columns))
+        else:
+            # As the dashboard does it: keyed by a hash of the priced trucks and the columns
+            table = cache.get_or_set(content_key(trucks, border_names, desired_columns),
+                                     lambda: build_truck_table(trucks, border_names, desired_columns))
+            rows += len(table)
+    return rows
+
+
+def export_all_files_xlsx(df_processed):
+    size = 0
+    for _, file_shipments in df_processed.groupby("File Number"):
+        size += len(file_workbook(file_shipments))
+    return size
+
+
+def export_sample_pdfs(shipments):
+    size = 0
+    for shipment in shipments[:PDF_SAMPLE_SIZE]:
+        stream = generate_pdf_with_template(TEMPLATE_PATH, shipment, shipment["Unique ID"])
+        size += len(stream.getvalue())
+    return size
+
+
+def preview_sample_orders(shipments, cache):
+    """Builds (or reads from `cache`) the sample's transport orders and page-1 previews; returns the PNG bytes."""
+    items = []
+    for shipment in shipments[:PDF_SAMPLE_SIZE]:
+        data = shipment_pdf_data(shipment)
+        items.append((order_key(TEMPLATE_PATH, data, "past_shipments", shipment["Unique ID"]),
+                      lambda data=data: generate_pdf_with_template(TEMPLATE_PATH, data, data["Unique ID"])))
+    return sum(len(png) for _, png in cache.orders(items).values())
+
+
+def run_scale(spec, repeat, seed):
+    n_shipments, n_trucks, n_borders = (int(x) for x in spec.split("x"))
+    shipments = generate_shipments(n_shipments, n_trucks, n_borders, seed=seed)
+    collection = make_collection(shipments)
+    now = datetime(2025, 6, 30)
+
+    stages = {}
+    stages["load_data"], df = time_stage(lambda: load_shipments(collection), repeat)
+    stages["demurrage"], (processed, totals) = time_stage(lambda: compute_demurrage(df, now=now), repeat)
+    cache = PricingCache()
+    compute_demurrage(df, now=now, cache=cache)  # Warm up, as the first dashboard rerun does
+    stages["demurrage_warm_cache"], _ = time_stage(lambda: compute_demurrage(df, now=now, cache=cache), repeat)
+    stages["truck_tables"], table_rows = time_stage(lambda: build_all_truck_tables(processed), repeat)
+    table_cache = MemoryCache()
+    build_all_truck_tables(processed, table_cache)
+    stages["truck_tables_cached"], _ = time_stage(lambda: build_all_truck_tables(processed, table_cache), repeat)
+
+    df_processed = pd.DataFrame(processed)
+    stages["xlsx_export"], xlsx_bytes = time_stage(lambda: export_all_files_xlsx(df_processed), repeat)
+    stages["pdf_export"], pdf_bytes = time_stage(lambda: export_sample_pdfs(shipments), repeat)
+    stages["pdf_previews"], preview_bytes = time_stage(lambda: preview_sample_orders(shipments, OrderCache()), repeat)
+    order_cache = OrderCache()
+    preview_sample_orders(shipments, order_cache)  # Warm up, as the first open of the gallery does
+    stages["pdf_previews_cached"], _ = time_stage(lambda: preview_sample_orders(shipments, order_cache), repeat)
+    stages["shipments_grouping"], _ = time_stage(
+        lambda: current_shipments(df.dropna(subset=["Date Submitted"])), repeat
+    )
+
+    return {
+        "scale": spec,
+        "shipments": n_shipments,
+        "trucks": totals["total_trucks"],
+        "borders_per_shipment": n_borders,
+        "truck_table_rows": table_rows,
+        "xlsx_bytes": xlsx_bytes,
+        "pdf_sample": min(PDF_SAMPLE_SIZE, n_shipments),
+        "pdf_bytes": pdf_bytes,
+        "preview_bytes": preview_bytes,
+        "stages": stages,
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", nargs="+", default=DEFAULT_SCALES,
+                        help="Scales as SHIPMENTSxTRUCKSxBORDERS (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage; min/median/max are reported")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None,
+                        help="JSON results file (default: benchmarks/results/<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    results = {"environment": environment(), "runs": []}
+    for spec in args.scales:
+        run = run_scale(spec, args.repeat, args.seed)
+        results["runs"].append(run)
+        summary = ", ".join(f"{name} {s['median_ms']:.1f} ms" for name, s in run["stages"].items())
+        print(f"[{spec}] {run['trucks']} trucks: {summary}")
+
+    output = args.output or os.path.join(
+        REPO_ROOT, "benchmarks", "results", f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as fh:
+        json.dump(results, fh, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import random
+import uuid
+from datetime import datetime, timedelta
+
+# --- Synthetic shipment documents in the shape written by render_generateID ---
+
+CLIENTS = ["Glencore", "Trafigura", "ERG", "Kamoa", "Mopani", "Chemaf"]
+TRANSPORTERS = ["Bakers", "Unitrans", "Imperial", "Crossroads", "Tradeport"]
+BORDER_NAMES = ["Beitbridge", "Chirundu", "Kasumbalesa", "Kazungula", "Nakonde", "Mwami"]
+LOCATIONS = ["Durban", "Richards Bay", "Lubumbashi", "Kolwezi", "Ndola", "Walvis Bay"]
+
+
+def random_date_value(rnd, base, max_days=40, fill_ratio=0.7):
+    """
+    Returns a date in one of the formats found in the collection: a datetime,
+    an ISO string, epoch milliseconds, or an empty value ("" / None).
+    """
+    if rnd.random() > fill_ratio:
+        return rnd.choice(["", None])
+    value = base + timedelta(days=rnd.randint(0, max_days), hours=rnd.randint(0, 23))
+    kind = rnd.random()
+    if kind < 0.4:
+        return value
+    if kind < 0.7:
+        return value.strftime("%Y-%m-%d")
+    return int(value.timestamp() * 1000)
+
+
+def make_truck(rnd, number, shipment, borders, submitted):
+    """Builds one truck the way render_generateID does, then fills in some tracking data."""
+    truck = {
+        "Truck Number": number,
+        "Truck": f"Truck-{number}",
+        "Trailers": {"Trailer A": None, "Trailer B": None} if len(shipment["Trailers"]) == 2 else {"Trailer A": None},
+        "Driver": "", "Passport": "", "Contact": "", "Driver contact number": "",
+        "Status": "Booked", "Current location": shipment["Loading Point"],
+        "Destination": shipment["Offloading Point"],
+        "Rate per Ton": shipment["Rate per Ton"],
+        "Free Days at Border": shipment["Free Days at Border"],
+        "Free Days at Loading Point": shipment["Free Days at Loading Point"],
+        "Demurrage Rate": shipment["Demurrage Rate"],
+        "Client": shipment["Client"], "Transporter": shipment["Transporter"],
+        "Cargo Type": shipment["Cargo Type"], "Loading Capacity": "34t",
+        "Load Location": shipment["Loading Point"], "Offloading Point": shipment["Offloading Point"],
+        "Tonnage": shipment["Tonnage"], "Transporter Details": shipment["Transporter Details"],
+        "Truck Count": shipment["Truck Count"], "File Number": shipment["File Number"],
+        "Date": submitted,
+        "Issued By": shipment["Issued By"], "Transporter Contact Details": shipment["Transporter Contact Details"],
+        "Agent Details (Country 1)": shipment["Agent Details (Country 1)"],
+        "Agent Details (Country 2)": shipment["Agent Details (Country 2)"],
+        "Payment Terms": "30 days",
+        "Load Start Date": shipment["Load Start Date"],
+        "Load End Date": shipment["Load End Date"],
+        "Truck Type": shipment["Truck Type"], "Escorts arranged": "",
+        "Comments": "",
+        "Borders": {},
+    }
+    for b in borders:
+        truck["Borders"][f"Actual arrival at {b}"] = None
+        truck["Borders"][f"Actual dispatch from {b}"] = None
+
+    # Tracking fields filled in later by the operations team
+    truck["Horse Number"] = f"HN{rnd.randint(100, 999)}GP"
+    truck["Trailers"] = {k: f"TR{rnd.randint(1000, 9999)}" if rnd.random() < 0.8 else None for k in truck["Trailers"]}
+    truck["Driver Name"] = f"Driver {number}"
+    truck["Passport NO."] = f"P{rnd.randint(100000, 999999)}"
+    truck["Status"] = rnd.choice(["Booked", "Loading", "In transit", "At border", "Offloaded"])
+    truck["ETA"] = random_date_value(rnd, submitted, fill_ratio=0.5)
+    truck["Arrived at Loading point"] = random_date_value(rnd, submitted, max_days=10, fill_ratio=0.8)
+    truck["Loaded Date"] = random_date_value(rnd, submitted, max_days=15, fill_ratio=0.6)
+    truck["Dispatch date"] = random_date_value(rnd, submitted + timedelta(days=5), max_days=15, fill_ratio=0.5)
+    offset = timedelta(days=10)
+    for b in borders:
+        truck["Borders"][f"Actual arrival at {b}"] = random_date_value(rnd, submitted + offset, max_days=10, fill_ratio=0.6)
+        truck["Borders"][f"Actual dispatch from {b}"] = random_date_value(rnd, submitted + offset + timedelta(days=3), max_days=10, fill_ratio=0.4)
+        offset += timedelta(days=7)
+    truck["Date offloaded"] = random_date_value(rnd, submitted + offset, max_days=10, fill_ratio=0.3)
+    if rnd.random() < 0.6:
+        truck["Days on site"] = rnd.randint(0, 20)
+    truck["Cancel"] = rnd.random() < 0.05
+    truck["Flag"] = rnd.random() < 0.1
+    return truck
+
+
+def make_shipment(rnd, index, n_trucks, n_borders, start_date):
+    """Builds one shipment document with `n_trucks` trucks and `n_borders` borders (0 means Local)."""
+    shipment_type = "Cross-Border" if n_borders else "Local"
+    submitted = datetime.combine((start_date + timedelta(days=rnd.randint(0, 365))).date(), datetime.min.time())
+    borders = rnd.sample(BORDER_NAMES, min(n_borders, len(BORDER_NAMES)))
+    trailers = ["Trailer A"] + (["Trailer B"] if rnd.random() < 0.5 else [])
+    loading_point, offloading_point = rnd.sample(LOCATIONS, 2)
+
+    shipment = {
+        "Unique ID": str(uuid.UUID(int=rnd.getrandbits(128))),
+        "Date Submitted": submitted,
+        "Transporter": rnd.choice(TRANSPORTERS), "Transporter Details": "",
+        "Transporter Contact Details": "+27 11 000 0000", "Cargo Type": rnd.choice(["Copper", "Cobalt", "Sulphur"]),
+        "Loading Point": loading_point, "Offloading Point": offloading_point,
+        "Tonnage": round(rnd.uniform(20, 40), 2),
+        "Client": rnd.choice(CLIENTS),
+        "File Number": f"SM-{index // 5:05d}", "Issued By": "Ops",
+        "Truck Count": n_trucks,
+        "Load Start Date": submitted,
+        "Load End Date": submitted + timedelta(days=rnd.randint(1, 10)),
+        "Rate per Ton": round(rnd.uniform(50, 200), 2), "Truck Type": "Tri-axle",
+        "Trailers": {t: None for t in trailers},
+        "Shipment Type": shipment_type,
+        "Agent Details (Country 1)": "Agent A" if n_borders else "",
+        "Agent Details (Country 2)": "Agent B" if n_borders else "",
+        "Free Days at Border": rnd.randint(1, 3) if n_borders else 0,
+        "Free Days at Loading Point": rnd.randint(1, 3) if n_borders else 0,
+        "Demurrage Rate": float(rnd.choice([150, 200, 250])) if n_borders else 0.0,
+        "Borders": {},
+    }
+    for b in borders:
+        shipment["Borders"][f"Actual arrival at {b}"] = None
+        shipment["Borders"][f"Actual dispatch from {b}"] = None
+
+    shipment["Trucks"] = [make_truck(rnd, i + 1, shipment, borders, submitted) for i in range(n_trucks)]
+    return shipment
+
+
+def as_border_records(borders):
+    """The border-records form of a generated "Actual arrival at …" dict (same values, same order)."""
+    names = [key[len("Actual arrival at "):] for key in borders if key.startswith("Actual arrival at ")]
+    return [
+        {"name": name, "arrival": borders[f"Actual arrival at {name}"], "dispatch": borders[f"Actual dispatch from {name}"]}
+        for name in names
+    ]
+
+
+def generate_shipments(n_shipments, n_trucks, n_borders, seed=42, start_date=datetime(2024, 1, 1),
+                       legacy_borders=False):
+    """
+    Generates `n_shipments` reproducible shipment documents. One in five shipments is Local
+    (no borders); the rest are Cross-Border with `n_borders` borders. With `legacy_borders`,
+    borders are written as the dicts of keyed dates used before border records.
+    """
+    rnd = random.Random(seed)
+    shipments = [
+        make_shipment(rnd, i, n_trucks, 0 if i % 5 == 4 else n_borders, start_date)
+        for i in range(n_shipments)
+    ]
+    if not legacy_borders:
+        # Converted after generation so both forms hold the same random data
+        for shipment in shipments:
+            shipment["Borders"] = as_border_records(shipment["Borders"])
+            for truck in shipment["Trucks"]:
+                truck["Borders"] = as_border_records(truck["Borders"])
+    return shipments
@@ -1,72 +1,485 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime, timedelta
+from collections import namedtuple
+from datetime import datetime
+from functools import partial
+from io import BytesIO
+import perf
+from data_source import as_datetime
+from filter_index import FilterIndex
+from seamaster_core import (
+    MemoryCache,
+    PricingCache,
+    accrual_curve,
+    arrival_column,
+    border_records,
+    compute_demurrage,
+    content_key,
+    dispatch_column,
+    format_date_for_display,
+    geo_type,
+    kpi_summary,
+    shipment_demurrage_summary,
+    shipment_status,
+    truck_table_columns,
+    write_demurrage_workbook,
+)
+
+
+def build_truck_table(trucks, border_names, desired_columns):
+    """Builds the display table for a list of trucks, with formatted dates, numbers and costs."""
+    cleaned_data = []
+    for truck_data in trucks:
+        row = {}
+        border_dates = {}
+        for record in border_records(truck_data.get("Borders")):
+            border_dates[arrival_column(record["name"])] = record.get("arrival")
+            border_dates[dispatch_column(record["name"])] = record.get("dispatch")
+        for border_name in border_names:
+            row[arrival_column(border_name)] = ""
+            row[dispatch_column(border_name)] = ""
+            row[f"Billable days at {border_name}"] = ""
+            row[f"Demurrage cost at {border_name}"] = ""
+        row["Total Billable days at Borders"] = ""
+        row["Total Demurrage cost at Border"] = ""
+
+
+        for col in desired_columns:
+            if col in ["Cancel", "Flag"]:
+                row[col] = bool(truck_data.get(col, False))
+            elif col in truck_data.get("Trailers", {}):
+                row[col] = truck_data.get("Trailers", {}).get(col, "")
+            elif col in border_dates:
+                row[col] = format_date_for_display(border_dates[col])
+            # Apply the helper function for other direct date columns
+            elif col in ["Arrived at Loading point", "Loaded Date", "Dispatch date", "Date Arrived", "Date offloaded", "ETA"]:
+                row[col] = format_date_for_display(truck_data.get(col))
+            elif col.startswith("Billable days at ") or col.startswith("Demurrage cost at ") or \
+                col == "Total Billable days at Borders" or col == "Total Demurrage cost at Border":
+                row[col] = truck_data.get(col, "")
+            else:
+                row[col] = truck_data.get(col, "")
+        cleaned_data.append(row)
 
-def render_dashboard(df):
-    st.markdown("## 📊 Shipment Dashboard")
-    st.markdown("Get insights into submitted shipments, truck performance, and site activity.")
+    table_df = pd.DataFrame(cleaned_data)
 
-    # --- Filters Section ---
-    df_filtered = df.copy()
-    with st.sidebar:
-        st.header("🔍 Filter Shipments")
-        st.markdown("---")
-        if "Date Submitted" in df_filtered.columns:
-            df_filtered["Date Submitted"] = pd.to_datetime(df_filtered["Date Submitted"], errors='coerce')
-            # Drop rows where Date Submitted could not be parsed
-            df_filtered = df_filtered.dropna(subset=["Date Submitted"])
+    num_cols = [col for col in table_df.columns if any(x in col.lower() for x in ["ton", "days", "cost", "rate", "weight"])]
+    for col in num_cols:
+        table_df[col] = (
+            pd.to_numeric(table_df[col], errors="coerce")
+            .apply(lambda x: f"{x:,.2f}" if pd.notna(x) else ("" if "cost" in col.lower() or "days" in col.lower() else ""))
+        )
+        if "cost" in col.lower():
+            table_df[col] = table_df[col].apply(lambda x: f"R {x}" if x not in ["", None, "R "] else "")
+
+    return table_df
+
+
+def truck_table(trucks, border_names, desired_columns):
+    """build_truck_table through the shared cache: a shipment whose priced trucks are unchanged reuses its table."""
+    return get_truck_table_cache().get_or_set(
+        content_key(trucks, border_names, desired_columns),
+        lambda: build_truck_table(trucks, border_names, desired_columns),
+    )
+
+
+def shipment_csv(trucks):
+    """The per-shipment CSV download, built when the button is clicked."""
+    return pd.DataFrame(trucks).to_csv(index=False).encode("utf-8")
+
+
+def file_workbook(file_shipments, as_of=None):
+    """
+    The consolidated download of a File Number: its priced trucks as an .xlsx workbook whose
+    billable days and costs are live formulas. Built when the button is clicked, not per rerun.
+    """
+    output = BytesIO()
+    write_demurrage_workbook(output, file_shipments.to_dict("records"), as_of=as_of)
+    return output.getvalue()
+
+
+def render_truck_status_summary(df_summary, title="📊 Truck Status Summary"):
+    possible_status_cols = ["truck status", "status"]
+    status_col = next((col for col in df_summary.columns if col.strip().lower() in possible_status_cols), None)
+
+    if status_col and not df_summary.empty:
+        status_summary = df_summary[status_col].value_counts()
+        if not status_summary.empty:
+            st.markdown(f"##### {title}:") # Changed to h5 for nested hierarchy
+            for label, count in status_summary.items():
+                st.markdown(f"- **{count} truck(s)** — {label}")
+        else:
+            st.info("No truck statuses to summarize.")
+    else:
+        st.info("No status column found to summarize.")
+
+
+# This function is now designed to be called directly, not within an expander
+def render_individual_shipment_overview(df_shipments_to_render, file_number_key_prefix=""):
+    if "Date Submitted" in df_shipments_to_render.columns:
+        df_shipments_to_render = df_shipments_to_render.assign(
+            **{"Date Submitted": as_datetime(df_shipments_to_render["Date Submitted"])}
+        ).sort_values("Date Submitted", ascending=False)
+    else:
+        st.warning("'Date Submitted' column missing or invalid for sorting in grouped_df.")
+
+    for _, row in df_shipments_to_render.iterrows():
+        render_shipment_panel(row, file_number_key_prefix)
+
+
+@st.fragment
+def render_shipment_panel(row, file_number_key_prefix=""):
+    """One shipment's expander. It is a fragment, so its widgets rerun only this panel."""
+    uid = row["Unique ID"]
+    client = row.get("Client", "Unknown")
+    transporter = row.get("Transporter", "Unknown")
+    trucks = row.get("Trucks", [])
+    date_submitted = row.get("Date Submitted")
+    truck_count = len(trucks)
+
+    shipment_geo_type = geo_type(row.get("Shipment Type"))
+    status_icon, label = shipment_status(trucks, shipment_geo_type)
+
+    submitted_str = date_submitted.strftime("%Y-%m-%d") if pd.notna(date_submitted) else "N/A"
+
+    header = f"{status_icon} **{uid}** | 🏢 {client} | 🚚 {transporter} | 🛻 Trucks: {truck_count} | 🌍 **{shipment_geo_type}** | 🕒 {submitted_str} — *{label}*"
+
+    # The expander tracks its state so a collapsed shipment only sends its header;
+    # opening it reruns this panel's fragment alone
+    panel = st.expander(header, expanded=False, key=f"panel_{file_number_key_prefix}{uid}", on_change="rerun")
+    if not panel.open:
+        return
+    with panel:
+        # --- Shipment Financial & Time Details (Cross Border Only) ---
+        if shipment_geo_type.lower() == "cross border":
+            st.markdown("#### ⚙️ Shipment Financial & Time Details")
+
+            # Data from Generator (main shipment data)
+            free_days_lp_gen = row.get("Free Days at Loading Point", 0)
+            # Assuming "Free days at offloading" for Cross Border refers to Free Days at Border
+            free_days_offloading_gen = row.get("Free Days at Border", 0)
+            demurrage_rate_gen = row.get("Demurrage Rate", 0.0)
+            payment_terms_gen = row.get("Payment Terms", "N/A")
+
+            # Calculated across all trucks within THIS specific shipment
+            # ('trucks' here are already processed and contain calculated demurrage costs)
+            current_shipment_total_demurrage_cost, avg_standing_time_shipment = shipment_demurrage_summary(trucks)
+
+            st.write(f"**Free days at Loading Point:** {free_days_lp_gen} days")
+            st.write(f"**Free days at Offloading (Border):** {free_days_offloading_gen} days")
+            st.write(f"**Demurrage Rate:** R {demurrage_rate_gen:,.2f} per day")
+            st.write(f"**Payment Terms:** {payment_terms_gen}")
+            st.write(f"**Total Demurrage Cost for this Shipment:** R {current_shipment_total_demurrage_cost:,.2f}")
+            st.write(f"**Average Standing Time per Truck:** {avg_standing_time_shipment:.1f} days")
+            st.markdown("---") # Visual separator
+
+        if not trucks:
+            st.info("No truck data found for this shipment.")
+        else:
+            # The processed trucks are only read from here on, so split them without copying
+            active_trucks = [t for t in trucks if not t.get("Cancel")]
+            cancelled_trucks = [t for t in trucks if t.get("Cancel")]
+
+            all_border_names_ordered_globally, desired_columns = truck_table_columns(active_trucks + cancelled_trucks)
+
+            active_df = pd.DataFrame()
+            if active_trucks:
+                st.markdown("#### ✅ Active Trucks")
+
+                with perf.span("dashboard.truck_table", rows=len(active_trucks), aggregate=True):
+                    active_df = truck_table(active_trucks, all_border_names_ordered_globally, desired_columns)
+
+                column_config = {
+                    col: st.column_config.TextColumn(col, disabled=True)
+                    for col in active_df.columns
+                }
+
+                column_config["Cancel"] = st.column_config.CheckboxColumn("Cancel", disabled=True)
+                column_config["Flag"] = st.column_config.CheckboxColumn("Flag", disabled=True)
+
+                with perf.span("dashboard.data_editor", aggregate=True):
+                    st.data_editor(
+                        active_df,
+                        use_container_width=True,
+                        key=f"active_editor_{file_number_key_prefix}{uid}", # Unique key for editor
+                        hide_index=True,
+                        column_config=column_config,
+                        column_order=desired_columns
+                    )
+            else:
+                st.info("No active trucks.")
+
+
+            if cancelled_trucks:
+                st.markdown("#### ❌ Cancelled Trucks")
+
+                with perf.span("dashboard.truck_table", rows=len(cancelled_trucks), aggregate=True):
+                    cancelled_df = truck_table(cancelled_trucks, all_border_names_ordered_globally, desired_columns)
+
+                column_config = {
+                    col: st.column_config.TextColumn(col, disabled=True)
+                    for col in cancelled_df.columns
+                }
+                column_config["Cancel"] = st.column_config.CheckboxColumn("Cancel", disabled=True)
+                column_config["Flag"] = st.column_config.CheckboxColumn("Flag", disabled=True)
+
+                with perf.span("dashboard.data_editor", aggregate=True):
+                    st.data_editor(
+                        cancelled_df,
+                        use_container_width=True,
+                        key=f"cancelled_editor_{file_number_key_prefix}{uid}", # Unique key for editor
+                        hide_index=True,
+                        column_config=column_config,
+                        disabled=True,
+                        height=min(len(cancelled_df) * 35 + 50, 700),
+                        column_order=desired_columns
+                    )
+            else:
+                st.info("No cancelled trucks.")
+
+            if not active_df.empty:
+                render_truck_status_summary(active_df, title="Active Truck Status Summary")
+            else:
+                st.info("No active trucks for status summary.")
+
+            # --- Original Individual Shipment Download Button ---
+            st.download_button(
+                label="📄 Download Truck Data (CSV) for this Shipment",
+                data=partial(shipment_csv, trucks),
+                file_name=f"{uid}_trucks.csv",
+                mime="text/csv",
+                key=f"dl_single_{file_number_key_prefix}{uid}",
+                on_click="ignore",
+            )
+
+
+@st.cache_resource
+def get_pricing_cache():
+    """
+    Process-wide cache of parsed truck stays, shared by every session. After the first
+    rerun only open stays are recomputed, so a new day costs one pass over the open stays.
+    """
+    return PricingCache("truck pricing")
+
+
+@st.cache_resource
+def get_truck_table_cache():
+    """
+    Process-wide cache of built truck tables (up to 64 MB), keyed by a hash of the priced
+    trucks and the columns. Open stays reprice daily, which changes the key.
+    """
+    return MemoryCache("truck tables", max_bytes=64 * 1024 * 1024)
+
+
+@st.cache_resource
+def get_dashboard_data_cache():
+    """
+    Process-wide cache of the priced selections, keyed by the filter index (one per snapshot
+    version) and the sidebar selection. Sessions looking at the same selection share one
+    priced copy; the eight most recent selections are kept.
+    """
+    return MemoryCache("dashboard data", max_entries=8)
+
+
+def render_free_days_alerts(scheduler, unique_ids=None):
+    """Banner for open stays past, or about to pass, their free days (limited to the shown shipments)."""
+    with perf.span("dashboard.alerts"):
+        scheduler.tick()
+        alerts = scheduler.active()
+    if unique_ids is not None:
+        alerts = [a for a in alerts if a.unique_id in unique_ids]
+    if not alerts:
+        return
+
+    today = datetime.now().date()
+    exceeded = [a for a in alerts if a.kind == "exceeded"]
+    approaching = len(alerts) - len(exceeded)
+    message = f"🚨 {len(exceeded)} open stay(s) past their free days"
+    if approaching:
+        message += f", {approaching} reaching them within {scheduler.lead_days} day(s)"
+    st.error(message + ".")
+    with st.expander("View free-days alerts"):
+        st.dataframe(pd.DataFrame([{
+            "Alert": "Exceeded" if a.kind == "exceeded" else "Approaching",
+            "File Number": a.file_number,
+            "Client": a.client,
+            "Truck": a.truck,
+            "Location": a.location,
+            "Arrived": a.arrival,
+            "Free Days": a.free_days,
+            "Billing From": a.breach_day,
+            "Days Over": max(0, (today - a.breach_day).days + 1),
+        } for a in alerts]), use_container_width=True, hide_index=True)
+
+
+def render_dwell_times(dwell, file_numbers=None):
+    """Median, p90 and p99 days from arrival to dispatch per border and per transporter."""
+    st.subheader("⏱️ Border Dwell Times")
+    with perf.span("dashboard.dwell"):
+        by_border = dwell.summary("border", file_numbers)
+        by_transporter = dwell.summary("transporter", file_numbers)
+    if by_border.empty:
+        st.info("No completed border stays for the selected shipments.")
+        return
+    col1, col2 = st.columns(2)
+    with col1: st.dataframe(by_border, use_container_width=True, hide_index=True)
+    with col2: st.dataframe(by_transporter, use_container_width=True, hide_index=True)
+    st.caption("Days from arrival to dispatch over completed border stays; quantiles are streaming estimates.")
+
+
+def render_demurrage_trend(rollup, start=None, end=None, clients=None):
+    """Daily demurrage cost from the pre-aggregated rollup, broken down by border, client or transporter."""
+    st.subheader("📈 Daily Demurrage Trend")
+    breakdown = st.radio(
+        "Break down by", ["Location", "Client", "Transporter"],
+        horizontal=True, key="trend_breakdown"
+    )
+    with perf.span("dashboard.trend"):
+        daily = rollup.query(start=start, end=end, by=(breakdown.lower(),), clients=clients)
+    if daily.empty:
+        st.info("No billable demurrage days in this range.")
+        return
+
+    chart_df = daily.pivot_table(index="day", columns=breakdown.lower(), values="cost", aggfunc="sum").fillna(0)
+    st.area_chart(chart_df, y_label="Demurrage cost (R)")
+
+    col1, col2 = st.columns(2)
+    with col1: st.metric("🧾 Billable Truck-Days in Range", f"{int(daily['truck_days'].sum()):,}")
+    with col2: st.metric("💸 Demurrage Accrued in Range", f"R {daily['cost'].sum():,.2f}")
+
+
+def render_demurrage_accrual(df_filtered, start=None, as_of=None):
+    """Running total of demurrage for the filtered shipments, day by day up to `as_of`."""
+    st.subheader("📉 Demurrage Accrual")
+    with perf.span("dashboard.accrual", rows=len(df_filtered)):
+        curve = accrual_curve(df_filtered, start=start, end=as_of)
+    if curve.empty:
+        st.info("No demurrage has accrued in this range.")
+        return
+    st.line_chart(curve.set_index("day")[["accrued_cost"]], y_label="Accrued demurrage (R)")
+    st.caption(
+        f"{int(curve['trucks_billing'].iloc[-1])} truck(s) billing on {curve['day'].iloc[-1]:%Y-%m-%d}, "
+        f"peak {int(curve['trucks_billing'].max())}."
+    )
+
+
+# --- Dashboard fragments ---
+# The sidebar filters, the KPI row, the trend chart, the shipment overview and every
+# shipment panel are fragments. A widget inside one reruns only that fragment; a filter
+# change reruns the filters and the fragments that depend on them (through a keyed
+# st.rerun from the widget callback), never app.py from the top.
+DASHBOARD_FRAGMENTS = ["dashboard_filters", "dashboard_kpis", "demurrage_trend", "dashboard_overview"]
+
+DashboardSelection = namedtuple(
+    "DashboardSelection",
+    ["date_range", "until", "clients", "file_numbers", "trend_start", "as_of", "as_of_mode"],
+)
+
+
+def _rerun_dashboard():
+    st.rerun(DASHBOARD_FRAGMENTS)
+
+
+def dashboard_selection(filters):
+    """The sidebar filter values from Session State, resolved against the filter index."""
+    state = st.session_state
+    date_range_dt = trend_start = until = None
+    date_bounds = filters.date_bounds()
+    if date_bounds is not None:
+        date_range = state.get("filter_date_range", date_bounds)
+        if isinstance(date_range, (list, tuple)) and len(date_range) == 2:
+            start, end = date_range
+            trend_start = start
+            date_range_dt = (datetime.combine(start, datetime.min.time()), datetime.combine(end, datetime.max.time()))
+
+    # As-of mode: every stay is priced as it stood at the end of the chosen day
+    today = datetime.now().date()
+    as_of = state.get("filter_as_of", today)
+    as_of_mode = as_of < today
+    if as_of_mode:
+        until = datetime.combine(as_of, datetime.max.time())
+
+    client_options = set(filters.options("Client", date_range_dt, until))
+    clients = tuple(c for c in state.get("filter_clients", []) if c in client_options)
+    file_number_options = set(filters.options("File Number", date_range_dt, until, clients))
+    file_numbers = tuple(f for f in state.get("filter_file_numbers", []) if f in file_number_options)
+    return DashboardSelection(date_range_dt, until, clients, file_numbers, trend_start, as_of, as_of_mode)
+
+
+def dashboard_data(filters, selection):
+    """
+    The filtered shipments and their demurrage, computed once per selection and shared by
+    the fragments of every session through the dashboard data cache.
+    """
+    return get_dashboard_data_cache().get_or_set(
+        (filters, selection), lambda: compute_dashboard_data(filters, selection)
+    )
+
+
+def compute_dashboard_data(filters, selection):
+    df_filtered = filters.select(selection.date_range, selection.until, selection.clients, selection.file_numbers)
+    processed_shipments_with_demurrage, totals = [], None
+    if not df_filtered.empty:
+        # --- Process each truck for calculations before displaying metrics and tables ---
+        with perf.span("dashboard.demurrage", rows=len(df_filtered)) as demurrage_span:
+            processed_shipments_with_demurrage, totals = compute_demurrage(
+                df_filtered, as_of=selection.as_of if selection.as_of_mode else None, cache=get_pricing_cache()
+            )
+            demurrage_span["rows"] = totals["total_trucks"]
 
-        if "Date Submitted" in df_filtered.columns and not df_filtered["Date Submitted"].empty:
-            min_date_available = df_filtered["Date Submitted"].min().date()
-            max_date_available = df_filtered["Date Submitted"].max().date()
+    return df_filtered, processed_shipments_with_demurrage, totals
 
-            if pd.isna(min_date_available):
-                min_date_available = datetime.now().date()
-            if pd.isna(max_date_available):
-                max_date_available = datetime.now().date()
 
+@st.fragment(key="dashboard_filters")
+@perf.fragment("dashboard_filters")
+def render_filters(filters):
+    with perf.span("dashboard.filters", rows=len(filters.frame)):
+        st.header("🔍 Filter Shipments")
+        st.markdown("---")
+        selection = dashboard_selection(filters)
+        date_bounds = filters.date_bounds()
+        if date_bounds is not None:
+            min_date_available, max_date_available = date_bounds
             default_range = [min_date_available, max_date_available]
 
-            date_range = st.date_input(
+            st.date_input(
                 "📅 Submission Date Range",
                 value=default_range,
                 min_value=min_date_available,
                 max_value=max_date_available,
-                key="filter_date_range"
+                key="filter_date_range",
+                on_change=_rerun_dashboard,
             )
-            if isinstance(date_range, (list, tuple)) and len(date_range) == 2:
-                start, end = date_range
-                start_dt = datetime.combine(start, datetime.min.time())
-                end_dt = datetime.combine(end, datetime.max.time())
-                df_filtered = df_filtered[
-                    (df_filtered["Date Submitted"] >= start_dt) &
-                    (df_filtered["Date Submitted"] <= end_dt)
-                ]
         else:
             st.info("No submission dates available after parsing.")
 
+        today = datetime.now().date()
+        st.date_input("🕰️ Demurrage as of", value=today, max_value=today, key="filter_as_of", on_change=_rerun_dashboard)
+
         st.markdown("---")
 
         # Client Filter
-        if "Client" in df_filtered.columns and not df_filtered["Client"].dropna().empty:
-            client_options = sorted(df_filtered["Client"].dropna().unique().tolist())
-            selected_clients = st.multiselect("🏢 Filter by Client", options=client_options, key="filter_clients")
-            if selected_clients:
-                df_filtered = df_filtered[df_filtered["Client"].isin(selected_clients)]
+        client_options = filters.options("Client", selection.date_range, selection.until)
+        if client_options:
+            st.multiselect("🏢 Filter by Client", options=client_options, key="filter_clients", on_change=_rerun_dashboard)
         else:
             st.info("No client data available.")
         
         st.markdown("---")
 
         # NEW: File Number Filter
-        if "File Number" in df_filtered.columns and not df_filtered["File Number"].dropna().empty:
-            file_number_options = sorted(df_filtered["File Number"].dropna().unique().tolist())
-            selected_file_numbers = st.multiselect("🗄️ Filter by File Number", options=file_number_options, key="filter_file_numbers")
-            if selected_file_numbers:
-                df_filtered = df_filtered[df_filtered["File Number"].isin(selected_file_numbers)]
+        file_number_options = filters.options("File Number", selection.date_range, selection.until, selection.clients)
+        if file_number_options:
+            st.multiselect("🗄️ Filter by File Number", options=file_number_options, key="filter_file_numbers", on_change=_rerun_dashboard)
         else:
             st.info("No file number data available.")
-        
+
+
+@st.fragment(key="dashboard_kpis")
+@perf.fragment("dashboard_kpis")
+def render_kpis(filters, alerts=None):
+    selection = dashboard_selection(filters)
+    df_filtered, _, totals = dashboard_data(filters, selection)
 
     # --- Show Metrics ---
     if df_filtered.empty:
@@ -76,157 +489,53 @@ def render_dashboard(df):
         with col2: st.metric("🚛 Trucks", 0)
         with col3: st.metric("💸 Total Demurrage Costs", "R 0.00")
         with col4: st.metric("⏳ Avg Days on Site", "0.0")
-        st.stop()
-
-    total_shipments = df_filtered["Unique ID"].nunique() if "Unique ID" in df_filtered.columns else 0
-    total_trucks = 0
-    total_demurrage_costs_sum = 0
-    total_days_on_site = 0
-    truck_count_for_avg_days = 0
-
-
-    # --- Process each truck for calculations before displaying metrics and tables ---
-    processed_shipments_with_demurrage = []
-
-    for idx, row in df_filtered.iterrows():
-        shipment_copy = row.to_dict()
-        trucks_with_demurrage = []
-
-        # Ensure 'Demurrage Rate' from shipment level is used if not present at truck level
-        shipment_demurrage_rate = float(shipment_copy.get("Demurrage Rate", 0.0) or 0.0)
-
-        if "Trucks" in shipment_copy and isinstance(shipment_copy["Trucks"], list):
-            for truck in shipment_copy["Trucks"]:
-                truck_copy = truck.copy()
-
-                # Use truck's demurrage rate, or fall back to shipment's
-                demurrage_rate_truck = float(truck_copy.get("Demurrage Rate", shipment_demurrage_rate) or 0.0)
-                truck_number = truck_copy.get('Truck Number', 'N/A')
-
-                # --- Calculate Billable days at Loading Point & Demurrage cost at Loading Point ---
-                arrived_lp_date_str = truck_copy.get("Arrived at Loading point")
-                dispatch_date_lp_str = truck_copy.get("Dispatch date")
-                free_days_lp = int(truck_copy.get("Free Days at Loading Point", 0) or 0)
-
-                # Refined Robust parsing of Arrived at Loading point for calculations
-                arrived_lp_dt = None
-                if arrived_lp_date_str is not None and str(arrived_lp_date_str).strip() != '':
-                    try:
-                        if isinstance(arrived_lp_date_str, (int, float)):
-                            arrived_lp_dt = pd.to_datetime(arrived_lp_date_str, unit='ms', errors='coerce')
-                        else: # Assume string
-                            arrived_lp_dt = pd.to_datetime(arrived_lp_date_str, errors='coerce')
-                    except Exception as e:
-                        arrived_lp_dt = pd.NaT # Set to NaT if parsing fails
-
-                dispatch_dt_lp = None
-                if dispatch_date_lp_str is not None and str(dispatch_date_lp_str).strip() != '':
-                    try:
-                        if isinstance(dispatch_date_lp_str, (int, float)):
-                            dispatch_dt_lp = pd.to_datetime(dispatch_date_lp_str, unit='ms', errors='coerce')
-                        else:
-                            dispatch_dt_lp = pd.to_datetime(dispatch_date_lp_str, errors='coerce')
-                    except Exception as e:
-                        dispatch_dt_lp = pd.NaT
-
-
-                billable_days_lp = 0
-                demurrage_cost_lp = 0.0
-
-                if pd.notna(arrived_lp_dt):
-                    end_date_lp_calc = dispatch_dt_lp if pd.notna(dispatch_dt_lp) else pd.Timestamp(datetime.now())
-                    days_at_loading = (end_date_lp_calc.floor('D') - arrived_lp_dt.floor('D')).days
-
-                    billable_days_lp = max(0, days_at_loading - free_days_lp)
-                    demurrage_cost_lp = billable_days_lp * demurrage_rate_truck
-
-                truck_copy["Billable days at Loading Point"] = billable_days_lp
-                truck_copy["Demurrage cost at Loading Point"] = demurrage_cost_lp
-
-
-                # --- Calculate Billable days and Demurrage cost per Border ---
-                total_overall_billable_days_at_all_borders = 0
-                total_overall_demurrage_cost_at_all_borders = 0.0
-
-                free_days_border = int(truck_copy.get("Free Days at Border", 0) or 0)
-
-                # Logic to preserve border order from the 'Borders' object
-                ordered_border_names_and_keys = []
-                if "Borders" in truck_copy and isinstance(truck_copy["Borders"], dict):
-                    seen_border_names = set()
-                    for key in truck_copy["Borders"].keys():
-                        if "actual arrival at" in key.lower():
-                            name_part = key.replace("Actual arrival at ", "").strip()
-                            if name_part not in seen_border_names:
-                                ordered_border_names_and_keys.append((name_part, key, f"Actual dispatch from {name_part}"))
-                                seen_border_names.add(name_part)
-                
-                for border_name, arrival_key, dispatch_key in ordered_border_names_and_keys:
-                    # Refined Robust parsing for border dates for calculations
-                    border_arrival_val = truck_copy["Borders"].get(arrival_key)
-                    border_dispatch_val = truck_copy["Borders"].get(dispatch_key)
-
-                    border_arrival_dt = None
-                    if border_arrival_val is not None and str(border_arrival_val).strip() != '':
-                        try:
-                            if isinstance(border_arrival_val, (int, float)):
-                                border_arrival_dt = pd.to_datetime(border_arrival_val, unit='ms', errors='coerce')
-                            else:
-                                border_arrival_dt = pd.to_datetime(border_arrival_val, errors='coerce')
-                        except Exception as e:
-                            border_arrival_dt = pd.NaT
-
-                    border_dispatch_dt = None
-                    if border_dispatch_val is not None and str(border_dispatch_val).strip() != '':
-                        try:
-                            if isinstance(border_dispatch_val, (int, float)):
-                                border_dispatch_dt = pd.to_datetime(border_dispatch_val, unit='ms', errors='coerce')
-                            else:
-                                border_dispatch_dt = pd.to_datetime(border_dispatch_val, errors='coerce')
-                        except Exception as e:
-                            border_dispatch_dt = pd.NaT
-
-
-                    billable_days_at_this_individual_border = 0
-                    demurrage_cost_at_this_individual_border = 0.0
-
-                    if pd.notna(border_arrival_dt):
-                        end_date_border_calc = border_dispatch_dt if pd.notna(border_dispatch_dt) else pd.Timestamp(datetime.now())
-                        days_at_this_border_raw = (end_date_border_calc.floor('D') - border_arrival_dt.floor('D')).days
-                        
-                        billable_days_at_this_individual_border = max(0, days_at_this_border_raw - free_days_border)
-                        demurrage_cost_at_this_individual_border = billable_days_at_this_individual_border * demurrage_rate_truck
-
-                    truck_copy[f"Billable days at {border_name}"] = billable_days_at_this_individual_border
-                    truck_copy[f"Demurrage cost at {border_name}"] = demurrage_cost_at_this_individual_border
-
-                    total_overall_billable_days_at_all_borders += billable_days_at_this_individual_border
-                    total_overall_demurrage_cost_at_all_borders += demurrage_cost_at_this_individual_border
-
-                truck_copy["Total Billable days at Borders"] = total_overall_billable_days_at_all_borders
-                truck_copy["Total Demurrage cost at Border"] = total_overall_demurrage_cost_at_all_borders
-
-
-                total_demurrage_costs_sum += demurrage_cost_lp + total_overall_demurrage_cost_at_all_borders
-
-                if "Days on site" in truck_copy and pd.notna(truck_copy["Days on site"]):
-                    total_days_on_site += truck_copy["Days on site"]
-                    truck_count_for_avg_days += 1
-
-                trucks_with_demurrage.append(truck_copy)
-
-        total_trucks += len(trucks_with_demurrage)
-        shipment_copy["Trucks"] = trucks_with_demurrage
-        processed_shipments_with_demurrage.append(shipment_copy)
+        return
 
-    avg_days = total_days_on_site / truck_count_for_avg_days if truck_count_for_avg_days else 0
+    if selection.as_of_mode:
+        st.info(f"🕰️ Showing demurrage as it stood at the end of {selection.as_of:%Y-%m-%d}; later arrivals and dispatches are ignored.")
+    elif alerts is not None and "Unique ID" in df_filtered.columns:
+        render_free_days_alerts(alerts, set(df_filtered["Unique ID"].dropna()))
+
+    # The same numbers the JSON API serves (seamaster_core.summaries)
+    kpis = kpi_summary(df_filtered, totals)
+    avg_days = kpis["avg_days_on_site"]
 
     # --- Display Key Metrics (updated with calculated demurrage sum) ---
     col1, col2, col3, col4 = st.columns(4)
-    with col1: st.metric("📦 Total Shipments", total_shipments)
-    with col2: st.metric("🚛 Total Trucks", total_trucks)
-    with col3: st.metric("💰 Total Demurrage Costs", f"R {total_demurrage_costs_sum:,.2f}")
-    with col4: st.metric("⏱ Avg Days on Site", f"{avg_days:.1f}" if truck_count_for_avg_days else "N/A")
+    with col1: st.metric("📦 Total Shipments", kpis["shipments"])
+    with col2: st.metric("🚛 Total Trucks", kpis["trucks"])
+    with col3: st.metric("💰 Total Demurrage Costs", f"R {kpis['total_demurrage_cost']:,.2f}")
+    with col4: st.metric("⏱ Avg Days on Site", f"{avg_days:.1f}" if avg_days is not None else "N/A")
+
+
+@st.fragment(key="demurrage_trend")
+@perf.fragment("demurrage_trend")
+def render_trend_section(filters, rollup):
+    # --- Demurrage trend (answered from the daily rollups, not by repricing every truck) ---
+    selection = dashboard_selection(filters)
+    df_filtered, _, _ = dashboard_data(filters, selection)
+    if df_filtered.empty:
+        return
+    if selection.file_numbers:
+        # The rollup has no File Number dimension; the accrual curve below follows that filter
+        st.subheader("📈 Daily Demurrage Trend")
+        st.caption("The daily trend covers whole clients and is hidden while File Numbers are "
+                   "selected; the Demurrage Accrual chart below shows the selected files.")
+        return
+    render_demurrage_trend(rollup, start=selection.trend_start, end=selection.as_of, clients=list(selection.clients))
+
+
+@st.fragment(key="dashboard_overview")
+@perf.fragment("dashboard_overview")
+def render_overview(filters, dwell=None):
+    selection = dashboard_selection(filters)
+    df_filtered, processed_shipments_with_demurrage, _ = dashboard_data(filters, selection)
+    if df_filtered.empty:
+        return
+
+    render_demurrage_accrual(df_filtered, start=selection.trend_start, as_of=selection.as_of)
+    if dwell is not None and "File Number" in df_filtered.columns:
+        render_dwell_times(dwell, set(df_filtered["File Number"].dropna()))
 
 
     # --- Shipment Overview (now grouped by File Number) ---
@@ -238,452 +547,53 @@ def render_dashboard(df):
     if "File Number" not in df_processed.columns or df_processed["File Number"].empty:
         st.warning("No 'File Number' data available to group shipments. Displaying all shipments directly.")
         # Fallback to original shipment overview if no file numbers
-        # We need a way to call the individual rendering without the file number context, if this happens
         render_individual_shipment_overview(df_processed, file_number_key_prefix="no_file_")
         return # Exit to prevent further errors if no file numbers
 
     unique_file_numbers = sorted(df_processed["File Number"].dropna().unique().tolist())
 
-    # Helper function for consistent date formatting
-    def format_date_for_display(value):
-        if value is None or (isinstance(value, str) and str(value).strip() == ''):
-            return ""
-        try:
-            if isinstance(value, (int, float)):
-                dt_obj = pd.to_datetime(value, unit='ms', errors='coerce')
-            else: # Assume string
-                dt_obj = pd.to_datetime(value, errors='coerce')
-            
-            if pd.notna(dt_obj):
-                return dt_obj.strftime("%Y-%m-%d") 
-            else:
-                return ""
-        except Exception as e:
-            return str(value)
-
-    # Function to get ordered border names for a truck (re-used)
-    def get_ordered_unique_border_names_from_truck(truck):
-        ordered_border_names = []
-        if "Borders" in truck and isinstance(truck["Borders"], dict):
-            seen_names = set()
-            for key in truck["Borders"].keys():
-                if "actual arrival at" in key.lower():
-                    name_part = key.replace("Actual arrival at ", "").strip()
-                    if name_part not in seen_names:
-                        ordered_border_names.append(name_part)
-                        seen_names.add(name_part)
-        return ordered_border_names
-
-    # Function to render individual shipment details (extracted for re-use)
-    # This function is now designed to be called directly, not within an expander
-    def render_individual_shipment_overview(df_shipments_to_render, file_number_key_prefix=""):
-        if "Date Submitted" in df_shipments_to_render.columns:
-            df_shipments_to_render["Date Submitted"] = pd.to_datetime(df_shipments_to_render["Date Submitted"], errors='coerce')
-            df_shipments_to_render = df_shipments_to_render.sort_values("Date Submitted", ascending=False)
-        else:
-            st.warning("'Date Submitted' column missing or invalid for sorting in grouped_df.")
-
-        for _, row in df_shipments_to_render.iterrows():
-            uid = row["Unique ID"]
-            client = row.get("Client", "Unknown")
-            transporter = row.get("Transporter", "Unknown")
-            trucks = row.get("Trucks", [])
-            date_submitted = row.get("Date Submitted")
-            truck_count = len(trucks)
-
-            shipment_type_raw = row.get("Shipment Type")
-            if pd.isna(shipment_type_raw) or shipment_type_raw is None:
-                shipment_geo_type = "Unknown"
-            else:
-                shipment_geo_type = str(shipment_type_raw).replace("-", " ")
-
-            all_offloaded = all(truck.get("Date offloaded") for truck in trucks) if trucks else False
-            
-            all_dispatched_from_borders = True
-            if trucks:
-                for truck in trucks:
-                    truck_border_names = get_ordered_unique_border_names_from_truck(truck)
-                    if truck_border_names:
-                        last_border_name = truck_border_names[-1]
-                        dispatch_key = f"Actual dispatch from {last_border_name}"
-                        if not (truck.get("Borders", {}) and pd.notna(truck["Borders"].get(dispatch_key))):
-                            all_dispatched_from_borders = False
-                            break
-                    elif shipment_geo_type.lower() == "cross border": # If shipment is explicitly cross-border but this truck has no border data
-                        if not truck.get("Date offloaded"): # and this truck isn't offloaded
-                            all_dispatched_from_borders = False
-                            break
-            else: # No trucks in shipment
-                all_dispatched_from_borders = False
-
-            partial_dispatch = any(any(f"Actual dispatch from {bn}" in truck.get("Borders", {}) and pd.notna(truck.get("Borders", {}).get(f"Actual dispatch from {bn}")) for bn in get_ordered_unique_border_names_from_truck(truck)) for truck in trucks) and not all_offloaded and not all_dispatched_from_borders
-
-
-            if not trucks:
-                status_icon, label = "🔴", "No Truck Data"
-            elif all_offloaded:
-                status_icon, label = "🟢", "All Offloaded"
-            elif all_dispatched_from_borders:
-                status_icon, label = "🟡", "Dispatched, Pending Offload"
-            elif partial_dispatch:
-                status_icon, label = "🟠", "Partially Dispatched"
-            else:
-                status_icon, label = "🔴", "Pending Dispatch"
-
-            submitted_str = date_submitted.strftime("%Y-%m-%d") if pd.notna(date_submitted) else "N/A"
-            
-            header = f"{status_icon} **{uid}** | 🏢 {client} | 🚚 {transporter} | 🛻 Trucks: {truck_count} | 🌍 **{shipment_geo_type}** | 🕒 {submitted_str} — *{label}*"
-
-            # This is the individual shipment expander
-            with st.expander(header, expanded=False): 
-                # --- Shipment Financial & Time Details (Cross Border Only) ---
-                if shipment_geo_type.lower() == "cross border":
-                    st.markdown("#### ⚙️ Shipment Financial & Time Details")
-
-                    # Data from Generator (main shipment data)
-                    free_days_lp_gen = row.get("Free Days at Loading Point", 0)
-                    # Assuming "Free days at offloading" for Cross Border refers to Free Days at Border
-                    free_days_offloading_gen = row.get("Free Days at Border", 0)
-                    demurrage_rate_gen = row.get("Demurrage Rate", 0.0)
-                    payment_terms_gen = row.get("Payment Terms", "N/A")
-
-                    # Calculated across all trucks within THIS specific shipment
-                    current_shipment_total_demurrage_cost = 0.0
-                    current_shipment_total_standing_time = 0.0
-                    current_shipment_truck_count_for_avg_standing = 0
-
-                    for truck in trucks: # 'trucks' here are already processed and contain calculated demurrage costs
-                        current_shipment_total_demurrage_cost += truck.get("Demurrage cost at Loading Point", 0.0)
-                        current_shipment_total_demurrage_cost += truck.get("Total Demurrage cost at Border", 0.0)
-
-                        if pd.notna(truck.get("Days on site")):
-                            current_shipment_total_standing_time += truck.get("Days on site", 0.0)
-                            current_shipment_truck_count_for_avg_standing += 1
-
-                    avg_standing_time_shipment = current_shipment_total_standing_time / current_shipment_truck_count_for_avg_standing \
-                                                if current_shipment_truck_count_for_avg_standing > 0 else 0.0
-
-                    st.write(f"**Free days at Loading Point:** {free_days_lp_gen} days")
-                    st.write(f"**Free days at Offloading (Border):** {free_days_offloading_gen} days")
-                    st.write(f"**Demurrage Rate:** R {demurrage_rate_gen:,.2f} per day")
-                    st.write(f"**Payment Terms:** {payment_terms_gen}")
-                    st.write(f"**Total Demurrage Cost for this Shipment:** R {current_shipment_total_demurrage_cost:,.2f}")
-                    st.write(f"**Average Standing Time per Truck:** {avg_standing_time_shipment:.1f} days")
-                    st.markdown("---") # Visual separator
-
-                if not trucks:
-                    st.info("No truck data found for this shipment.")
-                else:
-                    active_trucks = [t.copy() for t in trucks if not t.get("Cancel")]
-                    cancelled_trucks = [t.copy() for t in trucks if t.get("Cancel")]
-
-                    def get_all_unique_keys_from_nested_dict(trucks_list, parent_key):
-                        all_keys = set()
-                        for t in trucks_list:
-                            if parent_key in t and isinstance(t[parent_key], dict):
-                                all_keys.update(t[parent_key].keys())
-                        return list(all_keys)
-
-                    all_trucks_combined = active_trucks + cancelled_trucks
-
-                    trailer_keys_all_possible = get_all_unique_keys_from_nested_dict(all_trucks_combined, "Trailers")
-                    
-                    all_border_names_ordered_globally = []
-                    seen_global_border_names = set()
-                    for truck_data in all_trucks_combined:
-                        if "Borders" in truck_data and isinstance(truck_data["Borders"], dict):
-                            for key in truck_data["Borders"].keys():
-                                if "actual arrival at" in key.lower():
-                                    name_part = key.replace("Actual arrival at ", "").strip()
-                                    if name_part not in seen_global_border_names:
-                                        all_border_names_ordered_globally.append(name_part)
-                                        seen_global_border_names.add(name_part)
-                    
-                    border_display_columns = []
-                    for border_name in all_border_names_ordered_globally:
-                        border_display_columns.append(f"Actual arrival at {border_name}")
-                        border_display_columns.append(f"Actual dispatch from {border_name}")
-                        border_display_columns.append(f"Billable days at {border_name}")
-                        border_display_columns.append(f"Demurrage cost at {border_name}")
-
-
-                    # Define the insertion point for trailers
-                    base_columns_prefix = [
-                        "Truck Number", "Horse Number"
-                    ]
-                    base_columns_suffix = [
-                        "Driver Name", "Passport NO.", "Contact NO.",
-                        "Tonnage", "ETA", "Status", "Cargo Description",
-                        "Current Location", "Load Location", "Destination",
-                        "Arrived at Loading point", "Loaded Date", "Dispatch date",
-                        "Billable days at Loading Point", "Demurrage cost at Loading Point"
-                    ]
-
-                    desired_columns = (
-                        base_columns_prefix +
-                        trailer_keys_all_possible +
-                        base_columns_suffix +
-                        border_display_columns +
-                        [
-                            "Date Arrived", "Date offloaded",
-                            "Total Billable days at Borders", "Total Demurrage cost at Border",
-                            "Cancel", "Flag", "Comment"
-                        ]
-                    )
-                    desired_columns = list(dict.fromkeys(desired_columns))
-
-
-                    if active_trucks:
-                        st.markdown("#### ✅ Active Trucks")
-
-                        cleaned_data = []
-                        for truck_data in active_trucks:
-                            row = {}
-                            for border_name in all_border_names_ordered_globally:
-                                row[f"Actual arrival at {border_name}"] = ""
-                                row[f"Actual dispatch from {border_name}"] = ""
-                                row[f"Billable days at {border_name}"] = ""
-                                row[f"Demurrage cost at {border_name}"] = ""
-                            row["Total Billable days at Borders"] = ""
-                            row["Total Demurrage cost at Border"] = ""
-
-
-                            for col in desired_columns:
-                                if col in ["Cancel", "Flag"]:
-                                    row[col] = bool(truck_data.get(col, False))
-                                elif col in truck_data.get("Trailers", {}):
-                                    row[col] = truck_data.get("Trailers", {}).get(col, "")
-                                elif col.startswith("Actual arrival at ") or col.startswith("Actual dispatch from "):
-                                    if "Borders" in truck_data and isinstance(truck_data["Borders"], dict):
-                                        row[col] = format_date_for_display(truck_data["Borders"].get(col))
-                                # Apply the helper function for other direct date columns
-                                elif col in ["Arrived at Loading point", "Loaded Date", "Dispatch date", "Date Arrived", "Date offloaded", "ETA"]:
-                                    row[col] = format_date_for_display(truck_data.get(col))
-                                elif col.startswith("Billable days at ") or col.startswith("Demurrage cost at ") or \
-                                    col == "Total Billable days at Borders" or col == "Total Demurrage cost at Border":
-                                    row[col] = truck_data.get(col, "")
-                                else:
-                                    row[col] = truck_data.get(col, "")
-                            cleaned_data.append(row)
-
-                        active_df = pd.DataFrame(cleaned_data)
-
-                        num_cols = [col for col in active_df.columns if any(x in col.lower() for x in ["ton", "days", "cost", "rate", "weight"])]
-                        for col in num_cols:
-                            active_df[col] = (
-                                pd.to_numeric(active_df[col], errors="coerce")
-                                .apply(lambda x: f"{x:,.2f}" if pd.notna(x) else ("" if "cost" in col.lower() or "days" in col.lower() else ""))
-                            )
-                            if "cost" in col.lower():
-                                active_df[col] = active_df[col].apply(lambda x: f"R {x}" if x not in ["", None, "R "] else "")
-
-                        column_config = {
-                            col: st.column_config.TextColumn(col, disabled=True)
-                            for col in active_df.columns
-                        }
-
-                        column_config["Cancel"] = st.column_config.CheckboxColumn("Cancel", disabled=True)
-                        column_config["Flag"] = st.column_config.CheckboxColumn("Flag", disabled=True)
-
-                        st.data_editor(
-                            active_df,
-                            use_container_width=True,
-                            key=f"active_editor_{file_number_key_prefix}{uid}", # Unique key for editor
-                            hide_index=True,
-                            column_config=column_config,
-                            column_order=desired_columns
-                        )
-                    else:
-                        st.info("No active trucks.")
-
-
-                    if cancelled_trucks:
-                        st.markdown("#### ❌ Cancelled Trucks")
-
-                        cleaned_data = []
-                        for truck_data in cancelled_trucks:
-                            row = {}
-                            for border_name in all_border_names_ordered_globally:
-                                row[f"Actual arrival at {border_name}"] = ""
-                                row[f"Actual dispatch from {border_name}"] = ""
-                                row[f"Billable days at {border_name}"] = ""
-                                row[f"Demurrage cost at {border_name}"] = ""
-                            row["Total Billable days at Borders"] = ""
-                            row["Total Demurrage cost at Border"] = ""
-
-                            for col in desired_columns:
-                                if col in ["Cancel", "Flag"]:
-                                    row[col] = bool(truck_data.get(col, False))
-                                elif col in truck_data.get("Trailers", {}):
-                                    row[col] = truck_data.get("Trailers", {}).get(col, "")
-                                elif col.startswith("Actual arrival at ") or col.startswith("Actual dispatch from "):
-                                    if "Borders" in truck_data and isinstance(truck_data["Borders"], dict):
-                                        row[col] = format_date_for_display(truck_data["Borders"].get(col))
-                                # Apply the helper function for other direct date columns
-                                elif col in ["Arrived at Loading point", "Loaded Date", "Dispatch date", "Date Arrived", "Date offloaded", "ETA"]:
-                                    row[col] = format_date_for_display(truck_data.get(col))
-                                elif col.startswith("Billable days at ") or col.startswith("Demurrage cost at ") or \
-                                    col == "Total Billable days at Borders" or col == "Total Demurrage cost at Border":
-                                    row[col] = truck_data.get(col, "")
-                                else:
-                                    row[col] = truck_data.get(col, "")
-                            cleaned_data.append(row)
-
-                        cancelled_df = pd.DataFrame(cleaned_data)
-
-                        num_cols = [col for col in cancelled_df.columns if any(x in col.lower() for x in ["ton", "days", "cost", "rate", "weight"])]
-                        for col in num_cols:
-                            cancelled_df[col] = (
-                                pd.to_numeric(cancelled_df[col], errors="coerce")
-                                .apply(lambda x: f"{x:,.2f}" if pd.notna(x) else ("" if "cost" in col.lower() or "days" in col.lower() else ""))
-                            )
-                            if "cost" in col.lower():
-                                cancelled_df[col] = cancelled_df[col].apply(lambda x: f"R {x}" if x not in ["", None, "R "] else "")
-
-
-                        column_config = {
-                            col: st.column_config.TextColumn(col, disabled=True)
-                            for col in cancelled_df.columns
-                        }
-                        column_config["Cancel"] = st.column_config.CheckboxColumn("Cancel", disabled=True)
-                        column_config["Flag"] = st.column_config.CheckboxColumn("Flag", disabled=True)
-
-                        st.data_editor(
-                            cancelled_df,
-                            use_container_width=True,
-                            key=f"cancelled_editor_{file_number_key_prefix}{uid}", # Unique key for editor
-                            hide_index=True,
-                            column_config=column_config,
-                            disabled=True,
-                            height=min(len(cancelled_df) * 35 + 50, 700),
-                            column_order=desired_columns
-                        )
-                    else:
-                        st.info("No cancelled trucks.")
-
-                    def render_truck_status_summary(df_summary, title="📊 Truck Status Summary"):
-                        possible_status_cols = ["truck status", "status"]
-                        status_col = next((col for col in df_summary.columns if col.strip().lower() in possible_status_cols), None)
-
-                        if status_col and not df_summary.empty:
-                            status_summary = df_summary[status_col].value_counts()
-                            if not status_summary.empty:
-                                st.markdown(f"##### {title}:") # Changed to h5 for nested hierarchy
-                                for label, count in status_summary.items():
-                                    st.markdown(f"- **{count} truck(s)** — {label}")
-                            else:
-                                st.info("No truck statuses to summarize.")
-                        else:
-                            st.info("No status column found to summarize.")
-
-                    if not active_df.empty:
-                        render_truck_status_summary(active_df, title="Active Truck Status Summary")
-                    else:
-                        st.info("No active trucks for status summary.")
-
-                    # --- Original Individual Shipment Download Button ---
-                    download_df_single_shipment = pd.DataFrame(trucks)
-                    csv_data_single_shipment = download_df_single_shipment.to_csv(index=False).encode("utf-8")
-                    st.download_button(
-                        label="📄 Download Truck Data (CSV) for this Shipment",
-                        data=csv_data_single_shipment,
-                        file_name=f"{uid}_trucks.csv",
-                        mime="text/csv",
-                        key=f"dl_single_{file_number_key_prefix}{uid}"
-                    )
-
-
     # Main loop for File Number grouping - NO NESTED EXPANDERS HERE
-    for file_num in unique_file_numbers:
-        file_shipments = df_processed[df_processed["File Number"] == file_num]
+    with perf.span("dashboard.file_groups", rows=len(unique_file_numbers)):
+        for file_num in unique_file_numbers:
+            file_shipments = df_processed[df_processed["File Number"] == file_num]
         
-        # Calculate summary for the file number for the header
-        file_total_shipments = file_shipments["Unique ID"].nunique()
-        file_total_trucks = sum(len(s.get("Trucks", [])) for _, s in file_shipments.iterrows())
+            # Calculate summary for the file number for the header
+            file_total_shipments = file_shipments["Unique ID"].nunique()
+            file_total_trucks = sum(len(s.get("Trucks", [])) for _, s in file_shipments.iterrows())
         
-        # Using markdown for a prominent header instead of an expander
-        st.markdown(f"---") # Separator between file numbers
-        st.markdown(f"## 🗄️ File Number: {file_num} | Shipments: {file_total_shipments} | Trucks: {file_total_trucks}")
+            # Using markdown for a prominent header instead of an expander
+            st.markdown(f"---") # Separator between file numbers
+            st.markdown(f"## 🗄️ File Number: {file_num} | Shipments: {file_total_shipments} | Trucks: {file_total_trucks}")
         
-        # Render individual shipments for this file number directly below the header
-        render_individual_shipment_overview(file_shipments, file_number_key_prefix=f"{file_num}_")
-
-        # --- NEW: Consolidated Download for the entire File Number ---
-        all_trucks_for_file = []
-        for _, shipment_row in file_shipments.iterrows():
-            for truck_data in shipment_row.get("Trucks", []):
-                # Make a copy to avoid modifying original nested data
-                truck_copy_for_excel = truck_data.copy() 
-                # Add shipment-level details to each truck row for context in Excel
-                truck_copy_for_excel["Parent Shipment ID"] = shipment_row.get("Unique ID")
-                truck_copy_for_excel["Parent Shipment Type"] = shipment_row.get("Shipment Type")
-                truck_copy_for_excel["Parent Shipment Client"] = shipment_row.get("Client")
-                truck_copy_for_excel["Parent Shipment Transporter"] = shipment_row.get("Transporter")
-                truck_copy_for_excel["Parent Shipment Date Submitted"] = format_date_for_display(shipment_row.get("Date Submitted"))
-                truck_copy_for_excel["File Number"] = shipment_row.get("File Number") # Ensure File Number is on truck level
-
-                # Flatten 'Trailers' and 'Borders' dictionaries into top-level columns for Excel export
-                if "Trailers" in truck_copy_for_excel and isinstance(truck_copy_for_excel["Trailers"], dict):
-                    for k, v in truck_copy_for_excel["Trailers"].items():
-                        truck_copy_for_excel[f"Trailer - {k}"] = v
-                    del truck_copy_for_excel["Trailers"] # Remove the nested dict
-
-                if "Borders" in truck_copy_for_excel and isinstance(truck_copy_for_excel["Borders"], dict):
-                    for k, v in truck_copy_for_excel["Borders"].items():
-                        # Format border dates for Excel
-                        if "arrival at" in k.lower() or "dispatch from" in k.lower():
-                            truck_copy_for_excel[f"Border - {k}"] = format_date_for_display(v)
-                        else:
-                            truck_copy_for_excel[f"Border - {k}"] = v
-                    del truck_copy_for_excel["Borders"] # Remove the nested dict
-
-                all_trucks_for_file.append(truck_copy_for_excel)
-
-        if all_trucks_for_file:
-            # Create a DataFrame from the flattened truck data
-            consolidated_truck_df = pd.DataFrame(all_trucks_for_file)
-
-            # Re-apply date formatting for direct date columns that might not have been flattened
-            date_cols_to_format = [
-                "ETA", "Date Arrived", "Date offloaded", 
-                "Arrived at Loading point", "Loaded Date", "Dispatch date"
-            ]
-            for col in date_cols_to_format:
-                if col in consolidated_truck_df.columns:
-                    consolidated_truck_df[col] = consolidated_truck_df[col].apply(format_date_for_display)
-
-            preferred_order_for_excel = [
-                "File Number", # Moved to be very prominent
-                "Parent Shipment ID", "Parent Shipment Type", "Parent Shipment Client",
-                "Parent Shipment Transporter", "Parent Shipment Date Submitted",
-                "Unique ID", # The original shipment ID for the truck's parent (might be redundant with Parent Shipment ID)
-                "Truck Number", "Horse Number"
-            ]
-            # Add all trailer and border specific columns dynamically
-            trailer_cols = sorted([col for col in consolidated_truck_df.columns if col.startswith("Trailer - ")]) # Sort for consistency
-            border_cols = sorted([col for col in consolidated_truck_df.columns if col.startswith("Border - ")]) # Sort for consistency
-            
-            # Add other standard truck columns
-            other_cols = [col for col in consolidated_truck_df.columns if col not in preferred_order_for_excel + trailer_cols + border_cols]
-            
-            # Sort other_cols alphabetically for consistency
-            other_cols.sort()
-
-            final_excel_column_order = preferred_order_for_excel + trailer_cols + border_cols + other_cols
-            
-            # Filter to only include columns that actually exist in the DataFrame
-            final_excel_column_order_existing = [col for col in final_excel_column_order if col in consolidated_truck_df.columns]
-
-            consolidated_truck_df = consolidated_truck_df[final_excel_column_order_existing]
-
-
-            csv_data_file = consolidated_truck_df.to_csv(index=False).encode("utf-8")
-            st.download_button(
-                label=f"⬇️ Download All Trucks for File {file_num} (CSV)",
-                data=csv_data_file,
-                file_name=f"File_{file_num}_All_Trucks.csv",
-                mime="text/csv",
-                key=f"dl_file_{file_num}"
-            )
-        else:
-            st.info(f"No truck data available for File Number {file_num} to download.")
\ No newline at end of file
+            # Render individual shipments for this file number directly below the header
+            render_individual_shipment_overview(file_shipments, file_number_key_prefix=f"{file_num}_")
+
+            # --- NEW: Consolidated Download for the entire File Number ---
+            if file_total_trucks:
+                st.download_button(
+                    label=f"⬇️ Download All Trucks for File {file_num} (Excel)",
+                    data=partial(file_workbook, file_shipments, selection.as_of if selection.as_of_mode else None),
+                    file_name=f"File_{file_num}_All_Trucks.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    key=f"dl_file_{file_num}",
+                    on_click="ignore",
+                )
+            else:
+                st.info(f"No truck data available for File Number {file_num} to download.")
+
+
+def render_dashboard(df, rollup=None, alerts=None, dwell=None, filters=None):
+    st.markdown("## 📊 Shipment Dashboard")
+    st.markdown("Get insights into submitted shipments, truck performance, and site activity.")
+
+    # --- Filters Section ---
+    # The filter index is built once per snapshot; each filter is a mask lookup
+    if filters is None:
+        filters = FilterIndex(df)
+    with st.sidebar:
+        render_filters(filters)
+
+    render_kpis(filters, alerts)
+    if rollup is not None:
+        render_trend_section(filters, rollup)
+    render_overview(filters, dwell)
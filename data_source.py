@@ -0,0 +1,88 @@
+import threading
+
+import pandas as pd
+import perf
+
+# --- Shipment data access shared by the Streamlit app and the offline tools ---
+
+# A "mongomock://" URI in secrets swaps MongoDB for an in-process stand-in, used by the
+# benchmarks and load tests. All stand-in clients in a process share one store.
+MOCK_URI_PREFIX = "mongomock://"
+_mock_store = None
+_mock_lock = threading.Lock()
+
+
+def enable_copy_on_write():
+    """Turns on pandas Copy-on-Write so shallow copies of shared frames never write through."""
+    # Always on (and the option deprecated) from pandas 3.0
+    if int(pd.__version__.split(".")[0]) < 3:
+        pd.set_option("mode.copy_on_write", True)
+
+
+def as_datetime(series):
+    """Returns `series` as datetimes, without reparsing (or copying) a column that already is one."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    return pd.to_datetime(series, errors="coerce")
+
+
+def connect(mongo_uri):
+    """Returns a MongoDB client for `mongo_uri`, or a shared mongomock client for mongomock:// URIs."""
+    global _mock_store
+    if mongo_uri.startswith(MOCK_URI_PREFIX):
+        import mongomock
+        from mongomock.mongo_client import ServerStore
+
+        with _mock_lock:
+            if _mock_store is None:
+                _mock_store = ServerStore()
+        return mongomock.MongoClient(_store=_mock_store)
+
+    from pymongo import MongoClient
+    return MongoClient(mongo_uri)
+
+
+def load_shipments(collection):
+    """Loads every shipment document from `collection` into a cleaned pandas DataFrame."""
+    # Retrieve all documents from the collection
+    items = collection.find()
+    # Convert the cursor to a list and then to a DataFrame
+    with perf.span("load_data.fetch") as s:
+        df = pd.DataFrame(list(items))
+        s["rows"] = len(df)
+
+    # --- Data Cleaning and Type Conversion ---
+    with perf.span("load_data.convert", rows=len(df)):
+        if not df.empty:
+            # Convert MongoDB ObjectId to string for easier handling/display
+            if '_id' in df.columns:
+                df['_id'] = df['_id'].astype(str)
+
+            # List of columns expected to contain dates/datetimes
+            date_cols = [
+                "Date Submitted", "Date", "Load Start Date", "Load End Date",
+                "ETA", "Actual arrival date", "Actual loading date",
+                "Offloading arrival", "Date offloaded"
+                ] + [col for col in df.columns if "arrival at" in col.lower() or "dispatch from" in col.lower()] # Include dynamic border columns
+
+            for col in date_cols:
+                if col in df.columns:
+                    # Convert to datetime, coercing errors (invalid dates become NaT). Columns of
+                    # BSON dates already arrive as datetime64 and are not parsed again.
+                    df[col] = as_datetime(df[col])
+
+            # List of columns expected to contain numeric values
+            numeric_cols = [
+                "Truck Count", "Truck Number", "Load capacity",
+                "Gross weight", "Net weight", "Standing time billable days",
+                "Standing time charges", "Whiskey in", "Whiskey out",
+                "Standing days", "Billable standing days", "Rate per Ton",
+                "Free Days at Border", "Free Days at Offloading Point", "Days on site"
+                ]
+
+            for col in numeric_cols:
+                if col in df.columns:
+                    # Convert to numeric, coercing errors (invalid values become NaN)
+                    df[col] = pd.to_numeric(df[col], errors="coerce")
+
+    return df
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+from data_source import as_datetime
+from seamaster_core import MemoryCache
+
+# --- Sidebar filter index ---
+# Built once per snapshot: "Date Submitted" is parsed once, and Client and File Number are
+# encoded as integer category codes over a sorted dictionary of their values. A filter is an
+# intersection of boolean row masks (a date-range mask, and the OR of one cached mask per
+# selected value), and the option lists are the codes present under the masks before them.
+# Results are memoized per (date range, as-of cut-off, clients, file numbers) in a small LRU,
+# so switching back to a recent filter combination costs a dictionary lookup.
+
+FILTER_COLUMNS = ["Client", "File Number"]
+
+
+class FilterIndex:
+    """Category dictionaries and memoized row masks for the dashboard's sidebar filters."""
+
+    def __init__(self, df, cache_size=32, name="sidebar filters"):
+        if "Date Submitted" in df.columns:
+            date_submitted = as_datetime(df["Date Submitted"])
+            # Rows whose Date Submitted could not be parsed are never shown (a mask, not a copy)
+            df = df.assign(**{"Date Submitted": date_submitted})[date_submitted.notna()]
+            self._dates = df["Date Submitted"].to_numpy()
+        else:
+            self._dates = None
+        self.frame = df
+
+        self._codes = {}
+        self._categories = {}
+        for column in FILTER_COLUMNS:
+            if column in df.columns:
+                categorical = pd.Categorical(df[column])
+                self._codes[column] = categorical.codes
+                self._categories[column] = categorical.categories.tolist()
+
+        self._value_masks = {}  # (column, code) -> rows with that value
+        self.results = MemoryCache(name, max_entries=cache_size)  # filter key -> mask or option list
+
+    def date_bounds(self):
+        """(first, last) submission dates, or None without parseable dates."""
+        if self._dates is None or len(self._dates) == 0:
+            return None
+        return pd.Timestamp(self._dates.min()).date(), pd.Timestamp(self._dates.max()).date()
+
+    def _value_mask(self, column, code):
+        key = (column, code)
+        mask = self._value_masks.get(key)
+        if mask is None:
+            mask = self._codes[column] == code
+            self._value_masks[key] = mask
+        return mask
+
+    def _column_mask(self, column, values):
+        codes = self._codes.get(column)
+        if codes is None or not values:
+            return None
+        lookup = {value: code for code, value in enumerate(self._categories[column])}
+        mask = np.zeros(len(codes), dtype=bool)
+        for value in values:
+            code = lookup.get(value)
+            if code is not None:
+                mask |= self._value_mask(column, code)
+        return mask
+
+    def mask(self, date_range=None, until=None, clients=(), file_numbers=()):
+        """
+        Rows of `frame` submitted within `date_range` (a pair of datetimes) and up to `until`,
+        for the given clients and file numbers (empty means no filter on that column).
+        """
+        key = ("mask", date_range, until, tuple(clients), tuple(file_numbers))
+
+        def compute():
+            mask = np.ones(len(self.frame), dtype=bool)
+            if self._dates is not None:
+                if date_range is not None:
+                    start, end = (np.datetime64(pd.Timestamp(d)) for d in date_range)
+                    mask &= (self._dates >= start) & (self._dates <= end)
+                if until is not None:
+                    mask &= self._dates <= np.datetime64(pd.Timestamp(until))
+            for column, values in (("Client", clients), ("File Number", file_numbers)):
+                column_mask = self._column_mask(column, values)
+                if column_mask is not None:
+                    mask &= column_mask
+            return mask
+
+        return self.results.get_or_set(key, compute)
+
+    def options(self, column, date_range=None, until=None, clients=()):
+        """Sorted distinct values of `column` among the rows the earlier filters keep."""
+        key = ("options", column, date_range, until, tuple(clients))
+
+        def compute():
+            codes = self._codes.get(column)
+            if codes is None:
+                return []
+            present = np.unique(codes[self.mask(date_range, until, clients)])
+            categories = self._categories[column]
+            return [categories[code] for code in present if code >= 0]
+
+        return self.results.get_or_set(key, compute)
+
+    def select(self, date_range=None, until=None, clients=(), file_numbers=()):
+        """The filtered rows of `frame` (a view, not a copy)."""
+        mask = self.mask(date_range, until, clients, file_numbers)
+        return self.frame if mask.all() else self.frame[mask]
@@ -1,21 +1,14 @@
 import streamlit as st
-import pandas as pd
 import uuid
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
 from datetime import datetime
-import fitz  # PyMuPDF
 from io import BytesIO
-
-# --- MongoDB Setup ---
-try:
-    mongo_uri = st.secrets["mongo_uri"]
-    client = MongoClient(mongo_uri)
-    db = client["seamaster"]
-    shipments_collection = db["shipments"]
-except ConnectionFailure as e:
-    st.error(f"Could not connect to MongoDB: {e}")
-    st.stop()
+import perf
+from background_jobs import DONE, FAILED, JobRunner
+from pdf_preview import DEFAULT_DPI, get_order_cache, order_key
+from seamaster_core.borders import new_border_records
+from seamaster_core.versions import insert_shipment
+from snapshot import notify_data_changed
+from truck_manifest import append_truck_manifest
 
 
 # --- Generate PDF with a Styled Table in the Template ---
@@ -24,11 +17,13 @@ def generate_pdf_with_template(template_path, shipment_data, unique_id, shipment
     Generates a PDF based on a template, populating a styled table with shipment data.
     Adjusts text placement within columns for better readability.
     """
+    import fitz  # PyMuPDF, loaded on first use to keep app start-up fast
+
+    # Runs on a background worker, so a missing template is raised rather than shown
     try:
         doc = fitz.open(template_path)
     except fitz.FileNotFoundError:
-        st.error(f"PDF template file not found at: {template_path}")
-        return None # Return None if template is not found
+        raise FileNotFoundError(f"PDF template file not found at: {template_path}")
 
     # Remove second page for cross-border shipments if it exists
     if shipment_type == "Cross-Border" and doc.page_count > 1:
@@ -46,7 +41,7 @@ def generate_pdf_with_template(template_path, shipment_data, unique_id, shipment
 
     # Fields to exclude from the PDF table by default for ALL shipment types
     exclude_fields = [
-        'Trucks', 'Borders', 'Unique ID', 'Trailers', '_id',
+        'Trucks', 'Borders', 'Unique ID', 'Trailers', '_id', 'Version',
         'Escorts arranged', 'Loading Capacity', 'Comments',
         'Client', 'Issued By' # <-- ADDED: Exclude Client and Issued By from PDF
     ]
@@ -114,6 +109,9 @@ def generate_pdf_with_template(template_path, shipment_data, unique_id, shipment
 
         y0 += row_height # Move down for the next row
 
+    # The trucks, which the table above leaves out, on manifest pages at the end
+    append_truck_manifest(doc, shipment_data)
+
     # Save the modified PDF to a BytesIO object
     output_stream = BytesIO()
     doc.save(output_stream)
@@ -122,8 +120,83 @@ def generate_pdf_with_template(template_path, shipment_data, unique_id, shipment
     return output_stream
 
 
+# --- Background save ---
+# "Generate and Save" hands the shipment to a background job that saves it and renders its
+# PDF, and the form polls the job. The job key is the shipment's Unique ID, created once per
+# form: clicking again (or a retried rerun) returns the same job, and the insert itself is
+# idempotent on the Unique ID, so one form never saves two shipments.
+@st.cache_resource
+def get_job_runner():
+    """Process-wide worker pool for shipment saves and PDF rendering."""
+    return JobRunner(max_workers=2)
+
+def preview_dpi():
+    """Resolution of the transport order previews, `pdf_preview_dpi` in secrets."""
+    return int(st.secrets.get("pdf_preview_dpi", DEFAULT_DPI))
+
+def order_cache():
+    """The shared transport order cache, on disk under `pdf_cache_dir` (at most `pdf_cache_mb` MB) when set."""
+    return get_order_cache(st.secrets.get("pdf_cache_dir"), int(st.secrets.get("pdf_cache_mb", 256)))
+
+def save_and_render(job, collection, shipment_data, shipment_type, dpi=DEFAULT_DPI):
+    """
+    The background job: saves the shipment as version 1, then renders its PDF and a preview of
+    page 1 through the order cache. Returns (shipment, PDF bytes, PNG preview).
+    """
+    job.update("Saving the shipment", 0.1)
+    with job.timed("save"):
+        shipment_data = insert_shipment(collection, shipment_data)
+    notify_data_changed() # Reload the shared snapshot so the new shipment shows up
+
+    job.update("Rendering the PDF", 0.6)
+    template_path = "transport_order_template.pdf"
+    with job.timed("pdf"):
+        pdf_bytes, preview = order_cache().order(
+            order_key(template_path, shipment_data, "generate_id", shipment_type),
+            lambda: generate_pdf_with_template(
+                template_path=template_path,
+                shipment_data=shipment_data,
+                unique_id=shipment_data["Unique ID"],
+                shipment_type=shipment_type # Pass shipment_type to PDF generator
+            ),
+            dpi,
+        )
+    job.update("Done", 1.0)
+    return shipment_data, pdf_bytes, preview
+
+def new_shipment_form():
+    """Starts a fresh form: a new Unique ID, which is also the next save's idempotency key."""
+    st.session_state["generate_id_key"] = str(uuid.uuid4())
+
+def render_save_result(job):
+    """The outcome of a finished save: the PDF download and preview, or the error with a retry hint."""
+    if job.status == FAILED:
+        st.error(f"🚫 The shipment could not be saved: {job.error}. Press Generate and Save to try again.")
+        return
+    shipment_data, pdf_bytes, preview = job.result
+    unique_id = shipment_data["Unique ID"]
+    st.image(preview, caption=f"Transport order {unique_id}, page 1", width=420)
+    st.download_button(
+        label="Download Shipment PDF",
+        data=pdf_bytes,
+        file_name=f"shipment_{unique_id}.pdf",
+        mime="application/pdf",
+        on_click="ignore",
+    )
+    timings = ", ".join(f"{name} {seconds:.2f} s" for name, seconds in job.timings.items())
+    st.success(f"Shipment {unique_id} saved and PDF generated successfully! ({timings})")
+    st.button("➕ New Shipment", on_click=new_shipment_form, help="Clears the saved state so the form creates another shipment")
+
+@st.fragment(run_every=0.5)
+def render_save_progress(job_key):
+    """Polls a running save twice a second; when it finishes, reruns the view to show the result."""
+    job = get_job_runner().get(job_key)
+    if job is None or job.finished:
+        st.rerun()
+    st.progress(job.progress, text=f"⏳ {job.stage}…")
+
 # --- Streamlit Form Logic ---
-def render_generateID(df):
+def render_generateID(df, shipments_collection=None):
     st.markdown("### 🎯 Generate a New Shipment ID")
 
     shipment_type = st.radio(
@@ -212,12 +285,20 @@ def render_generateID(df):
     st.markdown("### 🚛 Trailer Setup")
     trailer_count = st.selectbox("Select number of trailers per truck", options=[1, 2])
 
-    if st.button("🚀 Generate and Save"):
+    st.session_state.setdefault("generate_id_key", str(uuid.uuid4()))
+    unique_id = st.session_state["generate_id_key"]
+    job = get_job_runner().get(unique_id)
+    saving = job is not None and not job.finished
+
+    if st.button("🚀 Generate and Save", disabled=saving):
         required_fields = [transporter, cargo, loading_point, offloading_point, file_number, client_name]
         if not all(required_fields):
             st.warning("Please fill in all required fields.")
+        elif job is not None and job.status == DONE:
+            st.info(f"This form was already saved as shipment {unique_id}. Press New Shipment to save another.")
+        elif shipments_collection is None:
+            st.error("🚫 Not connected to MongoDB, so the shipment could not be saved.")
         else:
-            unique_id = str(uuid.uuid4())
             trailers = ["Trailer A"] + (["Trailer B"] if trailer_count == 2 else [])
             trucks_array = []
 
@@ -249,15 +330,11 @@ def render_generateID(df):
                     "Comments": comments
                 }
                 
-                # --- MODIFIED SECTION FOR BORDERS ---
+                # Borders are stored as ordered {name, arrival, dispatch} records
                 if shipment_type == "Cross-Border":
-                    truck_data["Borders"] = {}
-                    for b in borders:
-                        truck_data["Borders"][f"Actual arrival at {b}"] = None
-                        truck_data["Borders"][f"Actual dispatch from {b}"] = None
+                    truck_data["Borders"] = new_border_records(borders)
                 else:
-                    truck_data["Borders"] = {} # No borders for local
-                # --- END OF MODIFIED SECTION ---
+                    truck_data["Borders"] = [] # No borders for local
 
                 trucks_array.append(truck_data)
 
@@ -285,36 +362,22 @@ def render_generateID(df):
                 shipment_data["Free Days at Loading Point"] = free_days_loading
                 shipment_data["Demurrage Rate"] = demurrage_rate
                 
-                shipment_data["Borders"] = {}
-                for b in borders:
-                        shipment_data["Borders"][f"Actual arrival at {b}"] = None
-                        shipment_data["Borders"][f"Actual dispatch from {b}"] = None
+                shipment_data["Borders"] = new_border_records(borders)
             else:
                 shipment_data["Agent Details (Country 1)"] = ""
                 shipment_data["Agent Details (Country 2)"] = ""
                 shipment_data["Free Days at Border"] = 0
                 shipment_data["Free Days at Loading Point"] = 0
                 shipment_data["Demurrage Rate"] = 0.0
-                shipment_data["Borders"] = {} # No borders for local
-
+                shipment_data["Borders"] = [] # No borders for local
 
-            # Save to MongoDB
-            shipments_collection.insert_one(shipment_data)
+            # Save (as version 1, every date a BSON date) and render the PDF in the background
+            with perf.span("generate_id.submit", rows=truck_count):
+                job = get_job_runner().submit(unique_id, save_and_render, shipments_collection, shipment_data, shipment_type,
+                                               preview_dpi())
 
-            # Generate and stream the PDF
-            pdf_stream = generate_pdf_with_template(
-                template_path="transport_order_template.pdf",
-                shipment_data=shipment_data,
-                unique_id=unique_id,
-                shipment_type=shipment_type # Pass shipment_type to PDF generator
-            )
-
-            if pdf_stream: # Only offer download if PDF generation was successful
-                st.download_button(
-                    label="Download Shipment PDF",
-                    data=pdf_stream,
-                    file_name=f"shipment_{unique_id}.pdf",
-                    mime="application/pdf"
-                )
-
-            st.success("Shipment saved and PDF generated successfully!")
\ No newline at end of file
+    if job is not None:
+        if job.finished:
+            render_save_result(job)
+        else:
+            render_save_progress(unique_id)
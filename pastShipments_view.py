@@ -2,8 +2,12 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime
 import io
-import fitz  # PyMuPDF
 from io import BytesIO
+import perf
+from data_source import as_datetime
+from generateId_view import order_cache, preview_dpi
+from pdf_preview import order_key
+from truck_manifest import append_truck_manifest
 
 # --- Generate PDF with a Styled Table in the Template ---
 def generate_pdf_with_template(template_path, shipment_data, unique_id):
@@ -11,6 +15,8 @@ def generate_pdf_with_template(template_path, shipment_data, unique_id):
     Generates a PDF based on a template, populating a styled table with shipment data.
     Adjusts text placement within columns for better readability.
     """
+    import fitz  # PyMuPDF, loaded on first use to keep app start-up fast
+
     try:
         doc = fitz.open(template_path)
     except fitz.FileNotFoundError:
@@ -103,6 +109,9 @@ def generate_pdf_with_template(template_path, shipment_data, unique_id):
 
         y0 += row_height # Move down for the next row
 
+    # The trucks, which the table above leaves out, on manifest pages at the end
+    append_truck_manifest(doc, shipment_data)
+
     # Save the modified PDF to a BytesIO object
     output_stream = BytesIO()
     doc.save(output_stream)
@@ -110,39 +119,197 @@ def generate_pdf_with_template(template_path, shipment_data, unique_id):
     output_stream.seek(0) # Reset stream position to the beginning
     return output_stream
 
-def render_shipments(df):
+def latest_shipment_per_id(df_valid_dates):
+    """Keeps the most recently submitted row for each Unique ID."""
+    return (
+        df_valid_dates.sort_values("Date Submitted", ascending=False)
+        .groupby("Unique ID").first()
+        .reset_index()
+    )
+
+def current_shipments(df_valid_dates):
+    """
+    One row per Unique ID, in ID order. A versioned collection only holds current documents,
+    so its rows are used as they are; grouping by ID is only needed for a collection not yet
+    moved to versions (python -m seamaster_core version-shipments).
+    """
+    if df_valid_dates["Unique ID"].is_unique:
+        return df_valid_dates.sort_values("Unique ID", ignore_index=True)
+    return latest_shipment_per_id(df_valid_dates)
+
+def render_version_history(collection, unique_id):
+    """Lists the superseded versions of a shipment, read from the history collection on request."""
+    from seamaster_core import shipment_history
+
+    history = shipment_history(collection, unique_id)
+    if not history:
+        st.info(f"No earlier versions of Shipment ID: {unique_id}")
+        return
+    history_cols = ["Version", "Superseded At", "Date Submitted", "Transporter", "Client", "File Number", "Truck Count"]
+    history_df = pd.DataFrame(history)
+    st.dataframe(history_df[[c for c in history_cols if c in history_df.columns]],
+                 use_container_width=True, hide_index=True)
+
+
+PREVIEW_TEMPLATE = "transport_order_template.pdf"
+PREVIEW_GALLERY_SIZE = 12  # Shipments previewed at once, from the top of the table
+
+def shipment_pdf_data(shipment_row):
+    """The fields of a shipment row that generate_pdf_with_template reads."""
+    # Extract all relevant fields into a dictionary for PDF generation
+    # It's crucial that "Shipment Type" is included here so generate_pdf_with_template can read it
+    return {
+        "Unique ID": shipment_row.get("Unique ID", ""),
+        "Date Submitted": shipment_row.get("Date Submitted", ""),
+        "Transporter": shipment_row.get("Transporter", ""),
+        "Transporter Details": shipment_row.get("Transporter Details", ""),
+        "Transporter Contact Details": shipment_row.get("Transporter Contact Details", ""),
+        "Cargo Type": shipment_row.get("Cargo Type", ""),
+        "Loading Point": shipment_row.get("Loading Point", ""),
+        "Offloading Point": shipment_row.get("Offloading Point", ""),
+        "Tonnage": shipment_row.get("Tonnage", ""),
+        "File Number": shipment_row.get("File Number", ""),
+        "Truck Count": shipment_row.get("Truck Count", ""),
+        "Agent Details (Country 1)": shipment_row.get("Agent Details (Country 1)", ""),
+        "Agent Details (Country 2)": shipment_row.get("Agent Details (Country 2)", ""),
+        "Load Start Date": shipment_row.get("Load Start Date", ""),
+        "Load End Date": shipment_row.get("Load End Date", ""),
+        "Rate per Ton": shipment_row.get("Rate per Ton", ""),
+        "Truck Type": shipment_row.get("Truck Type", ""),
+        "Free Days at Border": shipment_row.get("Free Days at Border", ""),
+        "Free Days at Loading Point": shipment_row.get("Free Days at Loading Point", ""),
+        "Demurrage Rate": shipment_row.get("Demurrage Rate", ""),
+        "Escorts arranged": shipment_row.get("Escorts arranged", ""),
+        "Loading Capacity": shipment_row.get("Loading Capacity", ""),
+        "Comments": shipment_row.get("Comments", ""),
+        "Client": shipment_row.get("Client", ""), # Ensure Client is pulled from DB
+        "Issued By": shipment_row.get("Issued By", ""), # Ensure Issued By is pulled from DB
+        "Payment Terms": shipment_row.get("Payment Terms", ""), # Ensure Payment Terms is pulled from DB
+        "Payment Method": shipment_row.get("Payment Method", ""), # Ensure Payment Method is pulled from DB
+        "Borders": shipment_row.get("Borders", []),
+        "Trucks": shipment_row.get("Trucks", []),
+        "Trailers": shipment_row.get("Trailers", {}),
+        "Shipment Type": shipment_row.get("Shipment Type", "Unknown") # <-- CRUCIAL: Get shipment type from DB
+    }
+
+def shipment_order(shipment_data, unique_id):
+    """(order key, PDF builder) of a shipment's transport order, as the order cache takes them."""
+    return (
+        order_key(PREVIEW_TEMPLATE, shipment_data, "past_shipments", unique_id),
+        lambda: generate_pdf_with_template(
+            template_path=PREVIEW_TEMPLATE,
+            shipment_data=shipment_data,
+            unique_id=unique_id # Pass manual_id as unique_id
+        ),
+    )
+
+@st.fragment
+@perf.fragment("order_previews")
+def render_order_previews(metadata_table):
+    """
+    Page 1 of the transport orders at the top of the table, a fragment behind an expander:
+    nothing is built until it is opened, and the orders are built and rendered as one batch.
+    """
+    panel = st.expander("🖼️ Transport order previews", expanded=False, key="shipments_previews", on_change="rerun")
+    if not panel.open:
+        return
+    with panel:
+        shipment_ids, items = [], []
+        for _, row in metadata_table.head(PREVIEW_GALLERY_SIZE).iterrows():
+            shipment_ids.append(str(row.get("Unique ID", "")))
+            items.append(shipment_order(shipment_pdf_data(row), shipment_ids[-1]))
+        with perf.span("shipments.order_previews", rows=len(items)):
+            orders = order_cache().orders(items, preview_dpi())
+        if not orders:
+            st.warning("Previews could not be generated. Please ensure 'transport_order_template.pdf' is in the correct path.")
+            return
+        st.caption(f"The first {len(items)} shipments of the table above. Use the generator below to download one.")
+        cols = st.columns(4)
+        for i, (shipment_id, (key, _)) in enumerate(zip(shipment_ids, items)):
+            if key in orders:
+                cols[i % 4].image(orders[key][1], caption=shipment_id)
+
+
+@st.fragment
+@perf.fragment("pdf_generator")
+def render_pdf_generator(df, collection=None):
+    """Manual shipment PDF generator, a fragment: typing an ID reruns only this block."""
+    # Manual input for Shipment ID
+    manual_id = st.text_input("Enter Shipment ID to generate PDF", key="manual_shipment_id_input")
+
+    if manual_id and collection is not None:
+        if st.button("Show version history", key="manual_history_button"):
+            render_version_history(collection, manual_id)
+
+    if manual_id:
+        if st.button("Generate PDF", key="manual_generate_pdf_button"):
+            shipment_data_row = df[df["Unique ID"].astype(str) == manual_id]
+
+            if not shipment_data_row.empty:
+                # Get the latest shipment data for the given ID
+                shipment_row = (
+                    shipment_data_row
+                    .assign(**{"Date Submitted": as_datetime(shipment_data_row["Date Submitted"])})
+                    .sort_values("Date Submitted", ascending=False).iloc[0]
+                )
+
+                shipment_data = shipment_pdf_data(shipment_row)
+
+                # --- UNIFIED PDF GENERATION CALL ---
+                # Built and previewed once per content: asking again for an unchanged shipment is a cache hit
+                with perf.span("shipments.generate_pdf"):
+                    pdf_bytes, preview = order_cache().order(*shipment_order(shipment_data, manual_id), preview_dpi())
+
+                if pdf_bytes: # Only proceed if PDF generation was successful (template found)
+                    st.image(preview, caption=f"Transport order {manual_id}, page 1", width=420)
+                    st.download_button(
+                        label="Download Shipment PDF",
+                        data=pdf_bytes,
+                        file_name=f"shipment_{manual_id}.pdf",
+                        mime="application/pdf",
+                        key=f"download_manual_pdf_{manual_id}", # Use a unique key for the button
+                        on_click="ignore", # Downloading keeps the generated PDF on screen
+                    )
+                    st.success("PDF generated successfully.")
+                else:
+                    st.warning("PDF could not be generated. Please ensure 'transport_order_template.pdf' is in the correct path.")
+
+            else:
+                st.error(f"No data found for Shipment ID: {manual_id}")
+
+
+def render_shipments(df, collection=None):
     st.markdown("## 📁 All Past Shipment IDs (Metadata View)")
 
     if df.empty:
         st.info("No shipment data available in the database.")
         return
 
-    # Handle 'Date Submitted' for display and sorting
+    # Handle 'Date Submitted' for display and sorting. The shared df is never modified:
+    # the parsed column and the row mask produce Copy-on-Write views, not copies.
     if "Date Submitted" in df.columns:
-        df["Date Submitted"] = pd.to_datetime(df["Date Submitted"], errors="coerce")
-        df_valid_dates = df.dropna(subset=["Date Submitted"]).copy()
+        date_submitted = as_datetime(df["Date Submitted"])
+        df_valid_dates = df.assign(**{"Date Submitted": date_submitted})[date_submitted.notna()]
     else:
-        df_valid_dates = df.copy()
+        df_valid_dates = df
 
     if "Unique ID" in df_valid_dates.columns:
-        df_valid_dates['Unique ID'] = df_valid_dates['Unique ID'].astype(str)
+        df_valid_dates = df_valid_dates.assign(**{"Unique ID": df_valid_dates["Unique ID"].astype(str)})
 
         if not df_valid_dates.empty:
-            # Get the latest entry for each Unique ID
-            metadata_table = (
-                df_valid_dates.sort_values("Date Submitted", ascending=False)
-                .groupby("Unique ID").first()
-                .reset_index()
-            )
+            # One row per shipment: its current version
+            with perf.span("shipments.current", rows=len(df_valid_dates)):
+                metadata_table = current_shipments(df_valid_dates)
         else:
             metadata_table = pd.DataFrame(columns=df_valid_dates.columns)
 
         display_cols = [
             "Unique ID", "Date Submitted", "Transporter", "Client",
-            "Cargo Type", "Loading Point", "File Number", "Truck Count", "Shipment Type" # Added Shipment Type to display
+            "Cargo Type", "Loading Point", "File Number", "Truck Count", "Shipment Type", # Added Shipment Type to display
+            "Version",
         ]
         display_cols_present = [col for col in display_cols if col in metadata_table.columns]
-        metadata_table_display = metadata_table[display_cols_present].copy()
+        metadata_table_display = metadata_table[display_cols_present]
 
         if "Date Submitted" in metadata_table_display.columns:
             metadata_table_display["Date Submitted"] = (
@@ -151,78 +318,11 @@ def render_shipments(df):
             )
 
         metadata_table_display.index += 1
-        st.dataframe(metadata_table_display, use_container_width=True)
+        with perf.span("shipments.table", rows=len(metadata_table_display)):
+            st.dataframe(metadata_table_display, use_container_width=True)
+        render_order_previews(metadata_table)
         st.markdown("---")
 
-        # Manual input for Shipment ID
-        manual_id = st.text_input("Enter Shipment ID to generate PDF", key="manual_shipment_id_input")
-
-        if manual_id:
-            if st.button("Generate PDF", key="manual_generate_pdf_button"):
-                shipment_data_row = df[df["Unique ID"].astype(str) == manual_id].copy()
-
-                if not shipment_data_row.empty:
-                    # Get the latest shipment data for the given ID
-                    shipment_row = (
-                        shipment_data_row.sort_values("Date Submitted", ascending=False).iloc[0]
-                    )
-
-                    # Extract all relevant fields into a dictionary for PDF generation
-                    # It's crucial that "Shipment Type" is included here so generate_pdf_with_template can read it
-                    shipment_data = {
-                        "Unique ID": shipment_row.get("Unique ID", ""),
-                        "Date Submitted": shipment_row.get("Date Submitted", ""),
-                        "Transporter": shipment_row.get("Transporter", ""),
-                        "Transporter Details": shipment_row.get("Transporter Details", ""),
-                        "Transporter Contact Details": shipment_row.get("Transporter Contact Details", ""),
-                        "Cargo Type": shipment_row.get("Cargo Type", ""),
-                        "Loading Point": shipment_row.get("Loading Point", ""),
-                        "Offloading Point": shipment_row.get("Offloading Point", ""),
-                        "Tonnage": shipment_row.get("Tonnage", ""),
-                        "File Number": shipment_row.get("File Number", ""),
-                        "Truck Count": shipment_row.get("Truck Count", ""),
-                        "Agent Details (Country 1)": shipment_row.get("Agent Details (Country 1)", ""),
-                        "Agent Details (Country 2)": shipment_row.get("Agent Details (Country 2)", ""),
-                        "Load Start Date": shipment_row.get("Load Start Date", ""),
-                        "Load End Date": shipment_row.get("Load End Date", ""),
-                        "Rate per Ton": shipment_row.get("Rate per Ton", ""),
-                        "Truck Type": shipment_row.get("Truck Type", ""),
-                        "Free Days at Border": shipment_row.get("Free Days at Border", ""),
-                        "Free Days at Loading Point": shipment_row.get("Free Days at Loading Point", ""),
-                        "Demurrage Rate": shipment_row.get("Demurrage Rate", ""),
-                        "Escorts arranged": shipment_row.get("Escorts arranged", ""),
-                        "Loading Capacity": shipment_row.get("Loading Capacity", ""),
-                        "Comments": shipment_row.get("Comments", ""),
-                        "Client": shipment_row.get("Client", ""), # Ensure Client is pulled from DB
-                        "Issued By": shipment_row.get("Issued By", ""), # Ensure Issued By is pulled from DB
-                        "Payment Terms": shipment_row.get("Payment Terms", ""), # Ensure Payment Terms is pulled from DB
-                        "Payment Method": shipment_row.get("Payment Method", ""), # Ensure Payment Method is pulled from DB
-                        "Borders": shipment_row.get("Borders", []),
-                        "Trucks": shipment_row.get("Trucks", []),
-                        "Trailers": shipment_row.get("Trailers", {}),
-                        "Shipment Type": shipment_row.get("Shipment Type", "Unknown") # <-- CRUCIAL: Get shipment type from DB
-                    }
-
-                    # --- UNIFIED PDF GENERATION CALL ---
-                    pdf_stream = generate_pdf_with_template(
-                        template_path="transport_order_template.pdf",
-                        shipment_data=shipment_data,
-                        unique_id=manual_id # Pass manual_id as unique_id
-                    )
-
-                    if pdf_stream: # Only proceed if PDF generation was successful (template found)
-                        st.download_button(
-                            label="Download Shipment PDF",
-                            data=pdf_stream,
-                            file_name=f"shipment_{manual_id}.pdf",
-                            mime="application/pdf",
-                            key=f"download_manual_pdf_{manual_id}" # Use a unique key for the button
-                        )
-                        st.success("PDF generated successfully.")
-                    else:
-                        st.warning("PDF could not be generated. Please ensure 'transport_order_template.pdf' is in the correct path.")
-
-                else:
-                    st.error(f"No data found for Shipment ID: {manual_id}")
+        render_pdf_generator(df, collection)
     else:
         st.warning("Data is missing the 'Unique ID' column required for this view.")
\ No newline at end of file
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+
+from seamaster_core import DiskCache, MemoryCache
+from truck_manifest import manifest_rows
+
+logger = logging.getLogger(__name__)
+
+# --- Transport order previews ---
+# A transport order's PDF and a PNG of its first page (rendered with PyMuPDF's get_pixmap at
+# `pdf_preview_dpi`, a Streamlit secret, default 80) are cached together, keyed by a hash of
+# what the order shows: the template file, the shipment's scalar fields and its truck
+# manifest rows (so a status or demurrage update leaves it cached). Showing an unchanged
+# order again costs neither a PDF build nor a render. The cache lives in memory, or on disk
+# under `pdf_cache_dir` (in secrets) so rendered orders survive a restart.
+#
+# PyMuPDF is not thread-safe and holds the GIL while it renders, so threads would take turns;
+# a batch of previews is rasterized in a small pool of worker processes instead. Single
+# previews and small batches render inline.
+
+DEFAULT_DPI = 80
+POOL_MIN_BATCH = 4  # Fewer missing previews than this are not worth a trip to the pool
+
+_template_digests = {}  # (path, mtime, size) -> digest
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def _template_digest(template_path):
+    try:
+        stat = os.stat(template_path)
+    except OSError:
+        return b""  # No template: the PDF generator reports it, nothing gets cached
+    key = (template_path, stat.st_mtime_ns, stat.st_size)
+    digest = _template_digests.get(key)
+    if digest is None:
+        with open(template_path, "rb") as fh:
+            digest = hashlib.sha256(fh.read()).digest()
+        _template_digests[key] = digest
+    return digest
+
+
+def order_key(template_path, shipment_data, *parts):
+    """Content hash of a transport order: its template, the shipment's scalar fields, its manifest and `parts`."""
+    scalars = {k: v for k, v in shipment_data.items() if not isinstance(v, (list, dict))}
+    content = json.dumps([scalars, manifest_rows(shipment_data), parts], sort_keys=True, default=str)
+    return hashlib.sha256(_template_digest(template_path) + content.encode("utf-8")).hexdigest()
+
+
+def render_preview(pdf_bytes, dpi=DEFAULT_DPI):
+    """PNG bytes of the first page of `pdf_bytes` at `dpi`."""
+    import fitz  # PyMuPDF
+
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        return doc[0].get_pixmap(dpi=dpi).tobytes("png")
+
+
+class OrderCache:
+    """
+    Rendered transport orders, {order key: (PDF bytes, {str(dpi): PNG bytes})}, in `store` (a
+    MemoryCache or DiskCache, whose BSON files only take string keys). An order is about
+    350 KB of PDF plus its previews, hence the small default size in memory.
+    """
+
+    def __init__(self, max_entries=64, max_workers=None, store=None):
+        self.store = store if store is not None else MemoryCache("transport orders", max_entries=max_entries)
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def _pdf(self, key, render_pdf):
+        entry = self.store.get(key)
+        if entry is not None:
+            return entry
+        pdf = render_pdf()
+        if pdf is None:
+            return None  # The generator could not build it; nothing to cache
+        pdf_bytes = pdf.getvalue() if hasattr(pdf, "getvalue") else pdf
+        entry = (pdf_bytes, {})
+        self.store.put(key, entry)
+        return entry
+
+    def order(self, key, render_pdf, dpi=DEFAULT_DPI):
+        """
+        (PDF bytes, PNG preview) of an order, from the cache or by calling `render_pdf()`
+        (returning bytes, a BytesIO or None) and rendering page 1. (None, None) without a PDF.
+        """
+        entry = self._pdf(key, render_pdf)
+        if entry is None:
+            return None, None
+        pdf_bytes, previews = entry
+        png = previews.get(str(dpi))
+        if png is None:
+            png = previews[str(dpi)] = render_preview(pdf_bytes, dpi)
+            self.store.put(key, entry)  # A disk store keeps the copy it was given
+        return pdf_bytes, png
+
+    def orders(self, items, dpi=DEFAULT_DPI):
+        """
+        {key: (PDF bytes, PNG preview)} for a batch of (key, render_pdf) pairs. Missing PDFs are
+        built here; missing previews of a large batch are rendered across the process pool.
+        Orders without a PDF are left out.
+        """
+        entries = {key: self._pdf(key, render_pdf) for key, render_pdf in items}
+        entries = {key: entry for key, entry in entries.items() if entry is not None}
+        missing = [key for key, (_, previews) in entries.items() if str(dpi) not in previews]
+        pngs = None
+        if len(missing) >= POOL_MIN_BATCH and self.max_workers > 1:
+            try:
+                pngs = list(self._executor().map(render_preview, [entries[key][0] for key in missing],
+                                                 [dpi] * len(missing)))
+            except BrokenProcessPool as e:
+                logger.warning("Preview workers failed (%s); rendering in this process", e)
+                with self._lock:
+                    self._pool = None
+        if pngs is None:
+            pngs = [render_preview(entries[key][0], dpi) for key in missing]
+        for key, png in zip(missing, pngs):
+            entries[key][1][str(dpi)] = png
+            self.store.put(key, entries[key])
+        return {key: (pdf_bytes, previews[str(dpi)]) for key, (pdf_bytes, previews) in entries.items()}
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                # Spawned, not forked: the workers start clean, without the server's threads
+                self._pool = ProcessPoolExecutor(self.max_workers, mp_context=get_context("spawn"))
+            return self._pool
+
+    def __len__(self):
+        return len(self.store)
+
+
+def get_order_cache(directory=None, max_mb=256):
+    """
+    The process-wide OrderCache shared by the views, kept on disk under `directory` (at most
+    `max_mb` MB) when one is given. The first call decides.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            store = None
+            if directory:
+                store = DiskCache(directory, name="transport orders", max_bytes=max_mb * 1024 * 1024)
+            _cache = OrderCache(store=store)
+        return _cache
@@ -0,0 +1,195 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import wraps
+
+try:
+    import resource  # Not available on Windows
+except ImportError:
+    resource = None
+
+# --- Per-rerun performance instrumentation ---
+# Every Streamlit session runs its script in its own thread, so the trace for
+# the rerun currently executing is kept in a thread-local.
+_local = threading.local()
+
+# JSON log destination. Set SEAMASTER_PERF_LOG to enable logging without the debug panel.
+DEFAULT_LOG_PATH = os.path.join("logs", "perf.jsonl")
+_log_lock = threading.Lock()
+
+
+class RerunTrace:
+    """Collects the timing spans recorded during a single script rerun."""
+
+    def __init__(self, session_id=None, view=None):
+        self.session_id = session_id
+        self.view = view
+        self.started_at = datetime.now(timezone.utc)
+        self.started = time.perf_counter()
+        self.spans = []
+        self.aggregates = {}
+        self.depth = 0
+
+    def to_record(self):
+        """Returns the trace as a JSON-serializable dictionary."""
+        return {
+            "ts": self.started_at.isoformat(),
+            "session_id": self.session_id,
+            "view": self.view,
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "peak_rss_mb": peak_rss_mb(),
+            "spans": self.spans,
+        }
+
+
+def start_rerun(session_id=None, view=None):
+    """Starts a fresh trace for the current thread and returns it."""
+    trace = RerunTrace(session_id=session_id, view=view)
+    _local.trace = trace
+    return trace
+
+
+def current_trace():
+    return getattr(_local, "trace", None)
+
+
+@contextmanager
+def span(name, rows=None, aggregate=False):
+    """
+    Times the enclosed block and records it on the current rerun trace.
+    The yielded dict can be updated inside the block, e.g. `s["rows"] = len(df)`.
+    With aggregate=True, repeated spans of the same name (one per shipment, say)
+    are summed into a single entry with a call count instead of one entry each.
+    """
+    trace = current_trace()
+    info = {"name": name, "rows": rows}
+    if trace is None:
+        yield info
+        return
+
+    if aggregate and name in trace.aggregates:
+        total = trace.aggregates[name]
+    else:
+        total = {"name": name, "rows": None, "ms": 0.0, "calls": 0, "depth": trace.depth}
+        # Appended on entry so nested spans are listed after their parent
+        trace.spans.append(total)
+        if aggregate:
+            trace.aggregates[name] = total
+
+    trace.depth += 1
+    start = time.perf_counter()
+    try:
+        yield info
+    finally:
+        trace.depth -= 1
+        total["ms"] = round(total["ms"] + (time.perf_counter() - start) * 1000, 3)
+        total["calls"] += 1
+        if info["rows"] is not None:
+            total["rows"] = (total["rows"] or 0) + info["rows"]
+
+
+def timed(name=None):
+    """Decorator form of `span`, defaulting to the function's name."""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def fragment(name):
+    """
+    Decorator for st.fragment bodies. During a full rerun the fragment is one span of the
+    app's trace; a fragment-only rerun has no app trace, so it gets (and logs) its own.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if current_trace() is not None:
+                with span(f"fragment {name}"):
+                    return func(*args, **kwargs)
+            start_rerun(view=f"fragment:{name}")
+            try:
+                return func(*args, **kwargs)
+            finally:
+                finish_rerun(log_path=DEFAULT_LOG_PATH if debug_enabled() else None)
+        return wrapper
+    return decorator
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None if unavailable."""
+    if resource is None:
+        return None
+    # ru_maxrss is reported in kilobytes on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def finish_rerun(log_path=None):
+    """Closes the current trace, appends it to the JSON log if enabled and returns the record."""
+    trace = current_trace()
+    if trace is None:
+        return None
+    _local.trace = None
+
+    record = trace.to_record()
+    log_path = log_path or os.environ.get("SEAMASTER_PERF_LOG")
+    if log_path:
+        write_log(record, log_path)
+    return record
+
+
+def write_log(record, log_path=DEFAULT_LOG_PATH):
+    """Appends one structured JSON line per rerun so logs can be aggregated across sessions."""
+    try:
+        directory = os.path.dirname(log_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        line = json.dumps(record, default=str)
+        with _log_lock, open(log_path, "a", encoding="utf-8") as fh:
+            fh.write(line + "\n")
+    except OSError:
+        pass  # Instrumentation must never break the app
+
+
+def debug_enabled():
+    """The debug panel is shown with ?debug=1 in the URL or SEAMASTER_DEBUG=1 in the environment."""
+    if os.environ.get("SEAMASTER_DEBUG", "") not in ("", "0"):
+        return True
+    import streamlit as st
+    return st.query_params.get("debug", "0") not in ("", "0")
+
+
+def render_debug_panel(record):
+    """Shows the per-stage breakdown of the last rerun and the cache counters in the sidebar."""
+    import streamlit as st
+    import pandas as pd
+
+    if not record:
+        return
+    with st.sidebar.expander("🛠️ Performance (last rerun)", expanded=False):
+        st.write(f"**Total:** {record['total_ms']:.1f} ms")
+        if record.get("peak_rss_mb") is not None:
+            st.write(f"**Peak memory:** {record['peak_rss_mb']:.1f} MB")
+        if record["spans"]:
+            spans_df = pd.DataFrame(record["spans"])
+            spans_df["stage"] = spans_df.apply(lambda s: "  " * int(s.get("depth", 0)) + s["name"], axis=1)
+            st.dataframe(
+                spans_df[["stage", "ms", "calls", "rows"]],
+                use_container_width=True,
+                hide_index=True,
+            )
+
+        # Process-wide counters of the named caches (seamaster_core.cache), since start-up
+        from seamaster_core import cache_stats
+        caches = cache_stats()
+        if caches:
+            st.write("**Caches:**")
+            st.dataframe(pd.DataFrame(caches), use_container_width=True, hide_index=True)
@@ -0,0 +1,38 @@
+# --- Seamaster core: shipment rules with no Streamlit dependency ---
+# Shared by the Streamlit views and the batch tools (python -m seamaster_core).
+
+from .accrual import accrual_curve
+from .alerts import Alert, AlertOutbox, AlertScheduler
+from .borders import arrival_column, border_names, border_records, dispatch_column, new_border_records
+from .cache import DiskCache, MemoryCache, cache_stats, content_key
+from .dates import days_between, format_date_for_display, is_blank, parse_date, to_bson_date
+from .demurrage import (
+    LOADING_POINT,
+    PricingCache,
+    Stay,
+    billable_days,
+    compute_demurrage,
+    is_open_stay,
+    ordered_border_names,
+    price_plan,
+    price_truck,
+    shipment_demurrage_summary,
+    stay_fingerprint,
+    truck_demurrage_cost,
+    truck_rate,
+    truck_stays,
+)
+from .dwell import DwellStats
+from .normalize import normalize_dates
+from .rollups import DailyRollup, build_rollup
+from .sketches import KLLSketch
+from .status import geo_type, is_open, shipment_status
+from .summaries import file_summaries, kpi_summary, truck_rows, truck_table_columns
+from .versions import (
+    VersionConflict,
+    create_version_indexes,
+    insert_shipment,
+    shipment_history,
+    update_shipment,
+)
+from .workbook import write_demurrage_workbook
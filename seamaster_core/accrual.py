@@ -0,0 +1,76 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from .rollups import EPOCH_ORDINAL, shipment_records, stay_rows
+
+# --- Demurrage accrual over time (interval sweep) ---
+# Every billable stay is an interval of days [first billable day, dispatch day] (open stays
+# run on). Its start and end become +/- events carrying one truck and its daily rate; after
+# sorting the events once, a prefix sum gives the trucks billing and the cost accrued on
+# every day, so the whole fleet's curve costs O(n log n) instead of a repricing per day.
+
+
+def stay_events(shipments):
+    """Returns (days, truck deltas, cost deltas) arrays with one +/- event pair per billable stay."""
+    days, trucks, costs = [], [], []
+    for shipment in shipment_records(shipments):
+        shipment_trucks = shipment.get("Trucks")
+        if not isinstance(shipment_trucks, list):
+            continue
+        shipment_rate = float(shipment.get("Demurrage Rate", 0.0) or 0.0)
+        client = shipment.get("Client") or "Unknown"
+        transporter = shipment.get("Transporter") or "Unknown"
+        for truck in shipment_trucks:
+            for _, _, _, first_day, last_day, rate in stay_rows(truck, shipment_rate, client, transporter):
+                days.append(first_day)
+                trucks.append(1)
+                costs.append(rate)
+                if last_day is not None:
+                    days.append(last_day + 1)
+                    trucks.append(-1)
+                    costs.append(-rate)
+    return np.array(days, dtype=np.int64), np.array(trucks, dtype=np.int64), np.array(costs, dtype=float)
+
+
+def accrual_curve(shipments, start=None, end=None):
+    """
+    Daily demurrage accrual for `shipments` from `start` to `end` (dates; default: the first
+    billable day to today). Columns: day, trucks_billing (trucks on site beyond their free
+    days), daily_cost, and accrued_cost, the running total, which on any day equals the total
+    compute_demurrage(shipments, as_of=day) gives.
+    """
+    days, truck_deltas, cost_deltas = stay_events(shipments)
+    columns = ["day", "trucks_billing", "daily_cost", "accrued_cost"]
+    if len(days) == 0:
+        return pd.DataFrame(columns=columns)
+
+    # Sweep: sort the events by day, then prefix-sum the deltas
+    order = np.argsort(days, kind="stable")
+    days, truck_deltas, cost_deltas = days[order], truck_deltas[order], cost_deltas[order]
+    on_site = np.cumsum(truck_deltas)
+    daily_rate = np.cumsum(cost_deltas)
+
+    first = pd.Timestamp(start).toordinal() if start is not None else int(days[0])
+    last = pd.Timestamp(end).toordinal() if end is not None else date.today().toordinal()
+    if last < first:
+        return pd.DataFrame(columns=columns)
+    grid = np.arange(first, last + 1)
+
+    # The state on each grid day is the prefix sum after the last event on or before it
+    idx = np.searchsorted(days, grid, side="right") - 1
+    trucks_billing = np.where(idx >= 0, on_site[np.maximum(idx, 0)], 0)
+    daily_cost = np.where(idx >= 0, daily_rate[np.maximum(idx, 0)], 0.0)
+    daily_cost = np.round(daily_cost, 6)
+
+    # Cost accrued before the grid starts, so the running total is as-of correct from day one
+    before = days < first
+    accrued_before = float(np.sum(cost_deltas[before] * (first - days[before])))
+
+    return pd.DataFrame({
+        "day": pd.to_datetime(grid - EPOCH_ORDINAL, unit="D"),
+        "trucks_billing": trucks_billing,
+        "daily_cost": daily_cost,
+        "accrued_cost": accrued_before + np.cumsum(daily_cost),
+    })
@@ -0,0 +1,191 @@
+import heapq
+import itertools
+import json
+import os
+import threading
+from collections import namedtuple
+from datetime import date, datetime
+
+from .demurrage import is_open_stay, stay_fingerprint, truck_stays
+from .rollups import shipment_records
+
+# --- Free-days alerts ---
+# Every open stay of a truck still on the road has a breach day: the first day it bills
+# demurrage (arrival + free days + 1, as in billable_days()). The scheduler keeps two entries
+# per open stay in a min-heap keyed by due day: an "approaching" alert `lead_days` before the
+# breach and an "exceeded" alert on it. A tick only pops the entries that are due, so it costs
+# O(due × log n) however many trucks are open. Entries of stays that closed or changed are
+# left in the heap and dropped when they surface (each carries the generation it was made in).
+
+APPROACHING = "approaching"
+EXCEEDED = "exceeded"
+
+Alert = namedtuple("Alert", [
+    "alert_id", "kind", "unique_id", "file_number", "client", "transporter", "truck",
+    "location", "arrival", "free_days", "breach_day",
+])
+
+
+def breach_ordinal(stay):
+    """Date ordinal of the first billable day of `stay`."""
+    return stay.arrival.toordinal() + stay.free_days + 1
+
+
+def _today_ordinal(today):
+    return (today or date.today()).toordinal()
+
+
+class AlertOutbox:
+    """
+    Appends alerts as JSON lines to a local file, once per alert id (ids already in the
+    file are skipped, so a restarted process does not raise them again).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._written = set()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as fh:
+                for line in fh:
+                    if line.strip():
+                        self._written.add(json.loads(line).get("alert_id"))
+
+    def write(self, alerts):
+        """Writes the alerts not in the outbox yet. Returns how many were written."""
+        with self._lock:
+            new = [a for a in alerts if a.alert_id not in self._written]
+            if not new:
+                return 0
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            raised_at = datetime.now().isoformat(timespec="seconds")
+            with open(self.path, "a", encoding="utf-8") as fh:
+                for alert in new:
+                    record = alert._asdict()
+                    record["arrival"] = alert.arrival.isoformat()
+                    record["breach_day"] = alert.breach_day.isoformat()
+                    record["raised_at"] = raised_at
+                    fh.write(json.dumps(record, default=str) + "\n")
+                    self._written.add(alert.alert_id)
+            return len(new)
+
+
+class AlertScheduler:
+    """
+    Free-days alerts for open stays, kept in step with the shipments by sync() (only
+    changed trucks are re-read) and raised by tick(). Raised alerts stay active until
+    their stay closes. Safe to tick from one thread while another syncs.
+    """
+
+    def __init__(self, lead_days=1, outbox=None):
+        self.lead_days = lead_days
+        self.outbox = outbox
+        self._lock = threading.Lock()
+        self._heap = []  # (due ordinal, generation, stay key, kind)
+        self._trucks = {}  # (Unique ID, position) -> (fingerprint, stay keys)
+        self._stays = {}  # (Unique ID, position, location) -> (generation, Alert fields)
+        self._active = {}  # stay key -> its latest Alert
+        self._generations = itertools.count()
+
+    def _drop_truck(self, truck_key):
+        _, stay_keys = self._trucks.pop(truck_key)
+        for stay_key in stay_keys:
+            self._stays.pop(stay_key, None)
+            self._active.pop(stay_key, None)
+
+    def _watch_truck(self, truck_key, truck, shipment, fingerprint):
+        stay_keys = []
+        if not truck.get("Cancel") and not truck.get("Date offloaded"):
+            for stay in truck_stays(truck):
+                if not is_open_stay(stay):
+                    continue
+                stay_key = truck_key + (stay.location,)
+                generation = next(self._generations)
+                breach = breach_ordinal(stay)
+                fields = {
+                    "unique_id": truck_key[0],
+                    "file_number": shipment.get("File Number"),
+                    "client": shipment.get("Client") or "Unknown",
+                    "transporter": shipment.get("Transporter") or "Unknown",
+                    "truck": truck.get("Horse Number") or f"Truck {truck.get('Truck Number', truck_key[1] + 1)}",
+                    "location": stay.location,
+                    "arrival": stay.arrival.date(),
+                    "free_days": stay.free_days,
+                    "breach_day": date.fromordinal(breach),
+                }
+                self._stays[stay_key] = (generation, fields)
+                heapq.heappush(self._heap, (breach - self.lead_days, generation, stay_key, APPROACHING))
+                heapq.heappush(self._heap, (breach, generation, stay_key, EXCEEDED))
+                stay_keys.append(stay_key)
+        self._trucks[truck_key] = (fingerprint, stay_keys)
+
+    def sync(self, shipments):
+        """Brings the watched stays in line with `shipments`. Returns the number of trucks changed."""
+        changed = 0
+        seen = set()
+        with self._lock:
+            for shipment in shipment_records(shipments):
+                trucks = shipment.get("Trucks")
+                if not isinstance(trucks, list):
+                    continue
+                uid = shipment.get("Unique ID")
+                shipment_rate = float(shipment.get("Demurrage Rate", 0.0) or 0.0)
+                for position, truck in enumerate(trucks):
+                    truck_key = (uid, position)
+                    seen.add(truck_key)
+                    fingerprint = repr((stay_fingerprint(truck, shipment_rate), truck.get("Cancel"),
+                                        bool(truck.get("Date offloaded"))))
+                    previous = self._trucks.get(truck_key)
+                    if previous is not None and previous[0] == fingerprint:
+                        continue
+                    if previous is not None:
+                        self._drop_truck(truck_key)
+                    self._watch_truck(truck_key, truck, shipment, fingerprint)
+                    changed += 1
+            for truck_key in [k for k in self._trucks if k not in seen]:
+                self._drop_truck(truck_key)
+                changed += 1
+            if len(self._heap) > 4 * max(len(self._stays), 16):
+                self._compact()
+        return changed
+
+    def _compact(self):
+        """Drops the entries of closed or changed stays once they dominate the heap."""
+        self._heap = [e for e in self._heap if self._stays.get(e[2], (None,))[0] == e[1]]
+        heapq.heapify(self._heap)
+
+    def tick(self, today=None):
+        """Raises the alerts due by `today` (default: today) and returns them; writes them to the outbox."""
+        today = _today_ordinal(today)
+        raised = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= today:
+                _, generation, stay_key, kind = heapq.heappop(self._heap)
+                watched = self._stays.get(stay_key)
+                if watched is None or watched[0] != generation:
+                    continue  # The stay closed or changed since this entry was pushed
+                fields = watched[1]
+                if kind == APPROACHING and fields["breach_day"].toordinal() <= today:
+                    continue  # Already past its free days; the exceeded alert covers it
+                alert = Alert(alert_id=_alert_id(stay_key, kind, fields["breach_day"]), kind=kind, **fields)
+                self._active[stay_key] = alert
+                raised.append(alert)
+        if raised and self.outbox is not None:
+            self.outbox.write(raised)
+        return raised
+
+    def active(self):
+        """Alerts raised so far whose stays are still open, soonest breach first."""
+        with self._lock:
+            alerts = list(self._active.values())
+        return sorted(alerts, key=lambda a: (a.breach_day, str(a.file_number), a.truck, a.location))
+
+    def pending(self):
+        """Number of heap entries waiting to come due (including stale ones not yet dropped)."""
+        return len(self._heap)
+
+
+def _alert_id(stay_key, kind, breach_day):
+    """Stable across restarts; a corrected arrival date gives a new breach day and a new alert."""
+    uid, position, location = stay_key
+    return f"{uid}:{position}:{location}:{kind}:{breach_day:%Y-%m-%d}"
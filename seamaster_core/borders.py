@@ -0,0 +1,95 @@
+# --- Border records ---
+# Borders are stored as an ordered array of {"name", "arrival", "dispatch"} records, on the
+# shipment (the planned route, with no dates) and on each of its trucks, so readers take the
+# route order and the dates straight from the document and MongoDB can index and query
+# "Trucks.Borders.name". Documents written before this schema hold a dict keyed
+# "Actual arrival at {name}" / "Actual dispatch from {name}" instead. border_records()
+# reads both, and `python -m seamaster_core migrate-borders` rewrites the old ones.
+
+ARRIVAL_PREFIX = "Actual arrival at "
+DISPATCH_PREFIX = "Actual dispatch from "
+
+
+def arrival_column(name):
+    """Display and export column of a border's arrival date."""
+    return f"{ARRIVAL_PREFIX}{name}"
+
+
+def dispatch_column(name):
+    """Display and export column of a border's dispatch date."""
+    return f"{DISPATCH_PREFIX}{name}"
+
+
+def new_border_records(names):
+    """Border records for a new shipment or truck: the route order, with no dates yet."""
+    return [{"name": name, "arrival": None, "dispatch": None} for name in names]
+
+
+def legacy_border_records(borders):
+    """Converts a dict of "Actual arrival at …" / "Actual dispatch from …" keys to border records."""
+    records = []
+    seen = set()
+    for key in borders.keys():
+        if "actual arrival at" in key.lower():
+            name = key.replace(ARRIVAL_PREFIX, "").strip()
+            if name not in seen:
+                seen.add(name)
+                records.append({"name": name, "arrival": borders[key], "dispatch": borders.get(dispatch_column(name))})
+    return records
+
+
+def border_records(borders):
+    """The border records of a shipment or truck 'Borders' value, in route order, in either schema."""
+    if isinstance(borders, list):
+        return [record for record in borders if isinstance(record, dict) and record.get("name")]
+    if isinstance(borders, dict):
+        return legacy_border_records(borders)
+    return []
+
+
+def border_names(borders):
+    """The border names of a 'Borders' value, in route order."""
+    return [record["name"] for record in border_records(borders)]
+
+
+def migrate_borders(borders):
+    """
+    Returns the array form of a legacy 'Borders' dict, or None when there is nothing to
+    migrate or the dict holds keys the records cannot represent (left for a manual look).
+    """
+    if not isinstance(borders, dict):
+        return None
+    records = legacy_border_records(borders)
+    expected = {}
+    for record in records:
+        expected[arrival_column(record["name"])] = record["arrival"]
+        expected[dispatch_column(record["name"])] = record["dispatch"]
+    if set(expected) != set(borders):
+        return None
+    return records
+
+
+def migrate_shipment(shipment):
+    """
+    The $set update that moves a shipment and its trucks to border records, None if it is
+    already migrated, or False if some 'Borders' dict cannot be converted losslessly.
+    """
+    update = {}
+    if isinstance(shipment.get("Borders"), dict):
+        records = migrate_borders(shipment["Borders"])
+        if records is None:
+            return False
+        update["Borders"] = records
+
+    trucks = shipment.get("Trucks")
+    if isinstance(trucks, list) and any(isinstance(t, dict) and isinstance(t.get("Borders"), dict) for t in trucks):
+        migrated = []
+        for truck in trucks:
+            if isinstance(truck, dict) and isinstance(truck.get("Borders"), dict):
+                records = migrate_borders(truck["Borders"])
+                if records is None:
+                    return False
+                truck = {**truck, "Borders": records}
+            migrated.append(truck)
+        update["Trucks"] = migrated
+    return update or None
@@ -0,0 +1,296 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+# --- Caches ---
+# One small cache subsystem for the app's derived results (rendered transport orders, filter
+# masks, API bodies, truck tables, parsed truck stays). Every backend has the same interface,
+# get / put / get_or_set / pop / clear, evicts the least recently used entry once it is over
+# `max_entries` or `max_bytes`, drops entries older than `ttl` seconds, and counts hits,
+# misses, evictions and expiries. Named caches register themselves, so the debug panel can
+# list them all with cache_stats().
+#
+# MemoryCache keeps values in this process. DiskCache writes each value as a BSON file named
+# after its key, so it survives restarts, and a file changed by someone else can at worst
+# hold a wrong value. Keys of results derived from content are content_key() hashes, so a
+# changed input is a new key and nothing has to be invalidated.
+
+_registry = weakref.WeakValueDictionary()  # name -> the latest cache created with that name
+_registry_lock = threading.Lock()
+
+
+def content_key(*parts):
+    """A hex SHA-256 over the JSON of `parts` (anything else, e.g. dates, as its str())."""
+    content = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def value_size(value):
+    """Approximate bytes held by a cached value: buffers by length, DataFrames by memory usage."""
+    if isinstance(value, (bytes, bytearray, memoryview, str)):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(value_size(item) for item in value)
+    if isinstance(value, dict):
+        return sum(value_size(item) for item in value.values())
+    memory_usage = getattr(value, "memory_usage", None)  # DataFrame
+    if memory_usage is not None:
+        try:
+            return int(memory_usage(index=True, deep=True).sum())
+        except TypeError:
+            pass
+    nbytes = getattr(value, "nbytes", None)  # NumPy arrays
+    return nbytes if isinstance(nbytes, int) else sys.getsizeof(value)
+
+
+def cache_stats():
+    """Counters of every live named cache, one dict each, sorted by name."""
+    with _registry_lock:
+        caches = list(_registry.values())
+    return sorted((cache.stats() for cache in caches), key=lambda s: s["name"])
+
+
+class Cache:
+    """Bookkeeping shared by the backends: limits, counters and registration by name."""
+
+    backend = None
+
+    def __init__(self, name=None, max_entries=None, max_bytes=None, ttl=None):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+        self._lock = threading.RLock()
+        if name is not None:
+            with _registry_lock:
+                _registry[name] = self
+
+    def get_or_set(self, key, compute):
+        """The cached value of `key`, or `compute()` stored under it. A None result is not cached."""
+        value = self.get(key)
+        if value is None:
+            value = compute()  # Outside the lock: other keys stay readable meanwhile
+            if value is not None:
+                self.put(key, value)
+        return value
+
+    def _expired(self, stored_at, now):
+        return self.ttl is not None and now - stored_at > self.ttl
+
+    def size_bytes(self):
+        """Bytes held, or None when the cache does not measure its values."""
+        return None
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "backend": self.backend,
+            "entries": len(self),
+            "bytes": self.size_bytes(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expired": self.expired,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+class MemoryCache(Cache):
+    """LRU of values in this process, {key: value}; any hashable key."""
+
+    backend = "memory"
+
+    def __init__(self, name=None, max_entries=None, max_bytes=None, ttl=None, sizeof=value_size):
+        super().__init__(name, max_entries, max_bytes, ttl)
+        self._sizeof = sizeof if max_bytes is not None else None
+        self._entries = OrderedDict()  # key -> (value, size, stored at)
+        self._bytes = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry[2], time.monotonic()):
+                self._drop(key)
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = self._sizeof(value) if self._sizeof is not None else 0
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, size, time.monotonic())
+            self._bytes += size
+            while self._entries and (
+                (self.max_entries is not None and len(self._entries) > self.max_entries)
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)
+            ):
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._drop(key)
+        return default if entry is None else entry[0]
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def size_bytes(self):
+        return self._bytes if self._sizeof is not None else None
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DiskCache(Cache):
+    """
+    LRU of values in `directory`, one BSON file per key. Values are what BSON can hold: bytes,
+    strings, numbers, datetimes, lists and dicts with string keys; tuples come back as lists.
+    Keys that are not already hex strings are hashed with content_key(). Entries left by an
+    earlier process are picked up, oldest first in line for eviction.
+    """
+
+    backend = "disk"
+    SUFFIX = ".bson"
+
+    def __init__(self, directory, name=None, max_entries=None, max_bytes=None, ttl=None):
+        super().__init__(name, max_entries, max_bytes, ttl)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._index = OrderedDict()  # file key -> (size, stored at as a wall-clock time)
+        self._bytes = 0
+        found = []
+        for entry in os.scandir(directory):
+            if entry.name.endswith(self.SUFFIX) and entry.is_file():
+                stat = entry.stat()
+                found.append((stat.st_mtime, entry.name[:-len(self.SUFFIX)], stat.st_size))
+        for stored_at, file_key, size in sorted(found):
+            self._index[file_key] = (size, stored_at)
+            self._bytes += size
+        with self._lock:
+            self._evict()
+
+    @staticmethod
+    def _file_key(key):
+        if isinstance(key, str) and key and all(c in "0123456789abcdef" for c in key):
+            return key
+        return content_key(key)
+
+    def _path(self, file_key):
+        return os.path.join(self.directory, file_key + self.SUFFIX)
+
+    def get(self, key, default=None):
+        file_key = self._file_key(key)
+        with self._lock:
+            entry = self._index.get(file_key)
+            if entry is not None and self._expired(entry[1], time.time()):
+                self._remove(file_key)
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            value = self._load(file_key)
+            if value is None:
+                self.misses += 1
+                return default
+            self._index.move_to_end(file_key)
+            self.hits += 1
+            return value
+
+    def _load(self, file_key):
+        import bson
+        from bson.errors import InvalidBSON
+
+        try:
+            with open(self._path(file_key), "rb") as fh:
+                return bson.decode(fh.read())["v"]
+        except (OSError, KeyError, InvalidBSON):
+            # Removed, truncated or rewritten by someone else: forget it
+            self._remove(file_key)
+            return None
+
+    def put(self, key, value):
+        import bson
+
+        data = bson.encode({"v": value})  # Before touching the file: an unsupported value raises here
+        file_key = self._file_key(key)
+        path = self._path(file_key)
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, "wb") as fh:
+            fh.write(data)
+        os.replace(temporary, path)  # Readers see the old file or the new one, never half of it
+        size = os.path.getsize(path)
+        with self._lock:
+            previous = self._index.pop(file_key, None)
+            if previous is not None:
+                self._bytes -= previous[0]
+            self._index[file_key] = (size, time.time())
+            self._bytes += size
+            self._evict()
+
+    def pop(self, key, default=None):
+        file_key = self._file_key(key)
+        with self._lock:
+            value = self._load(file_key) if file_key in self._index else None
+            self._remove(file_key)
+        return default if value is None else value
+
+    def _remove(self, file_key):
+        entry = self._index.pop(file_key, None)
+        if entry is not None:
+            self._bytes -= entry[0]
+        try:
+            os.remove(self._path(file_key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        while self._index and (
+            (self.max_entries is not None and len(self._index) > self.max_entries)
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            self._remove(next(iter(self._index)))
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            for file_key in list(self._index):
+                self._remove(file_key)
+
+    def size_bytes(self):
+        return self._bytes
+
+    def __contains__(self, key):
+        return self._file_key(key) in self._index
+
+    def __len__(self):
+        return len(self._index)
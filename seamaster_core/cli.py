@@ -0,0 +1,507 @@
+"""
+Nightly demurrage reports, computed outside Streamlit.
+
+`demurrage` prices every open shipment with the dashboard's demurrage rules and
+writes one report per client and one per border. Shipments are partitioned by
+File Number and priced in parallel across a process pool; each partition also
+returns border dwell-time sketches, merged into one dwell-time report. `rollups` exports the
+daily demurrage rollup (billable truck-days and cost per day) for a date range.
+`alerts` raises the free-days alerts due by a date into a JSON-lines outbox.
+`migrate-borders` rewrites legacy 'Borders' dicts as ordered border records, and
+`normalize-dates` converts stored date strings and epoch numbers to BSON dates in
+resumable batches, and `version-shipments` keeps one current document per Unique ID,
+moving older versions to the history collection:
+
+    python -m seamaster_core demurrage --mongo-uri mongodb://... --out reports/
+    python -m seamaster_core demurrage --input shipments.json --as-of 2025-06-30
+    python -m seamaster_core rollups --input shipments.json --start 2025-01-01 --by client border
+    python -m seamaster_core alerts --input shipments.json --as-of 2025-06-30 --outbox alerts.jsonl
+    python -m seamaster_core migrate-borders --mongo-uri mongodb://... --dry-run
+    python -m seamaster_core normalize-dates --mongo-uri mongodb://... --checkpoint logs/normalize-dates.json
+    python -m seamaster_core version-shipments --mongo-uri mongodb://... --dry-run
+"""
+import argparse
+import csv
+import functools
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from .alerts import AlertOutbox, AlertScheduler
+from .borders import border_records, migrate_shipment
+from .dates import is_blank
+from .demurrage import compute_demurrage, truck_demurrage_cost
+from .dwell import dwell_table, file_sketches, merge_sketches
+from .normalize import SHIPMENT_DATE_FIELDS, normalize_dates
+from .rollups import build_rollup
+from .status import is_open
+from .versions import version_collection
+
+CLIENT_COLUMNS = [
+    "Client", "Shipments", "Trucks",
+    "Billable days at Loading Point", "Demurrage cost at Loading Point",
+    "Billable days at Borders", "Demurrage cost at Borders", "Total Demurrage cost",
+]
+BORDER_COLUMNS = ["Border", "Trucks", "Open stays", "Billable days", "Demurrage cost"]
+
+
+# --- Loading shipments ---
+
+def read_input_file(path):
+    """Reads shipments from a JSON array or a JSON-lines file (e.g. a mongoexport)."""
+    from bson import json_util  # Ships with pymongo; understands {"$date": ...} values
+
+    with open(path, encoding="utf-8") as fh:
+        text = fh.read()
+    if text.lstrip().startswith("["):
+        return json_util.loads(text)
+    return [json_util.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def connect_collection(mongo_uri, database, collection):
+    from pymongo import MongoClient
+    return MongoClient(mongo_uri)[database][collection]
+
+
+def file_truck_counts(source):
+    """Returns {File Number: truck count} for the whole source, used to balance the partitions."""
+    if source["kind"] == "file":
+        counts = defaultdict(int)
+        for shipment in source["shipments"]:
+            counts[shipment.get("File Number")] += len(shipment.get("Trucks") or [])
+        return dict(counts)
+    collection = connect_collection(source["mongo_uri"], source["database"], source["collection"])
+    pipeline = [{"$group": {
+        "_id": "$File Number",
+        "trucks": {"$sum": {"$size": {"$ifNull": ["$Trucks", []]}}},
+    }}]
+    return {row["_id"]: row["trucks"] for row in collection.aggregate(pipeline)}
+
+
+def partition_file_numbers(counts, partitions):
+    """Splits File Numbers into `partitions` groups of similar truck counts (largest first)."""
+    bins = [[0, []] for _ in range(max(1, partitions))]
+    for file_number, trucks in sorted(counts.items(), key=lambda item: -item[1]):
+        smallest = min(bins, key=lambda b: b[0])
+        smallest[0] += trucks
+        smallest[1].append(file_number)
+    return [file_numbers for _, file_numbers in bins if file_numbers]
+
+
+def split_shipments(shipments, partitions):
+    """Groups in-memory shipments by the File Number partitions."""
+    partition_of = {fn: i for i, file_numbers in enumerate(partitions) for fn in file_numbers}
+    groups = [[] for _ in partitions]
+    for shipment in shipments:
+        groups[partition_of[shipment.get("File Number")]].append(shipment)
+    return groups
+
+
+# --- Pricing and aggregation (runs in the worker processes) ---
+
+def empty_report():
+    return {
+        "clients": defaultdict(lambda: defaultdict(float)),
+        "borders": defaultdict(lambda: defaultdict(float)),
+        "dwell": {},  # (border, transporter) -> KLLSketch
+        "shipments": 0,
+        "trucks": 0,
+    }
+
+
+def price_mongo_partition(source, file_numbers, now, include_closed, as_of=None):
+    """Fetches the shipments of one partition of File Numbers in the worker and prices them."""
+    collection = connect_collection(source["mongo_uri"], source["database"], source["collection"])
+    shipments = list(collection.find({"File Number": {"$in": list(file_numbers)}}, {"_id": 0}))
+    return price_shipments(shipments, now, include_closed, as_of)
+
+
+def price_shipments(shipments, now, include_closed, as_of=None):
+    """
+    Prices one partition of shipments and returns its per-client and per-border totals. With
+    `as_of` every stay is clipped to that date, as the dashboard does; otherwise open stays are
+    priced up to `now`.
+    """
+    if not include_closed:
+        shipments = [s for s in shipments if is_open(s.get("Trucks") or [])]
+    priced_shipments, _ = compute_demurrage(shipments, now=now, as_of=as_of)
+
+    report = empty_report()
+    report["dwell"] = file_sketches(shipments)
+    for shipment in priced_shipments:
+        trucks = shipment["Trucks"]
+        client = report["clients"][shipment.get("Client") or "Unknown"]
+        client["Shipments"] += 1
+        client["Trucks"] += len(trucks)
+        report["shipments"] += 1
+        report["trucks"] += len(trucks)
+        for truck in trucks:
+            client["Billable days at Loading Point"] += truck["Billable days at Loading Point"]
+            client["Demurrage cost at Loading Point"] += truck["Demurrage cost at Loading Point"]
+            client["Billable days at Borders"] += truck["Total Billable days at Borders"]
+            client["Demurrage cost at Borders"] += truck["Total Demurrage cost at Border"]
+            client["Total Demurrage cost"] += truck_demurrage_cost(truck)
+            for record in border_records(truck.get("Borders")):
+                name = record["name"]
+                border = report["borders"][name]
+                border["Trucks"] += 1
+                is_open_stay = not is_blank(record.get("arrival")) and is_blank(record.get("dispatch"))
+                border["Open stays"] += int(is_open_stay)
+                border["Billable days"] += truck[f"Billable days at {name}"]
+                border["Demurrage cost"] += truck[f"Demurrage cost at {name}"]
+
+    # Plain dicts pickle back to the parent process
+    report["clients"] = {k: dict(v) for k, v in report["clients"].items()}
+    report["borders"] = {k: dict(v) for k, v in report["borders"].items()}
+    return report
+
+
+def merge_reports(reports):
+    merged = empty_report()
+    for report in reports:
+        merged["shipments"] += report["shipments"]
+        merged["trucks"] += report["trucks"]
+        for section in ("clients", "borders"):
+            for key, values in report[section].items():
+                for column, value in values.items():
+                    merged[section][key][column] += value
+        for key, sketch in report["dwell"].items():
+            if key in merged["dwell"]:
+                merged["dwell"][key].merge(sketch)
+            else:
+                merged["dwell"][key] = sketch
+    return merged
+
+
+# --- Report files ---
+
+def write_csv(path, columns, rows):
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(columns)
+        for key in sorted(rows, key=str):
+            values = rows[key]
+            writer.writerow([key] + [_format_number(values.get(c, 0)) for c in columns[1:]])
+
+
+def _format_number(value):
+    return int(value) if float(value).is_integer() else round(value, 2)
+
+
+def write_reports(report, out_dir, now, elapsed, as_of=None):
+    os.makedirs(out_dir, exist_ok=True)
+    stamp = now.strftime("%Y-%m-%d")
+    clients_path = os.path.join(out_dir, f"demurrage-by-client-{stamp}.csv")
+    borders_path = os.path.join(out_dir, f"demurrage-by-border-{stamp}.csv")
+    write_csv(clients_path, CLIENT_COLUMNS, report["clients"])
+    write_csv(borders_path, BORDER_COLUMNS, report["borders"])
+    dwell_path = os.path.join(out_dir, f"dwell-times-by-border-{stamp}.csv")
+    dwell_table(merge_sketches([report["dwell"]], "border"), "Border").to_csv(dwell_path, index=False)
+
+    total_cost = sum(c["Total Demurrage cost"] for c in report["clients"].values())
+    summary = {
+        "as_of": as_of.date().isoformat() if as_of is not None else now.isoformat(),
+        "clipped": as_of is not None,
+        "shipments": report["shipments"],
+        "trucks": report["trucks"],
+        "total_demurrage_cost": round(total_cost, 2),
+        "seconds": round(elapsed, 2),
+        "files": [clients_path, borders_path, dwell_path],
+    }
+    with open(os.path.join(out_dir, f"demurrage-summary-{stamp}.json"), "w", encoding="utf-8") as fh:
+        json.dump(summary, fh, indent=2)
+    return summary
+
+
+def source_from_args(args):
+    if args.input:
+        return {"kind": "file", "shipments": read_input_file(args.input)}
+    if args.mongo_uri:
+        return {"kind": "mongo", "mongo_uri": args.mongo_uri,
+                "database": args.database, "collection": args.collection}
+    sys.exit("Pass --mongo-uri or --input")
+
+
+def run_demurrage(args):
+    as_of = pd.Timestamp(args.as_of) if args.as_of else None
+    now = as_of if as_of is not None else pd.Timestamp.now()
+    source = source_from_args(args)
+
+    started = time.perf_counter()
+    workers = args.workers or os.cpu_count() or 1
+    partitions = partition_file_numbers(file_truck_counts(source), workers * 4)
+
+    if source["kind"] == "file":
+        jobs = [(price_shipments, group) for group in split_shipments(source["shipments"], partitions)]
+    else:
+        jobs = [(functools.partial(price_mongo_partition, source), p) for p in partitions]
+
+    if workers == 1:
+        reports = [func(part, now, args.all, as_of) for func, part in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(func, part, now, args.all, as_of) for func, part in jobs]
+            reports = [f.result() for f in futures]
+
+    summary = write_reports(merge_reports(reports), args.out, now, time.perf_counter() - started, as_of)
+    print(f"Priced {summary['trucks']} trucks in {summary['shipments']} "
+          f"{'' if args.all else 'open '}shipments as of {now:%Y-%m-%d} in {summary['seconds']}s "
+          f"({workers} workers): total demurrage R {summary['total_demurrage_cost']:,.2f}")
+    for path in summary["files"]:
+        print(f"  {path}")
+
+
+def run_rollups(args):
+    source = source_from_args(args)
+    if source["kind"] == "file":
+        shipments = source["shipments"]
+    else:
+        shipments = connect_collection(source["mongo_uri"], source["database"], source["collection"]).find({}, {"_id": 0})
+
+    started = time.perf_counter()
+    rollup = build_rollup(shipments)
+    today = pd.Timestamp(args.as_of).date() if args.as_of else None
+    by = ["location" if b == "border" else b for b in args.by]
+    daily = rollup.query(start=args.start, end=args.end, by=by, today=today)
+    daily["day"] = daily["day"].dt.strftime("%Y-%m-%d")
+    daily["cost"] = daily["cost"].round(2)
+    daily.to_csv(args.out, index=False)
+    print(f"Wrote {len(daily)} daily rows ({int(daily['truck_days'].sum()):,} billable truck-days, "
+          f"R {daily['cost'].sum():,.2f}) in {time.perf_counter() - started:.2f}s to {args.out}")
+
+
+def run_alerts(args):
+    source = source_from_args(args)
+    if source["kind"] == "file":
+        shipments = source["shipments"]
+    else:
+        shipments = connect_collection(source["mongo_uri"], source["database"], source["collection"]).find({}, {"_id": 0})
+
+    scheduler = AlertScheduler(lead_days=args.lead_days, outbox=AlertOutbox(args.outbox))
+    scheduler.sync(shipments)
+    today = pd.Timestamp(args.as_of).date() if args.as_of else None
+    raised = scheduler.tick(today)
+    exceeded = sum(1 for a in raised if a.kind == "exceeded")
+    print(f"Raised {len(raised)} alerts ({exceeded} exceeded, {len(raised) - exceeded} approaching); "
+          f"outbox: {args.outbox}")
+
+
+def migrate_collection(collection, batch_size=500, dry_run=False):
+    """
+    Moves every shipment in `collection` to border records, in unordered bulk writes of
+    `batch_size`. Each update only applies if the document still holds the values it was
+    computed from, so a shipment edited meanwhile is left for the next run. Returns counts.
+    """
+    from pymongo import UpdateOne
+
+    counts = {"scanned": 0, "migrated": 0, "already": 0, "skipped": 0, "changed": 0}
+    batch = []
+
+    def flush():
+        if batch and not dry_run:
+            missed = len(batch) - collection.bulk_write(batch, ordered=False).matched_count
+            counts["changed"] += missed
+            counts["migrated"] -= missed
+        batch.clear()
+
+    for shipment in collection.find({}, {"Borders": 1, "Trucks": 1}):
+        counts["scanned"] += 1
+        update = migrate_shipment(shipment)
+        if update is None:
+            counts["already"] += 1
+            continue
+        if update is False:
+            counts["skipped"] += 1
+            print(f"  skipped {shipment['_id']}: 'Borders' holds keys that are not border dates")
+            continue
+        counts["migrated"] += 1
+        unchanged = {"_id": shipment["_id"], **{field: shipment[field] for field in update}}
+        batch.append(UpdateOne(unchanged, {"$set": update}))
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    if not dry_run:
+        collection.create_index("Trucks.Borders.name")
+    return counts
+
+
+def run_migrate_borders(args):
+    if not args.mongo_uri:
+        sys.exit("Pass --mongo-uri")
+    collection = connect_collection(args.mongo_uri, args.database, args.collection)
+    started = time.perf_counter()
+    counts = migrate_collection(collection, args.batch_size, args.dry_run)
+    verb = "Would migrate" if args.dry_run else "Migrated"
+    print(f"{verb} {counts['migrated']} of {counts['scanned']} shipments in {time.perf_counter() - started:.2f}s "
+          f"({counts['already']} already migrated, {counts['skipped']} skipped, "
+          f"{counts['changed']} changed meanwhile; run again to retry them)")
+
+
+def read_checkpoint(path):
+    from bson import json_util
+
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as fh:
+        return json_util.loads(fh.read())
+
+
+def write_checkpoint(path, checkpoint):
+    from bson import json_util
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as fh:
+        fh.write(json_util.dumps(checkpoint))
+    os.replace(f"{path}.tmp", path)
+
+
+def normalize_collection(collection, batch_size=500, dry_run=False, checkpoint_path=None):
+    """
+    Converts the stored dates of every shipment to BSON dates (see normalize.py), walking the
+    collection in _id order, one bulk write per batch. After each batch the last _id and the
+    running counts are saved to `checkpoint_path`, and a later call resumes after that _id.
+    The checkpoint is removed once the whole collection has been walked, so only an
+    interrupted run resumes. As in migrate_collection, a shipment edited since it was read is counted and left alone.
+    """
+    from pymongo import UpdateOne
+
+    checkpoint = read_checkpoint(checkpoint_path) or {
+        "last_id": None, "counts": {"scanned": 0, "normalized": 0, "unchanged": 0, "invalid": 0, "changed": 0},
+    }
+    counts = checkpoint["counts"]
+    projection = {field: 1 for field in SHIPMENT_DATE_FIELDS + ["Borders", "Trucks"]}
+
+    while True:
+        query = {} if checkpoint["last_id"] is None else {"_id": {"$gt": checkpoint["last_id"]}}
+        shipments = list(collection.find(query, projection).sort("_id", 1).limit(batch_size))
+        if not shipments:
+            break
+        batch = []
+        for shipment in shipments:
+            counts["scanned"] += 1
+            changes, invalid = normalize_dates(shipment)
+            if invalid:
+                counts["invalid"] += 1
+                print(f"  {shipment['_id']}: left values that are not dates: {', '.join(invalid)}")
+            if not changes:
+                counts["unchanged"] += 1
+                continue
+            counts["normalized"] += 1
+            unchanged = {"_id": shipment["_id"], **{field: shipment[field] for field in changes}}
+            batch.append(UpdateOne(unchanged, {"$set": changes}))
+        if batch and not dry_run:
+            missed = len(batch) - collection.bulk_write(batch, ordered=False).matched_count
+            counts["changed"] += missed
+            counts["normalized"] -= missed
+        checkpoint["last_id"] = shipments[-1]["_id"]
+        if checkpoint_path and not dry_run:
+            write_checkpoint(checkpoint_path, checkpoint)
+    if checkpoint_path and not dry_run and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)  # Done: the next run walks the whole collection again
+    return counts
+
+
+def run_normalize_dates(args):
+    if not args.mongo_uri:
+        sys.exit("Pass --mongo-uri")
+    if args.restart and args.checkpoint and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    collection = connect_collection(args.mongo_uri, args.database, args.collection)
+    started = time.perf_counter()
+    counts = normalize_collection(collection, args.batch_size, args.dry_run, args.checkpoint)
+    verb = "Would normalize" if args.dry_run else "Normalized"
+    print(f"{verb} dates in {counts['normalized']} of {counts['scanned']} shipments in "
+          f"{time.perf_counter() - started:.2f}s ({counts['unchanged']} already normalized, "
+          f"{counts['invalid']} with values that are not dates, {counts['changed']} changed meanwhile)")
+    if counts["changed"]:
+        print("Run again to pick up the shipments that changed meanwhile.")
+
+
+def run_version_shipments(args):
+    if not args.mongo_uri:
+        sys.exit("Pass --mongo-uri")
+    collection = connect_collection(args.mongo_uri, args.database, args.collection)
+    started = time.perf_counter()
+    counts = version_collection(collection, args.dry_run)
+    verb = "Would move" if args.dry_run else "Moved"
+    print(f"{verb} {counts['archived']} older versions of {counts['shipments']} shipments to "
+          f"{args.collection}_history and numbered {counts['numbered']} current versions in "
+          f"{time.perf_counter() - started:.2f}s ({counts['without_id']} documents without a Unique ID left as they are)")
+
+
+def add_source_arguments(parser):
+    parser.add_argument("--mongo-uri", default=os.environ.get("MONGO_URI"))
+    parser.add_argument("--database", default="seamaster")
+    parser.add_argument("--collection", default="shipments")
+    parser.add_argument("--input", default=None, help="Read shipments from a JSON / JSON-lines file instead")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m seamaster_core", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    demurrage = commands.add_parser("demurrage", help="Write per-client and per-border demurrage reports")
+    add_source_arguments(demurrage)
+    demurrage.add_argument("--out", default="reports", help="Directory for the report files")
+    demurrage.add_argument("--as-of", default=None, help="Price stays as they stood on this date, clipping later days (default: now)")
+    demurrage.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    demurrage.add_argument("--all", action="store_true", help="Include closed shipments")
+    demurrage.set_defaults(handler=run_demurrage)
+
+    rollups = commands.add_parser("rollups", help="Export daily demurrage rollups as CSV")
+    add_source_arguments(rollups)
+    rollups.add_argument("--start", default=None, help="First day (YYYY-MM-DD)")
+    rollups.add_argument("--end", default=None, help="Last day (YYYY-MM-DD)")
+    rollups.add_argument("--by", nargs="*", default=["client"], choices=["client", "transporter", "border"],
+                         help="Dimensions to keep besides the day")
+    rollups.add_argument("--as-of", default=None, help="Count open stays up to this date (default: today)")
+    rollups.add_argument("--out", default="demurrage-daily.csv")
+    rollups.set_defaults(handler=run_rollups)
+
+    alerts = commands.add_parser("alerts", help="Write free-days alerts to a JSON-lines outbox")
+    add_source_arguments(alerts)
+    alerts.add_argument("--as-of", default=None, help="Raise the alerts due by this date (default: today)")
+    alerts.add_argument("--lead-days", type=int, default=1, help="Warn this many days before free days run out")
+    alerts.add_argument("--outbox", default="logs/alerts.jsonl")
+    alerts.set_defaults(handler=run_alerts)
+
+    migrate = commands.add_parser("migrate-borders", help="Rewrite legacy 'Borders' dicts as border records")
+    migrate.add_argument("--mongo-uri", default=os.environ.get("MONGO_URI"))
+    migrate.add_argument("--database", default="seamaster")
+    migrate.add_argument("--collection", default="shipments")
+    migrate.add_argument("--batch-size", type=int, default=500)
+    migrate.add_argument("--dry-run", action="store_true", help="Only count the shipments to migrate")
+    migrate.set_defaults(handler=run_migrate_borders)
+
+    normalize = commands.add_parser("normalize-dates", help="Convert stored dates to BSON dates, resumably")
+    normalize.add_argument("--mongo-uri", default=os.environ.get("MONGO_URI"))
+    normalize.add_argument("--database", default="seamaster")
+    normalize.add_argument("--collection", default="shipments")
+    normalize.add_argument("--batch-size", type=int, default=500)
+    normalize.add_argument("--checkpoint", default="logs/normalize-dates.json",
+                           help="Progress file; an interrupted run resumes from it")
+    normalize.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start over")
+    normalize.add_argument("--dry-run", action="store_true", help="Only count the shipments to convert")
+    normalize.set_defaults(handler=run_normalize_dates)
+
+    versions = commands.add_parser("version-shipments", help="Keep one current document per Unique ID")
+    versions.add_argument("--mongo-uri", default=os.environ.get("MONGO_URI"))
+    versions.add_argument("--database", default="seamaster")
+    versions.add_argument("--collection", default="shipments")
+    versions.add_argument("--dry-run", action="store_true", help="Only count the versions to move")
+    versions.set_defaults(handler=run_version_shipments)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+from datetime import date, datetime, timezone
+from functools import lru_cache
+
+import pandas as pd
+
+# --- Date values as stored in the shipments collection ---
+# Truck and border dates arrive as datetimes, ISO strings, epoch milliseconds or blanks
+# ("" / None), depending on which screen or import wrote them. New writes go through
+# to_bson_date(), and `python -m seamaster_core normalize-dates` converts older values, so
+# stored dates are BSON datetimes (read back as datetime objects) or None. Those take the
+# fast path below and are used as they are, with no parsing.
+
+
+@lru_cache(maxsize=65536)
+def _parse_date_string(value):
+    return pd.to_datetime(value, errors="coerce")
+
+
+def _from_epoch_ms(value):
+    # pd.Timestamp is an order of magnitude faster than pd.to_datetime for one value
+    try:
+        return pd.Timestamp(value, unit="ms")
+    except (ValueError, OverflowError):
+        return pd.NaT
+
+
+def _to_timestamp(value):
+    if isinstance(value, datetime):
+        return value  # A BSON date (or already a Timestamp / NaT): nothing to parse
+    if isinstance(value, (int, float)):
+        return _from_epoch_ms(value)
+    if isinstance(value, str):
+        return _parse_date_string(value)
+    return pd.to_datetime(value, errors="coerce")
+
+
+def is_blank(value):
+    return value is None or (isinstance(value, str) and value.strip() == "")
+
+
+def parse_date(value):
+    """
+    Returns `value` as a datetime (a pandas Timestamp unless it was stored as a BSON date), NaT
+    if it cannot be parsed, or None when blank. Numbers are epoch milliseconds. Repeated
+    strings are parsed once.
+    """
+    if is_blank(value):
+        return None
+    try:
+        return _to_timestamp(value)
+    except Exception:
+        return pd.NaT  # Set to NaT if parsing fails
+
+
+def to_bson_date(value):
+    """
+    The value to store for a date: a naive UTC datetime, or None when blank. Raises ValueError
+    for a value that cannot be read as a date.
+    """
+    if isinstance(value, float) and value != value:
+        return None  # NaN, e.g. a missing cell of a DataFrame
+    if isinstance(value, date) and not isinstance(value, datetime):
+        value = datetime.combine(value, datetime.min.time())
+    parsed = parse_date(value)
+    if parsed is None:
+        return None
+    if not pd.notna(parsed):
+        raise ValueError(f"Not a date: {value!r}")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    if isinstance(parsed, pd.Timestamp):
+        parsed = parsed.to_pydatetime()
+    return parsed
+
+
+def format_date_for_display(value):
+    """Formats any stored date value as YYYY-MM-DD, or "" when it is blank or unparseable."""
+    if is_blank(value):
+        return ""
+    try:
+        dt_obj = _to_timestamp(value)
+        if pd.notna(dt_obj):
+            return dt_obj.strftime("%Y-%m-%d")
+        else:
+            return ""
+    except Exception:
+        return str(value)
+
+
+def days_between(start, end):
+    """Whole calendar days from `start` to `end`, ignoring the time of day."""
+    if (start.tzinfo is None) != (end.tzinfo is None):
+        raise TypeError("Cannot compare tz-naive and tz-aware dates")
+    # Same as (end.floor('D') - start.floor('D')).days without building Timedeltas
+    return end.toordinal() - start.toordinal()
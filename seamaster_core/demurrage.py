@@ -0,0 +1,224 @@
+from collections import namedtuple
+from datetime import datetime
+
+import pandas as pd
+
+from .borders import border_names, border_records
+from .cache import Cache
+from .dates import days_between, parse_date
+
+# --- Demurrage rules ---
+# A truck accrues demurrage for every stay (at the loading point and at each border):
+# whole calendar days from arrival to dispatch, less the free days, times the demurrage
+# rate. Stays without a dispatch date are still open and are priced up to `now`.
+
+LOADING_POINT = "Loading Point"
+
+# One stay of a truck at a location. `arrival`/`dispatch` are Timestamps, NaT or None.
+Stay = namedtuple("Stay", ["location", "arrival", "dispatch", "free_days"])
+
+
+def ordered_border_names(truck):
+    """Returns the truck's border names in route order."""
+    return border_names(truck.get("Borders"))
+
+
+def truck_rate(truck, shipment_rate=0.0):
+    """The truck's demurrage rate, falling back to its shipment's."""
+    return float(truck.get("Demurrage Rate", shipment_rate) or 0.0)
+
+
+def truck_stays(truck):
+    """Yields the truck's loading point stay followed by one stay per border, in route order."""
+    yield Stay(
+        LOADING_POINT,
+        parse_date(truck.get("Arrived at Loading point")),
+        parse_date(truck.get("Dispatch date")),
+        int(truck.get("Free Days at Loading Point", 0) or 0),
+    )
+    records = border_records(truck.get("Borders"))
+    if records:
+        free_days_border = int(truck.get("Free Days at Border", 0) or 0)
+        for record in records:
+            yield Stay(
+                record["name"],
+                parse_date(record.get("arrival")),
+                parse_date(record.get("dispatch")),
+                free_days_border,
+            )
+
+
+def billable_days(stay, now, clip_to_now=False):
+    """
+    Days of `stay` beyond its free days; an open stay counts up to `now`. 0 without an arrival.
+    With `clip_to_now`, the stay is seen as it stood on the day of `now`: a later arrival does
+    not count yet and a later dispatch leaves it open.
+    """
+    if not pd.notna(stay.arrival):
+        return 0
+    end = stay.dispatch if pd.notna(stay.dispatch) else now
+    if clip_to_now:
+        if stay.arrival.toordinal() > now.toordinal():
+            return 0
+        if end.toordinal() > now.toordinal():
+            end = now
+    return max(0, days_between(stay.arrival, end) - stay.free_days)
+
+
+def is_open_stay(stay):
+    """An open stay has an arrival but no dispatch yet, so its billable days grow every day."""
+    return pd.notna(stay.arrival) and not pd.notna(stay.dispatch)
+
+
+def price_plan(truck):
+    """
+    Parses the truck's stays once into [(stay, fixed_days)], where fixed_days are the billable
+    days of a closed stay (they never change) and None for an open stay.
+    """
+    return [(stay, None if is_open_stay(stay) else billable_days(stay, None)) for stay in truck_stays(truck)]
+
+
+def _price_from_plan(truck, rate, plan, now, clip_to_now):
+    priced = truck.copy()
+    border_days = 0
+    border_cost = 0.0
+    for stay, fixed_days in plan:
+        if fixed_days is None or clip_to_now:
+            days = billable_days(stay, now, clip_to_now)
+        else:
+            days = fixed_days
+        cost = days * rate
+        priced[f"Billable days at {stay.location}"] = days
+        priced[f"Demurrage cost at {stay.location}"] = cost
+        if stay.location != LOADING_POINT:
+            border_days += days
+            border_cost += cost
+    priced["Total Billable days at Borders"] = border_days
+    priced["Total Demurrage cost at Border"] = border_cost
+    return priced
+
+
+def price_truck(truck, shipment_rate=0.0, now=None, clip_to_now=False):
+    """
+    Returns a copy of `truck` with billable days and demurrage cost added for the loading
+    point, each border and the border total.
+    """
+    now = pd.Timestamp(now) if now is not None else pd.Timestamp(datetime.now())
+    plan = [(stay, None) for stay in truck_stays(truck)]
+    return _price_from_plan(truck, truck_rate(truck, shipment_rate), plan, now, clip_to_now)
+
+
+def stay_fingerprint(truck, shipment_rate=0.0):
+    """A cheap key over the raw inputs of a truck's stays; equal fingerprints price the same."""
+    borders = truck.get("Borders")
+    return repr((
+        truck_rate(truck, shipment_rate),
+        truck.get("Arrived at Loading point"), truck.get("Dispatch date"),
+        truck.get("Free Days at Loading Point"), truck.get("Free Days at Border"),
+        borders if isinstance(borders, (dict, list)) else None,
+    ))
+
+
+class PricingCache(Cache):
+    """
+    Keeps each truck's parsed stays and closed-stay results, keyed by truck identity and the
+    fingerprint of its stay inputs. Closed stays never change, so once warm, pricing a truck
+    only recomputes its open stays against `now`; a truck whose inputs change is re-parsed.
+    Every truck stays cached, so nothing is evicted.
+    """
+
+    backend = "memory"
+
+    def __init__(self, name=None):
+        super().__init__(name)
+        self._entries = {}  # truck key -> (fingerprint, rate, plan)
+
+    def price_truck(self, truck_key, truck, shipment_rate, now, clip_to_now=False):
+        fingerprint = stay_fingerprint(truck, shipment_rate)
+        entry = self._entries.get(truck_key)
+        if entry is None or entry[0] != fingerprint:
+            entry = (fingerprint, truck_rate(truck, shipment_rate), price_plan(truck))
+            self._entries[truck_key] = entry
+            self.misses += 1
+        else:
+            self.hits += 1
+        return _price_from_plan(truck, entry[1], entry[2], now, clip_to_now)
+
+    def open_stays(self):
+        """Number of open stays among the cached trucks, i.e. what a warm rerun recomputes."""
+        return sum(1 for _, _, plan in list(self._entries.values()) for _, fixed in plan if fixed is None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def truck_demurrage_cost(priced_truck):
+    """Loading point plus border demurrage of a truck returned by price_truck."""
+    return priced_truck.get("Demurrage cost at Loading Point", 0.0) + priced_truck.get("Total Demurrage cost at Border", 0.0)
+
+
+def compute_demurrage(shipments, now=None, as_of=None, cache=None):
+    """
+    Calculates billable days and demurrage costs for every truck of `shipments` (a DataFrame
+    or an iterable of shipment dicts). Returns the shipments as dicts with the priced trucks,
+    plus the totals for the KPI row. Open stays are priced up to `now`; pass `as_of` (a date)
+    instead to price every stay as it stood at the end of that day. With a PricingCache, trucks
+    seen before skip parsing and only their open stays are recomputed.
+    """
+    if as_of is not None:
+        now = as_of
+    now = pd.Timestamp(now) if now is not None else pd.Timestamp(datetime.now())
+    if isinstance(shipments, pd.DataFrame):
+        # to_dict("records") builds one plain dict per shipment without a Series per row
+        records = shipments.to_dict("records")
+    else:
+        records = [dict(s) for s in shipments]
+
+    total_trucks = 0
+    total_demurrage_costs_sum = 0
+    total_days_on_site = 0
+    truck_count_for_avg_days = 0
+
+    for shipment in records:
+        trucks_with_demurrage = []
+        # Ensure 'Demurrage Rate' from shipment level is used if not present at truck level
+        shipment_rate = float(shipment.get("Demurrage Rate", 0.0) or 0.0)
+
+        uid = shipment.get("Unique ID")
+        if isinstance(shipment.get("Trucks"), list):
+            for position, truck in enumerate(shipment["Trucks"]):
+                if cache is not None and uid is not None:
+                    priced = cache.price_truck((uid, position), truck, shipment_rate, now, as_of is not None)
+                else:
+                    priced = price_truck(truck, shipment_rate, now, clip_to_now=as_of is not None)
+                total_demurrage_costs_sum += truck_demurrage_cost(priced)
+                if "Days on site" in priced and pd.notna(priced["Days on site"]):
+                    total_days_on_site += priced["Days on site"]
+                    truck_count_for_avg_days += 1
+                trucks_with_demurrage.append(priced)
+
+        total_trucks += len(trucks_with_demurrage)
+        shipment["Trucks"] = trucks_with_demurrage
+
+    totals = {
+        "total_trucks": total_trucks,
+        "total_demurrage_costs": total_demurrage_costs_sum,
+        "total_days_on_site": total_days_on_site,
+        "truck_count_for_avg_days": truck_count_for_avg_days,
+    }
+    return records, totals
+
+
+def shipment_demurrage_summary(priced_trucks):
+    """Total demurrage and average days on site over a shipment's priced trucks."""
+    total_cost = 0.0
+    total_standing_time = 0.0
+    standing_count = 0
+    for truck in priced_trucks:
+        total_cost += truck.get("Demurrage cost at Loading Point", 0.0)
+        total_cost += truck.get("Total Demurrage cost at Border", 0.0)
+        if pd.notna(truck.get("Days on site")):
+            total_standing_time += truck.get("Days on site", 0.0)
+            standing_count += 1
+    avg_standing_time = total_standing_time / standing_count if standing_count > 0 else 0.0
+    return total_cost, avg_standing_time
@@ -0,0 +1,130 @@
+import threading
+from collections import defaultdict
+
+import pandas as pd
+
+from .dates import days_between
+from .demurrage import LOADING_POINT, stay_fingerprint, truck_stays
+from .rollups import shipment_records
+from .sketches import KLLSketch
+
+# --- Border dwell times ---
+# Dwell time is the calendar days from arrival at a border to dispatch from it (closed
+# stays only), the same day count the billable-day columns start from. Stays are summarized
+# per File Number into KLL sketches keyed by (border, transporter), so a changed file only
+# rebuilds its own sketches, and any selection of files (a dashboard filter, or one batch
+# partition) is summarized by merging sketches instead of sorting every stay.
+
+QUANTILES = {"Median": 0.5, "p90": 0.9, "p99": 0.99}
+SKETCH_K = 200
+
+
+def border_dwell_days(truck):
+    """Yields (border, dwell days) for each border the truck has arrived at and left."""
+    for stay in truck_stays(truck):
+        if stay.location == LOADING_POINT or not pd.notna(stay.arrival) or not pd.notna(stay.dispatch):
+            continue
+        days = days_between(stay.arrival, stay.dispatch)
+        if days >= 0:
+            yield stay.location, days
+
+
+def file_sketches(shipments):
+    """{(border, transporter): KLLSketch} over the closed border stays of `shipments`."""
+    sketches = {}
+    for shipment in shipments:
+        transporter = shipment.get("Transporter") or "Unknown"
+        for truck in shipment.get("Trucks") or []:
+            if not isinstance(truck, dict):
+                continue
+            for border, days in border_dwell_days(truck):
+                key = (border, transporter)
+                if key not in sketches:
+                    sketches[key] = KLLSketch(SKETCH_K, seed=0)
+                sketches[key].update(days)
+    return sketches
+
+
+def merge_sketches(groups, by):
+    """Merges {(border, transporter): sketch} dicts into {border or transporter: sketch}."""
+    index = 0 if by == "border" else 1
+    merged = {}
+    for sketches in groups:
+        for key, sketch in sketches.items():
+            name = key[index]
+            if name not in merged:
+                merged[name] = KLLSketch(SKETCH_K, seed=0)
+            merged[name].merge(sketch)
+    return merged
+
+
+def dwell_table(merged, label):
+    """One row per border (or transporter): stays, median, p90, p99 and max dwell days."""
+    rows = []
+    for name in sorted(merged, key=str):
+        sketch = merged[name]
+        values = sketch.quantiles(list(QUANTILES.values()))
+        row = {label: name, "Stays": sketch.count}
+        row.update({column: round(value, 1) for column, value in zip(QUANTILES, values)})
+        row["Max"] = sketch.max
+        rows.append(row)
+    return pd.DataFrame(rows, columns=[label, "Stays", *QUANTILES, "Max"])
+
+
+class DwellStats:
+    """
+    Dwell-time sketches per File Number, kept in step with the shipments by sync(), which
+    only rebuilds the files whose trucks changed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._files = {}  # File Number -> (fingerprint, {(border, transporter): sketch})
+        self._version = 0
+        self._summaries = {}  # (file numbers, by) -> DataFrame, for the current version
+
+    def sync(self, shipments):
+        """Brings the sketches in line with `shipments`. Returns the number of files rebuilt."""
+        by_file = defaultdict(list)
+        for shipment in shipment_records(shipments):
+            if isinstance(shipment.get("Trucks"), list):
+                by_file[shipment.get("File Number")].append(shipment)
+
+        rebuilt = {}
+        for file_number, file_shipments in by_file.items():
+            fingerprint = repr([
+                (s.get("Transporter"), [stay_fingerprint(t) for t in s["Trucks"] if isinstance(t, dict)])
+                for s in file_shipments
+            ])
+            current = self._files.get(file_number)
+            if current is None or current[0] != fingerprint:
+                rebuilt[file_number] = (fingerprint, file_sketches(file_shipments))
+
+        with self._lock:
+            removed = [fn for fn in self._files if fn not in by_file]
+            for file_number in removed:
+                del self._files[file_number]
+            self._files.update(rebuilt)
+            if rebuilt or removed:
+                self._version += 1
+                self._summaries = {}
+        return len(rebuilt) + len(removed)
+
+    def summary(self, by="border", file_numbers=None):
+        """Dwell-time quantiles per border or per transporter, over some or all File Numbers."""
+        selection = frozenset(file_numbers) if file_numbers is not None else None
+        with self._lock:
+            cached = self._summaries.get((selection, by))
+            if cached is not None:
+                return cached
+            version = self._version
+            groups = [sketches for fn, (_, sketches) in self._files.items()
+                      if selection is None or fn in selection]
+
+        table = dwell_table(merge_sketches(groups, by), "Border" if by == "border" else "Transporter")
+        with self._lock:
+            if self._version == version:
+                if len(self._summaries) >= 32:
+                    self._summaries = {}  # Many filter selections: start over rather than grow
+                self._summaries[(selection, by)] = table
+        return table
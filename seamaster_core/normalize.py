@@ -0,0 +1,79 @@
+from .borders import ARRIVAL_PREFIX, DISPATCH_PREFIX
+from .dates import to_bson_date
+
+# --- Date normalization on write ---
+# Every date field of a shipment, its trucks and their border records is stored as a BSON
+# datetime or None. normalize_dates() computes the changes for one document: the write path
+# applies them before inserting, and the normalize-dates backfill $sets them on old documents.
+
+SHIPMENT_DATE_FIELDS = [
+    "Date Submitted", "Date", "Load Start Date", "Load End Date", "ETA",
+    "Actual arrival date", "Actual loading date", "Offloading arrival", "Date offloaded",
+]
+TRUCK_DATE_FIELDS = [
+    "Date", "Load Start Date", "Load End Date", "ETA", "Arrived at Loading point", "Loaded Date",
+    "Dispatch date", "Date Arrived", "Offloading arrival", "Date offloaded",
+]
+
+
+def _normalize_fields(document, fields, path, invalid):
+    """Returns a copy of `document` with `fields` normalized, or `document` itself if none changed."""
+    changed = {}
+    for field in fields:
+        if field not in document:
+            continue
+        value = document[field]
+        try:
+            normalized = to_bson_date(value)
+        except ValueError:
+            invalid.append(f"{path}{field}")
+            continue
+        if type(normalized) is not type(value) or normalized != value:
+            changed[field] = normalized
+    return {**document, **changed} if changed else document
+
+
+def _normalize_borders(borders, path, invalid):
+    if isinstance(borders, list):
+        normalized = [
+            _normalize_fields(record, ["arrival", "dispatch"], f"{path}Borders.{i}.", invalid)
+            if isinstance(record, dict) else record
+            for i, record in enumerate(borders)
+        ]
+        return normalized if any(a is not b for a, b in zip(normalized, borders)) else borders
+    if isinstance(borders, dict):
+        # A document not yet moved to border records (see migrate-borders)
+        keys = [key for key in borders if key.startswith((ARRIVAL_PREFIX, DISPATCH_PREFIX))]
+        return _normalize_fields(borders, keys, f"{path}Borders.", invalid)
+    return borders
+
+
+def normalize_dates(shipment):
+    """
+    Returns ({field: new value}, [invalid field paths]) for `shipment`: the top-level fields
+    whose dates (including those of its trucks and border records) need converting, and the
+    values that cannot be read as dates, which are left as they are.
+    """
+    invalid = []
+    normalized = _normalize_fields(shipment, SHIPMENT_DATE_FIELDS, "", invalid)
+    changes = {field: normalized[field] for field in SHIPMENT_DATE_FIELDS
+               if field in shipment and normalized[field] is not shipment[field]}
+
+    borders = _normalize_borders(shipment.get("Borders"), "", invalid)
+    if borders is not shipment.get("Borders"):
+        changes["Borders"] = borders
+
+    trucks = shipment.get("Trucks")
+    if isinstance(trucks, list):
+        new_trucks = []
+        for i, truck in enumerate(trucks):
+            if isinstance(truck, dict):
+                new_truck = _normalize_fields(truck, TRUCK_DATE_FIELDS, f"Trucks.{i}.", invalid)
+                truck_borders = _normalize_borders(truck.get("Borders"), f"Trucks.{i}.", invalid)
+                if truck_borders is not truck.get("Borders"):
+                    new_truck = {**new_truck, "Borders": truck_borders}
+                truck = new_truck
+            new_trucks.append(truck)
+        if any(a is not b for a, b in zip(new_trucks, trucks)):
+            changes["Trucks"] = new_trucks
+    return changes, invalid
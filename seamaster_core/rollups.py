@@ -0,0 +1,173 @@
+import threading
+from collections import defaultdict
+from datetime import date
+
+import pandas as pd
+
+from .demurrage import stay_fingerprint, truck_rate, truck_stays
+
+# --- Daily demurrage rollups ---
+# Billable truck-days and cost per day × client × transporter × location (the loading point
+# or a border), for trend charts over any date range.
+#
+# A stay with arrival A, free days F and end E (its dispatch, or today while it is open)
+# bills one truck-day on each day from A + F + 1 through E, which is the same count as
+# billable_days(). The rollup stores each stay as two boundary deltas (+1 truck-day and
+# +rate on its first billable day, -1 and -rate on the day after it ends; open stays have
+# no end), so adding, closing or correcting a stay touches two cells whatever its length.
+# The per-day table is the running sum of the deltas, rebuilt only when they change.
+
+DIMENSIONS = ["client", "transporter", "location"]
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def truck_fingerprint(truck, shipment_rate, client, transporter):
+    """The stay fingerprint plus the rollup dimensions, which also move a truck's rows."""
+    return repr((stay_fingerprint(truck, shipment_rate), client, transporter))
+
+
+def stay_rows(truck, shipment_rate, client, transporter):
+    """
+    Returns one (client, transporter, location, first_day, last_day, rate) row per stay that
+    can bill: days are date ordinals, and last_day is None while the stay is open.
+    """
+    rate = truck_rate(truck, shipment_rate)
+    rows = []
+    for stay in truck_stays(truck):
+        if not pd.notna(stay.arrival):
+            continue
+        first_day = stay.arrival.toordinal() + stay.free_days + 1
+        last_day = stay.dispatch.toordinal() if pd.notna(stay.dispatch) else None
+        if last_day is not None and last_day < first_day:
+            continue  # Left within the free days
+        rows.append((client, transporter, stay.location, first_day, last_day, rate))
+    return rows
+
+
+def shipment_records(shipments):
+    if isinstance(shipments, pd.DataFrame):
+        return shipments.to_dict("records")
+    return shipments
+
+
+class DailyRollup:
+    """
+    Daily demurrage rollup kept in step with the shipments by sync(), which only re-reads
+    trucks whose stay inputs changed. Safe to query from other threads while syncing.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._deltas = defaultdict(lambda: [0, 0.0])  # (day, client, transporter, location) -> [truck-days, cost]
+        self._trucks = {}  # (Unique ID, position) -> (fingerprint, rows)
+        self._version = 0
+        self._table = None  # (version, last_day, DataFrame)
+
+    def _apply_rows(self, rows, sign):
+        for client, transporter, location, first_day, last_day, rate in rows:
+            cell = self._deltas[(first_day, client, transporter, location)]
+            cell[0] += sign
+            cell[1] += sign * rate
+            if last_day is not None:
+                cell = self._deltas[(last_day + 1, client, transporter, location)]
+                cell[0] -= sign
+                cell[1] -= sign * rate
+
+    def apply_truck_event(self, truck_key, truck, shipment):
+        """Records a new or changed truck (e.g. a dispatch date was entered). Returns True if it changed."""
+        shipment_rate = float(shipment.get("Demurrage Rate", 0.0) or 0.0)
+        client = shipment.get("Client") or "Unknown"
+        transporter = shipment.get("Transporter") or "Unknown"
+        fingerprint = truck_fingerprint(truck, shipment_rate, client, transporter)
+        with self._lock:
+            previous = self._trucks.get(truck_key)
+            if previous is not None and previous[0] == fingerprint:
+                return False
+            rows = stay_rows(truck, shipment_rate, client, transporter)
+            if previous is not None:
+                self._apply_rows(previous[1], -1)
+            self._apply_rows(rows, +1)
+            self._trucks[truck_key] = (fingerprint, rows)
+            self._version += 1
+            return True
+
+    def remove_truck(self, truck_key):
+        with self._lock:
+            previous = self._trucks.pop(truck_key, None)
+            if previous is not None:
+                self._apply_rows(previous[1], -1)
+                self._version += 1
+
+    def sync(self, shipments):
+        """Brings the rollup in line with `shipments` (a DataFrame or dicts). Returns the number of trucks changed."""
+        changed = 0
+        seen = set()
+        for shipment in shipment_records(shipments):
+            trucks = shipment.get("Trucks")
+            if not isinstance(trucks, list):
+                continue
+            uid = shipment.get("Unique ID")
+            for position, truck in enumerate(trucks):
+                truck_key = (uid, position)
+                seen.add(truck_key)
+                changed += self.apply_truck_event(truck_key, truck, shipment)
+        for truck_key in [k for k in self._trucks if k not in seen]:
+            self.remove_truck(truck_key)
+            changed += 1
+        return changed
+
+    def table(self, today=None):
+        """The materialized daily rollup up to `today`: one row per day × client × transporter × location."""
+        today = (today or date.today()).toordinal()
+        with self._lock:
+            cached = self._table
+            if cached is not None and cached[0] == self._version and cached[1] == today:
+                return cached[2]
+            version = self._version
+            deltas = [key + tuple(cell) for key, cell in self._deltas.items() if cell[0] or cell[1]]
+
+        columns = ["day"] + DIMENSIONS + ["truck_days", "cost"]
+        frame = pd.DataFrame(deltas, columns=columns)
+        frame = frame[frame["day"] <= today]
+        if frame.empty:
+            table = pd.DataFrame(columns=columns)
+        else:
+            # Running sum of the boundary deltas per key, over every day up to today
+            wide = frame.pivot_table(index="day", columns=DIMENSIONS, values=["truck_days", "cost"], aggfunc="sum")
+            wide = wide.reindex(range(wide.index.min(), today + 1)).fillna(0).cumsum()
+            table = wide.stack(DIMENSIONS, future_stack=True).reset_index()
+            table = table[(table["truck_days"].round() != 0) | (table["cost"].round(6) != 0)]
+            table["truck_days"] = table["truck_days"].round().astype(int)
+            table["day"] = pd.to_datetime(table["day"] - EPOCH_ORDINAL, unit="D")
+            table = table[columns].reset_index(drop=True)
+
+        with self._lock:
+            if self._version == version:
+                self._table = (version, today, table)
+        return table
+
+    def query(self, start=None, end=None, by=("location",), clients=None, today=None):
+        """
+        Daily truck-days and cost between `start` and `end` (dates, inclusive), summed per day
+        and the `by` dimensions, optionally limited to some clients.
+        """
+        table = self.table(today)
+        mask = pd.Series(True, index=table.index)
+        if start is not None:
+            mask &= table["day"] >= pd.Timestamp(start).normalize()
+        if end is not None:
+            mask &= table["day"] <= pd.Timestamp(end).normalize()
+        if clients:
+            mask &= table["client"].isin(list(clients))
+        return (
+            table[mask]
+            .groupby(["day"] + list(by), as_index=False)[["truck_days", "cost"]]
+            .sum()
+        )
+
+
+def build_rollup(shipments):
+    """Builds a DailyRollup from scratch, e.g. for a batch job."""
+    rollup = DailyRollup()
+    rollup.sync(shipments)
+    return rollup
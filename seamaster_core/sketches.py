@@ -0,0 +1,88 @@
+import math
+import random
+
+# --- Streaming quantile sketch (KLL) ---
+# Karnin, Lang & Liberty's compactor hierarchy: level h holds items of weight 2**h. When the
+# sketch is over capacity, the lowest full level is sorted and every other item (from a
+# random offset) is promoted one level up, halving it. Memory stays O(k) and rank errors stay
+# around 1.7/k whatever the stream length, and two sketches merge by concatenating levels and
+# compacting, so partitions can be summarized separately and combined. Up to k items are
+# kept exactly.
+
+
+class KLLSketch:
+    """Mergeable quantile sketch over a stream of numbers."""
+
+    def __init__(self, k=200, seed=None):
+        self.k = k
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self._levels = [[]]
+        self._size = 0
+        self._rng = random.Random(seed)
+
+    def _capacity(self, level):
+        depth = len(self._levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        while self._size > sum(self._capacity(h) for h in range(len(self._levels))):
+            for h, items in enumerate(self._levels):
+                if len(items) >= self._capacity(h):
+                    if h + 1 == len(self._levels):
+                        self._levels.append([])
+                    items.sort()
+                    # An odd item out stays behind so the promoted weight matches what left
+                    kept = [items.pop()] if len(items) % 2 else []
+                    promoted = items[self._rng.randint(0, 1)::2]
+                    self._levels[h + 1].extend(promoted)
+                    self._levels[h] = kept
+                    self._size -= len(items) - len(promoted)
+                    break
+
+    def update(self, value):
+        value = float(value)
+        self.count += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self._levels[0].append(value)
+        self._size += 1
+        if self._size > self.k:
+            self._compress()
+
+    def merge(self, other):
+        """Folds `other` into this sketch (in place) and returns it."""
+        while len(self._levels) < len(other._levels):
+            self._levels.append([])
+        for h, items in enumerate(other._levels):
+            self._levels[h].extend(items)
+            self._size += len(items)
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def quantiles(self, qs):
+        """Estimated values at the ranks `qs` (fractions in [0, 1]); NaN while empty."""
+        if self.count == 0:
+            return [math.nan for _ in qs]
+        weighted = sorted((value, 1 << h) for h, items in enumerate(self._levels) for value in items)
+        total = sum(w for _, w in weighted)
+        results = []
+        for q in qs:
+            target = q * total
+            seen = 0
+            for value, weight in weighted:
+                seen += weight
+                if seen >= target:
+                    break
+            results.append(min(max(value, self.min), self.max))
+        return results
+
+    def quantile(self, q):
+        return self.quantiles([q])[0]
+
+    def __len__(self):
+        return self.count
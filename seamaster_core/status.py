@@ -0,0 +1,62 @@
+import pandas as pd
+
+from .borders import border_records
+from .dates import is_blank
+
+# --- Shipment progress status ---
+
+
+def _has_date(value):
+    # A blank string counts as no date, as it does when stays are priced
+    return not is_blank(value) and pd.notna(value)
+
+
+def geo_type(shipment_type_raw):
+    """'Cross Border', 'Local' or 'Unknown' from a stored Shipment Type value."""
+    if shipment_type_raw is None or pd.isna(shipment_type_raw):
+        return "Unknown"
+    return str(shipment_type_raw).replace("-", " ")
+
+
+def shipment_status(trucks, geo_type):
+    """
+    Returns the (icon, label) progress status of a shipment from its trucks: all offloaded,
+    dispatched from the last border, partially dispatched, or pending dispatch.
+    """
+    all_offloaded = all(truck.get("Date offloaded") for truck in trucks) if trucks else False
+
+    all_dispatched_from_borders = True
+    if trucks:
+        for truck in trucks:
+            records = border_records(truck.get("Borders"))
+            if records:
+                if not _has_date(records[-1].get("dispatch")):
+                    all_dispatched_from_borders = False
+                    break
+            elif geo_type.lower() == "cross border": # If shipment is explicitly cross-border but this truck has no border data
+                if not truck.get("Date offloaded"): # and this truck isn't offloaded
+                    all_dispatched_from_borders = False
+                    break
+    else: # No trucks in shipment
+        all_dispatched_from_borders = False
+
+    partial_dispatch = any(
+        any(_has_date(record.get("dispatch")) for record in border_records(truck.get("Borders")))
+        for truck in trucks
+    ) and not all_offloaded and not all_dispatched_from_borders
+
+    if not trucks:
+        return "🔴", "No Truck Data"
+    elif all_offloaded:
+        return "🟢", "All Offloaded"
+    elif all_dispatched_from_borders:
+        return "🟡", "Dispatched, Pending Offload"
+    elif partial_dispatch:
+        return "🟠", "Partially Dispatched"
+    else:
+        return "🔴", "Pending Dispatch"
+
+
+def is_open(trucks):
+    """A shipment is open while any of its trucks that is not cancelled has no offload date."""
+    return any(not truck.get("Date offloaded") for truck in trucks if not truck.get("Cancel"))
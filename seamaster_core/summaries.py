@@ -0,0 +1,126 @@
+import pandas as pd
+
+from .borders import arrival_column, border_records, dispatch_column
+from .dates import parse_date
+from .demurrage import truck_demurrage_cost
+
+# --- Dashboard summaries ---
+# The numbers the dashboard shows (the KPI row, the per-File-Number headers and each
+# shipment's truck table), computed from shipments priced by compute_demurrage. The
+# Streamlit views format them for display and the JSON API returns them as they are.
+
+TRUCK_DATE_COLUMNS = ["Arrived at Loading point", "Loaded Date", "Dispatch date", "Date Arrived", "Date offloaded", "ETA"]
+
+
+def kpi_summary(shipments, totals):
+    """The KPI row for filtered `shipments` (a DataFrame) and the totals compute_demurrage returned for them."""
+    if shipments.empty or totals is None:
+        return {"shipments": 0, "trucks": 0, "total_demurrage_cost": 0.0, "avg_days_on_site": None}
+    counted = totals["truck_count_for_avg_days"]
+    return {
+        "shipments": int(shipments["Unique ID"].nunique()) if "Unique ID" in shipments.columns else 0,
+        "trucks": totals["total_trucks"],
+        "total_demurrage_cost": float(totals["total_demurrage_costs"]),
+        "avg_days_on_site": totals["total_days_on_site"] / counted if counted else None,
+    }
+
+
+def file_summaries(priced_shipments):
+    """One summary per File Number (in File Number order) of shipments priced by compute_demurrage."""
+    by_file = {}
+    for shipment in priced_shipments:
+        file_number = shipment.get("File Number")
+        if file_number is None or not pd.notna(file_number):
+            continue
+        by_file.setdefault(file_number, []).append(shipment)
+
+    summaries = []
+    for file_number in sorted(by_file):
+        shipments = by_file[file_number]
+        trucks = [truck for shipment in shipments for truck in shipment.get("Trucks") or []]
+        summaries.append({
+            "file_number": file_number,
+            "shipments": len({s.get("Unique ID") for s in shipments}),
+            "trucks": len(trucks),
+            "cancelled_trucks": sum(1 for truck in trucks if truck.get("Cancel")),
+            "demurrage_cost": float(sum(truck_demurrage_cost(truck) for truck in trucks)),
+            "shipment_ids": [s.get("Unique ID") for s in shipments],
+        })
+    return summaries
+
+
+def truck_table_columns(trucks):
+    """Returns the ordered border names and the display columns shared by a shipment's truck tables."""
+    trailer_keys = set()
+    for truck in trucks:
+        if isinstance(truck.get("Trailers"), dict):
+            trailer_keys.update(truck["Trailers"].keys())
+
+    border_names = []
+    seen = set()
+    for truck in trucks:
+        for record in border_records(truck.get("Borders")):
+            if record["name"] not in seen:
+                border_names.append(record["name"])
+                seen.add(record["name"])
+
+    border_columns = []
+    for border_name in border_names:
+        border_columns.append(arrival_column(border_name))
+        border_columns.append(dispatch_column(border_name))
+        border_columns.append(f"Billable days at {border_name}")
+        border_columns.append(f"Demurrage cost at {border_name}")
+
+    # Trailer columns go between the truck and the driver details
+    columns = (
+        ["Truck Number", "Horse Number"]
+        + list(trailer_keys)
+        + [
+            "Driver Name", "Passport NO.", "Contact NO.",
+            "Tonnage", "ETA", "Status", "Cargo Description",
+            "Current Location", "Load Location", "Destination",
+            "Arrived at Loading point", "Loaded Date", "Dispatch date",
+            "Billable days at Loading Point", "Demurrage cost at Loading Point",
+        ]
+        + border_columns
+        + [
+            "Date Arrived", "Date offloaded",
+            "Total Billable days at Borders", "Total Demurrage cost at Border",
+            "Cancel", "Flag", "Comment",
+        ]
+    )
+    return border_names, list(dict.fromkeys(columns))
+
+
+def _date_value(value):
+    parsed = parse_date(value)
+    return parsed if parsed is not None and pd.notna(parsed) else None
+
+
+def truck_rows(trucks, columns):
+    """
+    The truck table of priced trucks as one dict per truck over `columns`: dates as datetimes
+    (None when blank or unreadable), days and costs as numbers, missing values as None.
+    """
+    rows = []
+    for truck in trucks:
+        trailers = truck.get("Trailers") if isinstance(truck.get("Trailers"), dict) else {}
+        border_dates = {}
+        for record in border_records(truck.get("Borders")):
+            border_dates[arrival_column(record["name"])] = record.get("arrival")
+            border_dates[dispatch_column(record["name"])] = record.get("dispatch")
+
+        row = {}
+        for column in columns:
+            if column in ("Cancel", "Flag"):
+                row[column] = bool(truck.get(column, False))
+            elif column in trailers:
+                row[column] = trailers[column]
+            elif column in border_dates:
+                row[column] = _date_value(border_dates[column])
+            elif column in TRUCK_DATE_COLUMNS:
+                row[column] = _date_value(truck.get(column))
+            else:
+                row[column] = truck.get(column)
+        rows.append(row)
+    return rows
@@ -0,0 +1,129 @@
+from datetime import datetime
+
+# --- Truck explorer queries ---
+# Every truck of every shipment, filtered, sorted and paged inside MongoDB: the pipeline
+# $unwinds "Trucks", prices each truck with the demurrage rules (whole calendar days of each
+# stay beyond its free days, open stays up to `now`, times the rate) and returns one page plus
+# the match count, so the app only ever receives the trucks it shows. Status and Truck
+# Number filters are matched against the multikey indexes before the $unwind.
+#
+# The pipeline reads stored BSON dates and border records, as written since the
+# normalize-dates and migrate-borders commands; a date still stored as a string or a number
+# counts as missing here.
+
+EPOCH = datetime(1970, 1, 1)
+DAY_MS = 24 * 60 * 60 * 1000
+# BSON orders every date after numbers, strings and documents, so only dates are >= this
+_EARLIEST_DATE = datetime(1900, 1, 1)
+
+# Sort key -> (label, [(field, direction)])
+SORT_OPTIONS = {
+    "cost_desc": ("Demurrage cost, highest first", [("Demurrage cost", -1)]),
+    "cost_asc": ("Demurrage cost, lowest first", [("Demurrage cost", 1)]),
+    "days_desc": ("Billable days, most first", [("Billable days", -1)]),
+    "truck_number": ("Truck Number", [("Trucks.Truck Number", 1)]),
+    "submitted_desc": ("Date Submitted, newest first", [("Date Submitted", -1)]),
+}
+# Shipment fields returned with each truck
+SHIPMENT_FIELDS = ["Unique ID", "File Number", "Client", "Transporter", "Shipment Type", "Date Submitted", "Demurrage Rate"]
+
+
+def create_truck_indexes(collection):
+    """The multikey indexes the truck explorer filters on (creating an existing index is a no-op)."""
+    collection.create_index("Trucks.Status")
+    collection.create_index("Trucks.Truck Number")
+
+
+def truck_statuses(collection):
+    """The distinct truck Status values, read from the Trucks.Status index."""
+    return sorted(status for status in collection.distinct("Trucks.Status") if status not in (None, ""))
+
+
+def _is_date(expression):
+    return {"$gte": [expression, _EARLIEST_DATE]}
+
+
+def _epoch_day(expression):
+    return {"$floor": {"$divide": [{"$subtract": [expression, EPOCH]}, DAY_MS]}}
+
+
+def _stay_days(arrival, dispatch, free_days, now):
+    """billable_days() as an expression: 0 without an arrival, an open stay counts up to `now`."""
+    end = {"$cond": [_is_date(dispatch), dispatch, now]}
+    days = {"$subtract": [{"$subtract": [_epoch_day(end), _epoch_day(arrival)]}, free_days]}
+    return {"$cond": [_is_date(arrival), {"$max": [0, days]}, 0]}
+
+
+def _free_days(field):
+    return {"$floor": {"$ifNull": [field, 0]}}
+
+
+def truck_pricing_stage(now):
+    """$addFields pricing the unwound truck: "Billable days" over all its stays and "Demurrage cost"."""
+    loading_days = _stay_days(
+        "$Trucks.Arrived at Loading point", "$Trucks.Dispatch date",
+        _free_days("$Trucks.Free Days at Loading Point"), now,
+    )
+    border_days = {"$let": {
+        "vars": {"days": {"$map": {
+            "input": {"$cond": [{"$isArray": "$Trucks.Borders"}, "$Trucks.Borders", []]},
+            "as": "border",
+            "in": _stay_days("$$border.arrival", "$$border.dispatch", _free_days("$Trucks.Free Days at Border"), now),
+        }}},
+        "in": {"$sum": "$$days"},
+    }}
+    rate = {"$ifNull": ["$Trucks.Demurrage Rate", {"$ifNull": ["$Demurrage Rate", 0]}]}
+    return [
+        {"$addFields": {"Billable days": {"$add": [loading_days, border_days]}}},
+        {"$addFields": {"Demurrage cost": {"$multiply": ["$Billable days", rate]}}},
+    ]
+
+
+def truck_page_pipeline(statuses=(), truck_number=None, include_cancelled=False, sort="cost_desc",
+                        skip=0, limit=20, now=None):
+    """The aggregation returning [{"total": [{"trucks": n}], "page": [truck rows]}] for one page."""
+    now = now or datetime.now()
+    truck_match = {}
+    if statuses:
+        truck_match["Trucks.Status"] = {"$in": list(statuses)}
+    if truck_number not in (None, ""):
+        # Stored as a number by Generate ID, possibly as text by older imports
+        candidates = [truck_number, str(truck_number)]
+        if str(truck_number).isdigit():
+            candidates.append(int(truck_number))
+        truck_match["Trucks.Truck Number"] = {"$in": list(dict.fromkeys(candidates))}
+
+    pipeline = []
+    if truck_match:
+        pipeline.append({"$match": dict(truck_match)})  # Uses the multikey indexes
+    pipeline.append({"$unwind": {"path": "$Trucks", "includeArrayIndex": "Truck Position"}})
+    if not include_cancelled:
+        truck_match["Trucks.Cancel"] = {"$ne": True}
+    if truck_match:
+        pipeline.append({"$match": truck_match})  # Now per truck
+    pipeline.append({"$project": {**{field: 1 for field in SHIPMENT_FIELDS}, "Trucks": 1, "Truck Position": 1}})
+    pipeline.extend(truck_pricing_stage(now))
+
+    order = dict(SORT_OPTIONS[sort][1])
+    order.update({"_id": 1, "Truck Position": 1})  # A stable order across pages
+    pipeline.append({"$sort": order})
+    pipeline.append({"$facet": {
+        "total": [{"$count": "trucks"}],
+        "page": [{"$skip": int(skip)}, {"$limit": int(limit)}],
+    }})
+    return pipeline
+
+
+def truck_page(collection, statuses=(), truck_number=None, include_cancelled=False, sort="cost_desc",
+               page=1, page_size=20, now=None):
+    """
+    One page of trucks across all shipments: (total matching trucks, rows). Each row holds the
+    shipment fields, the truck under "Trucks", its "Truck Position" and its pipeline-priced
+    "Billable days" and "Demurrage cost".
+    """
+    pipeline = truck_page_pipeline(statuses, truck_number, include_cancelled, sort,
+                                   (max(1, page) - 1) * page_size, page_size, now)
+    result = next(iter(collection.aggregate(pipeline, allowDiskUse=True)), None) or {}
+    total = result.get("total") or [{"trucks": 0}]
+    return total[0]["trucks"], result.get("page", [])
+
@@ -0,0 +1,163 @@
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from .dates import parse_date
+from .normalize import normalize_dates
+
+# --- Shipment versions ---
+# The shipments collection holds one document per Unique ID, its current version, numbered by
+# a "Version" field; a unique index on "Unique ID" keeps it that way, so current-state reads
+# are plain (indexed) queries. Superseded versions move to "<collection>_history", one
+# document per (Unique ID, Version), and are only read when someone asks for the history.
+#
+# Updates work without transactions (a standalone server has none): the current version is
+# first copied to the history under a deterministic _id, then replaced only if its Version is
+# still the one that was read. A concurrent update makes the replace match nothing and raises
+# VersionConflict; the history copy it left is a real past version either way.
+
+VERSION_FIELD = "Version"
+
+
+class VersionConflict(Exception):
+    """The shipment was updated by someone else since it was read."""
+
+
+def history_collection(collection):
+    return collection.database[f"{collection.name}_history"]
+
+
+def _history_id(unique_id, version):
+    return f"{unique_id}:{version}"
+
+
+def create_version_indexes(collection):
+    """
+    The unique index on "Unique ID" and the history's (Unique ID, Version) index; both calls
+    are no-ops once the indexes exist. The unique index cannot be built while a Unique ID
+    still has several documents (raising OperationFailure): run version-shipments first.
+    """
+    history_collection(collection).create_index([("Unique ID", 1), (VERSION_FIELD, -1)])
+    collection.create_index("Unique ID", unique=True, sparse=True)
+
+
+def _archive(history, document, version):
+    from pymongo.errors import DuplicateKeyError
+
+    archived = {k: v for k, v in document.items() if k != "_id"}
+    archived.update({"_id": _history_id(document["Unique ID"], version), VERSION_FIELD: version,
+                     "Shipment _id": document.get("_id"), "Superseded At": datetime.now(timezone.utc)})
+    try:
+        history.insert_one(archived)
+    except DuplicateKeyError:
+        pass  # Archived by an earlier, interrupted attempt
+
+
+def insert_shipment(collection, shipment):
+    """
+    Inserts a new shipment as version 1 (its dates normalized). Returns the stored document.
+    The insert is idempotent on the Unique ID: saving the same shipment again (a retried or
+    double-submitted save) returns the document already stored instead of adding another.
+    """
+    from pymongo.errors import DuplicateKeyError
+
+    changes, invalid = normalize_dates(shipment)
+    if invalid:
+        raise ValueError(f"These fields do not hold valid dates: {', '.join(invalid)}")
+    document = {**shipment, **changes, VERSION_FIELD: 1}
+    unique_id = document["Unique ID"]
+    try:
+        result = collection.update_one(
+            {"Unique ID": unique_id},
+            {"$setOnInsert": {k: v for k, v in document.items() if k != "Unique ID"}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        result = None  # A concurrent save of the same Unique ID won the unique index
+    if result is None or result.upserted_id is None:
+        return collection.find_one({"Unique ID": unique_id})
+    return {**document, "_id": result.upserted_id}
+
+
+def update_shipment(collection, unique_id, changes, expected_version=None):
+    """
+    Applies `changes` (top-level fields) to the current version of a shipment as a new version,
+    keeping the previous one in the history. Pass the Version the edit was based on as
+    `expected_version` to refuse overwriting a newer one. Returns the new current document.
+    """
+    current = collection.find_one({"Unique ID": unique_id})
+    if current is None:
+        raise KeyError(unique_id)
+    version = current.get(VERSION_FIELD) or 1
+    if expected_version is not None and version != expected_version:
+        raise VersionConflict(f"{unique_id} is at version {version}, not {expected_version}")
+
+    updated = {**current, **changes}
+    date_changes, invalid = normalize_dates(updated)
+    if invalid:
+        raise ValueError(f"These fields do not hold valid dates: {', '.join(invalid)}")
+    updated.update(date_changes)
+    updated[VERSION_FIELD] = version + 1
+
+    _archive(history_collection(collection), current, version)
+    result = collection.replace_one({"_id": current["_id"], VERSION_FIELD: current.get(VERSION_FIELD)}, updated)
+    if result.matched_count == 0:
+        raise VersionConflict(f"{unique_id} was updated by someone else")
+    return updated
+
+
+def shipment_history(collection, unique_id):
+    """The superseded versions of a shipment, newest first."""
+    return list(history_collection(collection).find({"Unique ID": unique_id}).sort(VERSION_FIELD, -1))
+
+
+def _submitted_order(document):
+    """Oldest submission first (undated documents before dated ones), then insertion order."""
+    submitted = parse_date(document.get("Date Submitted"))
+    dated = submitted is not None and pd.notna(submitted)
+    return dated, submitted if dated else datetime.min, document.get(VERSION_FIELD) or 0, str(document["_id"])
+
+
+def version_collection(collection, dry_run=False):
+    """
+    One-off move to versioned documents: for each Unique ID with several documents, the most
+    recently submitted one stays as the current version and the others move to the history,
+    numbered oldest first. Every current document gets a Version, and the indexes are created.
+    Safe to run again after an interruption. Returns counts.
+    """
+    from collections import defaultdict
+
+    by_id = defaultdict(list)
+    for document in collection.find({}, {"Unique ID": 1, "Date Submitted": 1, VERSION_FIELD: 1}):
+        by_id[document.get("Unique ID")].append(document)
+
+    history = history_collection(collection)
+    counts = {"shipments": 0, "archived": 0, "numbered": 0, "without_id": len(by_id.pop(None, []))}
+    for unique_id, documents in by_id.items():
+        counts["shipments"] += 1
+        documents.sort(key=_submitted_order)
+        *older, current = documents
+        # Versions already in the history keep their numbers; a document an interrupted run
+        # archived but did not delete yet is only deleted
+        archived = 0
+        already = set()
+        for entry in history.find({"Unique ID": unique_id}, {"Shipment _id": 1}):
+            archived += 1
+            already.add(entry.get("Shipment _id"))
+        for stub in older:
+            if stub["_id"] not in already:
+                archived += 1
+                counts["archived"] += 1
+                if not dry_run:
+                    _archive(history, collection.find_one({"_id": stub["_id"]}), archived)
+            if not dry_run:
+                collection.delete_one({"_id": stub["_id"]})
+        version = archived + 1
+        if current.get(VERSION_FIELD) != version:
+            counts["numbered"] += 1
+            if not dry_run:
+                collection.update_one({"_id": current["_id"]}, {"$set": {VERSION_FIELD: version}})
+
+    if not dry_run:
+        create_version_indexes(collection)
+    return counts
@@ -0,0 +1,196 @@
+import pandas as pd
+
+from .borders import arrival_column, border_records, dispatch_column
+from .dates import parse_date
+from .demurrage import LOADING_POINT, truck_rate
+
+# --- Demurrage workbook ---
+# The File Number download as an .xlsx sheet finance can work in: one row per truck with its
+# dates, free days and rate as typed cells, and every billable-days and cost cell as a
+# formula over them, so changing a date or a rate reprices the truck in Excel. Formulas count
+# open stays up to the workbook name `AsOf`: =TODAY(), or the as-of date the dashboard
+# showed, in which case later arrivals and dispatches are ignored as they are on screen.
+# Each formula also carries the value the dashboard computed, for readers that do not
+# recalculate. The sheet is written row by row in one pass (xlsxwriter's constant_memory
+# mode) with one shared format per kind of cell.
+
+SHIPMENT_COLUMNS = ["File Number", "Shipment ID", "Shipment Type", "Client", "Transporter"]
+TRUCK_COLUMNS = ["Truck Number", "Horse Number"]  # The trailers follow
+LATER_DATE_COLUMNS = ["Loaded Date", "ETA", "Date Arrived", "Date offloaded"]
+FREE_DAYS_AT_LOADING_POINT = "Free Days at Loading Point"
+FREE_DAYS_AT_BORDER = "Free Days at Border"
+
+
+def _excel_date(value):
+    """A stored date as a naive datetime for a date cell, or None when blank or unreadable."""
+    parsed = parse_date(value)
+    if parsed is None or not pd.notna(parsed):
+        return None
+    # The date's own wall-clock time, not UTC: billable_days counts each date's local calendar day
+    if isinstance(parsed, pd.Timestamp):
+        return (parsed.tz_localize(None) if parsed.tzinfo is not None else parsed).to_pydatetime()
+    return parsed.replace(tzinfo=None)
+
+
+def _number(value):
+    try:
+        return float(value) if value is not None and pd.notna(value) else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _layout(shipments):
+    """
+    The sheet's columns as [(header, kind)], the trailer names and the stays as
+    [(location, arrival column, dispatch column, free days column)] in route order.
+    """
+    trailers, borders = {}, {}
+    for shipment in shipments:
+        for truck in shipment.get("Trucks") or []:
+            if isinstance(truck.get("Trailers"), dict):
+                trailers.update(dict.fromkeys(truck["Trailers"]))
+            borders.update(dict.fromkeys(record["name"] for record in border_records(truck.get("Borders"))))
+    stays = [(LOADING_POINT, "Arrived at Loading point", "Dispatch date", FREE_DAYS_AT_LOADING_POINT)]
+    stays += [(name, arrival_column(name), dispatch_column(name), FREE_DAYS_AT_BORDER) for name in borders]
+
+    columns = [(name, "text") for name in SHIPMENT_COLUMNS] + [("Date Submitted", "date")]
+    columns += [(name, "text") for name in TRUCK_COLUMNS + list(trailers)]
+    columns += [("Driver Name", "text"), ("Passport NO.", "text"), ("Status", "text"), ("Cancel", "bool"),
+                ("Demurrage Rate", "money"), (FREE_DAYS_AT_LOADING_POINT, "int"), (FREE_DAYS_AT_BORDER, "int")]
+    for location, arrival, dispatch, _ in stays:
+        columns += [(arrival, "date"), (dispatch, "date"),
+                    (f"Billable days at {location}", "days"), (f"Demurrage cost at {location}", "cost")]
+    columns += [("Total Billable days at Borders", "days"), ("Total Demurrage cost at Border", "cost"),
+                ("Total Demurrage cost", "cost")]
+    columns += [(name, "date") for name in LATER_DATE_COLUMNS]
+    return columns, list(trailers), stays
+
+
+def _billable_days_formula(arrival, dispatch, free_days, clip):
+    """billable_days() over three cells: 0 without an arrival, an open stay counts up to AsOf."""
+    end = f"INT(IF(ISNUMBER({dispatch}),{dispatch},AsOf))"
+    if clip:
+        # As it stood on AsOf: a later arrival does not count, a later dispatch leaves the stay open
+        return f"=IF(AND(ISNUMBER({arrival}),INT({arrival})<=AsOf),MAX(0,MIN({end},AsOf)-INT({arrival})-{free_days}),0)"
+    return f"=IF(ISNUMBER({arrival}),MAX(0,{end}-INT({arrival})-{free_days}),0)"
+
+
+def write_demurrage_workbook(output, shipments, as_of=None, sheet_name="Trucks"):
+    """
+    Writes the trucks of `shipments` (priced by compute_demurrage) to an .xlsx workbook at
+    `output` (a path or a binary file object). `as_of` (a date) prices as of that day instead
+    of today. Returns the number of truck rows.
+    """
+    import xlsxwriter  # Loaded on first use, like the PDF library
+    from xlsxwriter.utility import xl_col_to_name
+
+    shipments = list(shipments)
+    columns, trailers, stays = _layout(shipments)
+    index = {header: i for i, (header, _) in enumerate(columns)}
+    letters = {header: xl_col_to_name(i) for header, i in index.items()}
+
+    workbook = xlsxwriter.Workbook(output, {"constant_memory": True})
+    if as_of is None:
+        workbook.define_name("AsOf", "=TODAY()")
+    else:
+        workbook.define_name("AsOf", f"=DATE({as_of.year},{as_of.month},{as_of.day})")
+    header_format = workbook.add_format({"bold": True, "bg_color": "#E6E6E6", "border": 1, "text_wrap": True})
+    total_format = workbook.add_format({"bold": True, "num_format": '"R" #,##0.00', "top": 1})
+    formats = {
+        "text": None,
+        "bool": None,
+        "date": workbook.add_format({"num_format": "yyyy-mm-dd"}),
+        "int": workbook.add_format({"num_format": "0"}),
+        "days": workbook.add_format({"num_format": "0"}),
+        "money": workbook.add_format({"num_format": "#,##0.00"}),
+        "cost": workbook.add_format({"num_format": '"R" #,##0.00'}),
+    }
+    sheet = workbook.add_worksheet(sheet_name)
+    for i, (_, kind) in enumerate(columns):
+        sheet.set_column(i, i, 16 if kind == "text" else 12)
+    sheet.freeze_panes(1, len(SHIPMENT_COLUMNS) + 1 + len(TRUCK_COLUMNS))
+
+    # Rows are streamed in order: the header, one row per truck, then the totals
+    sheet.set_row(0, 30)
+    for i, (header, _) in enumerate(columns):
+        sheet.write_string(0, i, header, header_format)
+
+    def write_value(row, header, value):
+        if value is None or (isinstance(value, float) and value != value) or value == "":
+            return
+        if isinstance(value, bool):
+            sheet.write_boolean(row, index[header], value)
+        elif isinstance(value, (int, float)):
+            sheet.write_number(row, index[header], value)
+        else:
+            sheet.write_string(row, index[header], str(value))
+
+    def write_date(row, header, value):
+        value = _excel_date(value)
+        if value is not None:
+            sheet.write_datetime(row, index[header], value, formats["date"])
+
+    def write_formula(row, header, formula, value):
+        sheet.write_formula(row, index[header], formula, formats[columns[index[header]][1]], value)
+
+    totals = {header: 0.0 for header, kind in columns if kind == "cost"}
+    clip = as_of is not None
+    row = 0
+    for shipment in shipments:
+        shipment_rate = _number(shipment.get("Demurrage Rate"))
+        for truck in shipment.get("Trucks") or []:
+            row += 1
+            cell = {header: f"{letter}{row + 1}" for header, letter in letters.items()}
+
+            for header, field in zip(SHIPMENT_COLUMNS, ["File Number", "Unique ID", "Shipment Type", "Client", "Transporter"]):
+                write_value(row, header, shipment.get(field))
+            write_date(row, "Date Submitted", shipment.get("Date Submitted"))
+            for header in TRUCK_COLUMNS:
+                write_value(row, header, truck.get(header))
+            truck_trailers = truck.get("Trailers") if isinstance(truck.get("Trailers"), dict) else {}
+            for name in trailers:
+                write_value(row, name, truck_trailers.get(name))
+            write_value(row, "Driver Name", truck.get("Driver Name") or truck.get("Driver"))
+            write_value(row, "Passport NO.", truck.get("Passport NO.") or truck.get("Passport"))
+            write_value(row, "Status", truck.get("Status"))
+            write_value(row, "Cancel", bool(truck.get("Cancel", False)))
+            sheet.write_number(row, index["Demurrage Rate"], truck_rate(truck, shipment_rate), formats["money"])
+            for header in (FREE_DAYS_AT_LOADING_POINT, FREE_DAYS_AT_BORDER):
+                sheet.write_number(row, index[header], int(truck.get(header, 0) or 0), formats["int"])
+
+            write_date(row, "Arrived at Loading point", truck.get("Arrived at Loading point"))
+            write_date(row, "Dispatch date", truck.get("Dispatch date"))
+            for record in border_records(truck.get("Borders")):
+                write_date(row, arrival_column(record["name"]), record.get("arrival"))
+                write_date(row, dispatch_column(record["name"]), record.get("dispatch"))
+
+            # Each formula carries the dashboard's value for readers that do not recalculate
+            for location, arrival, dispatch, free_days in stays:
+                days, cost = f"Billable days at {location}", f"Demurrage cost at {location}"
+                write_formula(row, days, _billable_days_formula(cell[arrival], cell[dispatch], cell[free_days], clip),
+                              _number(truck.get(days)))
+                write_formula(row, cost, f"={cell[days]}*{cell['Demurrage Rate']}", _number(truck.get(cost)))
+            border_stays = [location for location, *_ in stays[1:]]
+            write_formula(row, "Total Billable days at Borders",
+                          "=" + ("+".join(cell[f"Billable days at {name}"] for name in border_stays) or "0"),
+                          _number(truck.get("Total Billable days at Borders")))
+            write_formula(row, "Total Demurrage cost at Border",
+                          "=" + ("+".join(cell[f"Demurrage cost at {name}"] for name in border_stays) or "0"),
+                          _number(truck.get("Total Demurrage cost at Border")))
+            total = _number(truck.get(f"Demurrage cost at {LOADING_POINT}")) + _number(truck.get("Total Demurrage cost at Border"))
+            write_formula(row, "Total Demurrage cost",
+                          f"={cell['Demurrage cost at ' + LOADING_POINT]}+{cell['Total Demurrage cost at Border']}", total)
+            for header in LATER_DATE_COLUMNS:
+                write_date(row, header, truck.get(header))
+
+            for header in totals:
+                totals[header] += total if header == "Total Demurrage cost" else _number(truck.get(header))
+
+    if row:
+        sheet.write_string(row + 1, 0, "Total", total_format)
+        for header, value in totals.items():
+            letter = letters[header]
+            sheet.write_formula(row + 1, index[header], f"=SUBTOTAL(9,{letter}2:{letter}{row + 1})", total_format, value)
+        sheet.autofilter(0, 0, row, len(columns) - 1)
+    workbook.close()
+    return row
@@ -0,0 +1,160 @@
+import logging
+import threading
+import time
+import weakref
+from datetime import datetime
+
+import pandas as pd
+from data_source import enable_copy_on_write
+
+logger = logging.getLogger(__name__)
+
+# --- Process-wide shipments snapshot ---
+# One read-only DataFrame is shared by every Streamlit session in the server process.
+# A single background thread reloads it on a schedule (and on change-stream events when
+# the deployment supports them) and swaps the new snapshot in with one reference
+# assignment, so readers never take a lock.
+
+enable_copy_on_write()
+
+_stores = weakref.WeakSet()
+
+
+class Snapshot:
+    """
+    An immutable, versioned copy of the shipments data. `read_only` marks a snapshot opened
+    from a saved file rather than loaded from MongoDB.
+    """
+
+    __slots__ = ("df", "version", "loaded_at", "load_seconds", "read_only")
+
+    def __init__(self, df, version, loaded_at, load_seconds, read_only=False):
+        self.df = df
+        self.version = version
+        self.loaded_at = loaded_at
+        self.load_seconds = load_seconds
+        self.read_only = read_only
+
+
+class SnapshotStore:
+    """
+    Holds the current Snapshot and keeps it fresh from a background thread.
+    `loader` is a zero-argument callable returning the shipments DataFrame.
+    """
+
+    def __init__(self, loader, refresh_interval=60, watch_collection=None):
+        self.loader = loader
+        self.refresh_interval = refresh_interval
+        self.watch_collection = watch_collection
+        self.last_error = None
+        self.changes_seen = 0  # change-stream events received so far
+        self._snapshot = Snapshot(pd.DataFrame(), 0, None, 0.0)
+        self._refresh_requested = threading.Event()
+        self._stopped = threading.Event()
+        self._refresh_lock = threading.Lock()
+        self._threads = []
+        self._listeners = []
+        _stores.add(self)
+
+    def start(self):
+        """Loads the first snapshot synchronously, then starts the refresher (and watcher) threads."""
+        self.refresh()
+        refresher = threading.Thread(target=self._refresh_loop, name="snapshot-refresh", daemon=True)
+        refresher.start()
+        self._threads.append(refresher)
+        if self.watch_collection is not None:
+            watcher = threading.Thread(target=self._watch_loop, name="snapshot-watch", daemon=True)
+            watcher.start()
+            self._threads.append(watcher)
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._refresh_requested.set()
+
+    def current(self):
+        """Returns the current Snapshot. Callers must treat its DataFrame as read-only."""
+        return self._snapshot
+
+    def view(self):
+        """
+        Returns a per-session view of the snapshot DataFrame. With Copy-on-Write this shares
+        the snapshot's memory; a session that modifies its view only copies what it changes.
+        """
+        return self._snapshot.df.copy(deep=False)
+
+    def add_listener(self, callback):
+        """
+        Calls `callback(snapshot)` now (if data is loaded) and after every successful refresh,
+        on the refreshing thread. Used to keep derived structures in step with the data.
+        """
+        self._listeners.append(callback)
+        if self._snapshot.version:
+            self._notify(callback, self._snapshot)
+
+    def _notify(self, callback, snapshot):
+        try:
+            callback(snapshot)
+        except Exception as e:
+            logger.warning("Snapshot listener %r failed: %s", callback, e)
+
+    def refresh(self):
+        """Reloads the data and swaps in the new snapshot. The previous one is kept on failure."""
+        with self._refresh_lock:
+            started = time.perf_counter()
+            try:
+                df = self.loader()
+            except Exception as e:
+                self.last_error = e
+                logger.warning("Snapshot refresh failed: %s", e)
+                return False
+            self.last_error = None
+            self._publish(Snapshot(
+                df,
+                self._snapshot.version + 1,
+                datetime.now(),
+                time.perf_counter() - started,
+            ))
+            return True
+
+    def publish(self, snapshot):
+        """Swaps in a snapshot obtained elsewhere (e.g. a saved file) and notifies the listeners."""
+        with self._refresh_lock:
+            self._publish(snapshot)
+        return self
+
+    def _publish(self, snapshot):
+        self._snapshot = snapshot
+        for callback in list(self._listeners):
+            self._notify(callback, snapshot)
+
+    def request_refresh(self):
+        """Wakes the refresher thread so the next snapshot is loaded without waiting for the schedule."""
+        self._refresh_requested.set()
+
+    def _refresh_loop(self):
+        while not self._stopped.is_set():
+            self._refresh_requested.wait(self.refresh_interval)
+            self._refresh_requested.clear()
+            if self._stopped.is_set():
+                break
+            self.refresh()
+
+    def _watch_loop(self):
+        # Change streams need a replica set; on a standalone server (or a stand-in) we
+        # silently fall back to the refresh schedule.
+        try:
+            with self.watch_collection.watch() as stream:
+                for _ in stream:
+                    self.changes_seen += 1
+                    self.request_refresh()
+                    if self._stopped.is_set():
+                        break
+        except Exception as e:
+            logger.info("Change notifications unavailable, using scheduled refresh only: %s", e)
+
+
+def notify_data_changed():
+    """Asks every snapshot store in this process to reload, e.g. after a shipment is saved."""
+    for store in list(_stores):
+        store.request_refresh()
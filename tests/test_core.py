@@ -0,0 +1,163 @@
+from copy import deepcopy
+from datetime import date, datetime
+
+import pandas as pd
+
+from seamaster_core import (
+    DailyRollup,
+    MemoryCache,
+    Stay,
+    accrual_curve,
+    billable_days,
+    compute_demurrage,
+)
+
+# One shipment whose numbers are easy to check by hand, at R 100 a day:
+# - loading point: arrived 1 Jan, dispatched 6 Jan, 2 free days -> bills 4, 5 and 6 Jan (3 days)
+# - Beitbridge: arrived 8 Jan, still open, 1 free day -> bills from 10 Jan on
+
+
+def make_shipment():
+    return {
+        "Unique ID": "SM-1",
+        "File Number": "F-1",
+        "Client": "Acme",
+        "Transporter": "Swift",
+        "Demurrage Rate": 100,
+        "Trucks": [{
+            "Truck Number": 1,
+            "Arrived at Loading point": datetime(2024, 1, 1, 8),
+            "Dispatch date": datetime(2024, 1, 6, 17),
+            "Free Days at Loading Point": 2,
+            "Free Days at Border": 1,
+            "Borders": [{"name": "Beitbridge", "arrival": datetime(2024, 1, 8, 9), "dispatch": None}],
+        }],
+    }
+
+
+def total_cost(shipments, **kwargs):
+    _, totals = compute_demurrage(shipments, **kwargs)
+    return totals["total_demurrage_costs"]
+
+
+# --- billable_days ---
+
+def test_billable_days_closed_stay():
+    stay = Stay("Loading Point", pd.Timestamp("2024-01-01 08:00"), pd.Timestamp("2024-01-06 17:00"), 2)
+    assert billable_days(stay, pd.Timestamp("2024-01-20")) == 3
+    # Without clipping a later dispatch still counts in full
+    assert billable_days(stay, pd.Timestamp("2024-01-04")) == 3
+
+
+def test_billable_days_open_stay_runs_to_now():
+    stay = Stay("Beitbridge", pd.Timestamp("2024-01-08 09:00"), pd.NaT, 1)
+    assert billable_days(stay, pd.Timestamp("2024-01-12 06:00")) == 3
+    assert billable_days(stay, pd.Timestamp("2024-01-09")) == 0
+
+
+def test_billable_days_clip_to_now():
+    stay = Stay("Loading Point", pd.Timestamp("2024-01-01 08:00"), pd.Timestamp("2024-01-06 17:00"), 2)
+    # On 4 Jan the truck has not left yet: 3 days on site, 2 of them free
+    assert billable_days(stay, pd.Timestamp("2024-01-04"), clip_to_now=True) == 1
+    assert billable_days(stay, pd.Timestamp("2024-01-20"), clip_to_now=True) == 3
+    # An arrival after `now` does not count yet
+    assert billable_days(stay, pd.Timestamp("2023-12-31"), clip_to_now=True) == 0
+
+
+def test_billable_days_without_arrival():
+    stay = Stay("Beitbridge", pd.NaT, pd.NaT, 1)
+    assert billable_days(stay, pd.Timestamp("2024-01-12"), clip_to_now=True) == 0
+
+
+# --- compute_demurrage: as_of against now ---
+
+def test_compute_demurrage_now_counts_later_dispatches():
+    # Loading point priced to its dispatch (3 days); the border arrival lies after `now`
+    assert total_cost([make_shipment()], now=datetime(2024, 1, 4)) == 300
+
+
+def test_compute_demurrage_as_of_clips_every_stay():
+    assert total_cost([make_shipment()], as_of=date(2024, 1, 4)) == 100
+    assert total_cost([make_shipment()], as_of=date(2024, 1, 12)) == 600
+    # Once every date is in the past, as_of and now agree
+    assert total_cost([make_shipment()], now=datetime(2024, 1, 12)) == 600
+
+
+# --- accrual_curve ---
+
+def test_accrual_curve_matches_pricing_each_day():
+    second = make_shipment()
+    second["Unique ID"] = "SM-2"
+    second["Demurrage Rate"] = 250
+    second["Trucks"][0]["Borders"][0]["dispatch"] = datetime(2024, 1, 11, 12)
+    shipments = [make_shipment(), second]
+
+    curve = accrual_curve(shipments, start=date(2024, 1, 2), end=date(2024, 1, 15))
+    assert list(curve["day"]) == list(pd.date_range("2024-01-02", "2024-01-15"))
+    for day, accrued in zip(curve["day"], curve["accrued_cost"]):
+        assert accrued == total_cost(shipments, as_of=day.date()), day
+    # 15 Jan: only the first shipment's border stay is still billing
+    assert curve["trucks_billing"].iloc[-1] == 1
+    assert curve["daily_cost"].iloc[-1] == 100
+
+
+# --- DailyRollup ---
+
+def rollup_days(rollup, location):
+    daily = rollup.query(start=date(2024, 1, 1), end=date(2024, 1, 15), today=date(2024, 1, 15))
+    return daily[daily["location"] == location]
+
+
+def test_rollup_sync_after_dispatch_edit():
+    shipment = make_shipment()
+    rollup = DailyRollup()
+    assert rollup.sync([shipment]) == 1
+
+    loading = rollup_days(rollup, "Loading Point")
+    assert list(loading["day"]) == list(pd.date_range("2024-01-04", "2024-01-06"))
+    border = rollup_days(rollup, "Beitbridge")
+    assert list(border["day"]) == list(pd.date_range("2024-01-10", "2024-01-15"))
+    assert border["cost"].sum() == 600
+
+    # Unchanged data is not re-read
+    assert rollup.sync([deepcopy(shipment)]) == 0
+
+    edited = deepcopy(shipment)
+    edited["Trucks"][0]["Borders"][0]["dispatch"] = datetime(2024, 1, 11, 15)
+    assert rollup.sync([edited]) == 1
+    border = rollup_days(rollup, "Beitbridge")
+    assert list(border["day"]) == list(pd.date_range("2024-01-10", "2024-01-11"))
+    assert border["truck_days"].sum() == 2
+    assert border["cost"].sum() == 200
+    assert rollup_days(rollup, "Loading Point")["cost"].sum() == 300
+
+    # A removed shipment takes its rows with it
+    assert rollup.sync([]) == 1
+    assert rollup.query(today=date(2024, 1, 15)).empty
+
+
+# --- MemoryCache ---
+
+def test_memory_cache_evicts_least_recently_used_entry():
+    cache = MemoryCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.put("c", 3)
+    assert "b" not in cache
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_memory_cache_evicts_by_bytes():
+    cache = MemoryCache(max_bytes=10)
+    cache.put("a", b"x" * 4)
+    cache.put("b", b"y" * 4)
+    assert cache.size_bytes() == 8
+    cache.put("c", b"z" * 4)
+    assert "a" not in cache and len(cache) == 2
+    assert cache.size_bytes() == 8
+    # A value over the limit on its own is not kept either
+    cache.put("d", b"w" * 11)
+    assert len(cache) == 0 and cache.size_bytes() == 0
+    assert cache.stats()["evictions"] == 4
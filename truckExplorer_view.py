@@ -0,0 +1,94 @@
+import logging
+import math
+from datetime import datetime
+
+import streamlit as st
+import perf
+from dashboard_view import build_truck_table
+from seamaster_core import format_date_for_display, price_truck, truck_demurrage_cost, truck_table_columns
+from seamaster_core.trucks import SORT_OPTIONS, create_truck_indexes, truck_page, truck_statuses
+
+PAGE_SIZES = [20, 50, 100]
+SHIPMENT_COLUMNS = ["Unique ID", "File Number", "Client", "Transporter", "Date Submitted", "Total Demurrage cost"]
+
+
+@st.cache_resource
+def ensure_truck_indexes(_collection):
+    """Creates the explorer's indexes once per process. A failure (e.g. no index rights) is logged."""
+    try:
+        create_truck_indexes(_collection)
+        return True
+    except Exception as e:
+        logging.getLogger(__name__).warning("Could not create the truck explorer indexes: %s", e)
+        return False
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def get_truck_statuses(_collection):
+    return truck_statuses(_collection)
+
+
+def _first_page():
+    st.session_state["truck_explorer_page"] = 1
+
+
+def build_explorer_table(rows, now):
+    """The page of trucks as the shipment panels show them, with the shipment columns in front."""
+    trucks = [price_truck(row["Trucks"], float(row.get("Demurrage Rate", 0.0) or 0.0), now) for row in rows]
+    border_names, desired_columns = truck_table_columns(trucks)
+    table = build_truck_table(trucks, border_names, desired_columns)
+    table.insert(0, "Unique ID", [row.get("Unique ID") for row in rows])
+    table.insert(1, "File Number", [row.get("File Number") for row in rows])
+    table.insert(2, "Client", [row.get("Client") for row in rows])
+    table.insert(3, "Transporter", [row.get("Transporter") for row in rows])
+    table.insert(4, "Date Submitted", [format_date_for_display(row.get("Date Submitted")) for row in rows])
+    table.insert(5, "Total Demurrage cost", [f"R {truck_demurrage_cost(truck):,.2f}" for truck in trucks])
+    return table, SHIPMENT_COLUMNS + [col for col in desired_columns if col not in SHIPMENT_COLUMNS]
+
+
+@st.fragment
+@perf.fragment("truck_explorer")
+def render_truck_explorer(collection):
+    """Every truck across all shipments, filtered, sorted and paged by MongoDB. A fragment: paging reruns only this view."""
+    st.markdown("## 🚛 Truck Explorer")
+
+    if collection is None:
+        st.info("The truck explorer queries MongoDB directly, so it is not available without a database connection.")
+        return
+    ensure_truck_indexes(collection)
+
+    col1, col2, col3, col4 = st.columns([3, 2, 1, 1])
+    with col1:
+        statuses = st.multiselect("Truck Status", options=get_truck_statuses(collection),
+                                  key="truck_explorer_statuses", on_change=_first_page)
+    with col2:
+        sort = st.selectbox("Sort by", options=list(SORT_OPTIONS), format_func=lambda key: SORT_OPTIONS[key][0],
+                            key="truck_explorer_sort", on_change=_first_page)
+    with col3:
+        truck_number = st.text_input("Truck Number", key="truck_explorer_truck_number", on_change=_first_page).strip()
+    with col4:
+        page_size = st.selectbox("Per page", options=PAGE_SIZES, key="truck_explorer_page_size", on_change=_first_page)
+    include_cancelled = st.checkbox("Include cancelled trucks", key="truck_explorer_cancelled", on_change=_first_page)
+
+    page = st.session_state.get("truck_explorer_page", 1)
+    now = datetime.now()
+    with perf.span("truck_explorer.query") as s:
+        total, rows = truck_page(collection, statuses, truck_number or None, include_cancelled, sort, page, page_size, now)
+        s["rows"] = len(rows)
+
+    if not total:
+        st.info("No trucks match the selected filters.")
+        return
+    pages = math.ceil(total / page_size)
+    if page > pages:
+        # The data shrank under this page: show the last one
+        st.session_state["truck_explorer_page"] = page = pages
+        total, rows = truck_page(collection, statuses, truck_number or None, include_cancelled, sort, page, page_size, now)
+
+    with perf.span("truck_explorer.table", rows=len(rows)):
+        table, column_order = build_explorer_table(rows, now)
+    first = (page - 1) * page_size + 1
+    st.caption(f"Trucks {first:,}–{first + len(rows) - 1:,} of {total:,}")
+    st.dataframe(table, use_container_width=True, hide_index=True, column_order=column_order)
+
+    st.number_input("Page", min_value=1, max_value=pages, key="truck_explorer_page", help=f"{pages:,} pages")
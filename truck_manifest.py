@@ -0,0 +1,169 @@
+from seamaster_core import border_records, format_date_for_display
+
+# --- Truck manifest ---
+# The transport order's table only holds the shipment's scalar fields, so the trucks are
+# listed on manifest pages appended to the PDF: one row per truck that is not cancelled, with
+# a line per trailer and per border stay. Each page is drawn as one Shape, with the cell
+# rectangles in a few batches and each column's text as one block of lines, and rows flow
+# onto a new page with the header repeated. A 1000-truck order takes a fraction of a second,
+# where a textbox per cell took seconds.
+
+# (header, width in points); the border schedule takes the rest of the row
+MANIFEST_COLUMNS = [("Truck Number", 70), ("Horse", 90), ("Trailers", 130),
+                    ("Driver", 130), ("Passport", 90), ("Border schedule", None)]
+
+MARGIN = 36
+FONT_SIZE = 8
+LINE_HEIGHT = 10
+CELL_PADDING = 3
+HEADER_FILL = (0.9, 0.9, 0.9)
+STRIPE_FILL = (0.96, 0.96, 0.96)
+GRID_COLOR = (0.7, 0.7, 0.7)
+
+
+def _text(value):
+    return "" if value is None else str(value).strip()
+
+
+def _first(truck, *fields):
+    for field in fields:
+        value = _text(truck.get(field))
+        if value:
+            return value
+    return ""
+
+
+def _trucks(shipment_data):
+    trucks = shipment_data.get("Trucks")
+    return [truck for truck in trucks if isinstance(truck, dict)] if isinstance(trucks, (list, tuple)) else []
+
+
+def manifest_rows(shipment_data):
+    """
+    The manifest of a shipment: one tuple of cell lines per truck that is not cancelled, in
+    MANIFEST_COLUMNS order, every value already formatted as text.
+    """
+    rows = []
+    for truck in _trucks(shipment_data):
+        if truck.get("Cancel"):
+            continue
+        trailers = truck.get("Trailers") if isinstance(truck.get("Trailers"), dict) else {}
+        schedule = [
+            f"{record['name']}: {format_date_for_display(record.get('arrival')) or '-'}"
+            f" to {format_date_for_display(record.get('dispatch')) or '-'}"
+            for record in border_records(truck.get("Borders"))
+        ]
+        rows.append((
+            (_text(truck.get("Truck Number")),),
+            (_first(truck, "Horse Number"),),
+            tuple(f"{name}: {_text(number) or '-'}" for name, number in trailers.items()),
+            (_first(truck, "Driver Name", "Driver"),),
+            (_first(truck, "Passport NO.", "Passport"),),
+            tuple(schedule),
+        ))
+    return rows
+
+
+def _paginate(row_lines, available_lines):
+    """Splits row indexes into pages whose rows fit in `available_lines` lines."""
+    pages, page, used = [], [], 0
+    for index, lines in enumerate(row_lines):
+        if page and used + lines > available_lines:
+            pages.append(page)
+            page, used = [], 0
+        page.append(index)
+        used += lines
+    if page:
+        pages.append(page)
+    return pages
+
+
+def _fitter(font):
+    """Returns fit(text, width): the text, cut with "..." to fit a cell. Widths are summed from cached glyph advances."""
+    advances = {}
+    widest = FONT_SIZE * 1.02  # No Helvetica glyph is wider than this
+
+    def length(text):
+        total = 0.0
+        for char in text:
+            advance = advances.get(char)
+            if advance is None:
+                advance = advances[char] = font.glyph_advance(ord(char)) * FONT_SIZE
+            total += advance
+        return total
+
+    def fit(text, cell_width):
+        room = cell_width - 2 * CELL_PADDING
+        if len(text) * widest <= room or length(text) <= room:
+            return text
+        while text and length(text + "...") > room:
+            text = text[:-1]
+        return text + "..."
+
+    return fit
+
+
+def append_truck_manifest(doc, shipment_data, title="Truck manifest"):
+    """Appends landscape manifest pages listing the shipment's trucks to `doc`. Returns the pages added."""
+    import fitz  # PyMuPDF, loaded on first use to keep app start-up fast
+
+    rows = manifest_rows(shipment_data)
+    if not rows:
+        return 0
+
+    template = doc[0].rect if doc.page_count else fitz.paper_rect("a4")
+    width, height = max(template.width, template.height), min(template.width, template.height)
+    fixed = sum(w for _, w in MANIFEST_COLUMNS if w is not None)
+    widths = [w if w is not None else width - 2 * MARGIN - fixed for _, w in MANIFEST_COLUMNS]
+    lefts = [MARGIN + sum(widths[:i]) for i in range(len(widths))]
+    fit = _fitter(fitz.Font("helv"))
+
+    # Every row is a whole number of lines, its cell lines plus a blank one split above and
+    # below, so all the text of a column on a page is one evenly spaced block of lines
+    row_lines = [max(1, *(len(cell) for cell in row)) + 1 for row in rows]
+    top = MARGIN + 3 * LINE_HEIGHT
+    pages = _paginate(row_lines, int((height - top - MARGIN) // LINE_HEIGHT) - 2)  # Less the header row
+    cancelled = sum(1 for truck in _trucks(shipment_data) if truck.get("Cancel"))
+    heading = f"{title} - {shipment_data.get('File Number') or ''} - {shipment_data.get('Unique ID') or ''}"
+    summary = f"{len(rows)} truck(s)" + (f", {cancelled} cancelled truck(s) not listed" if cancelled else "")
+    text = {"fontsize": FONT_SIZE, "lineheight": LINE_HEIGHT / FONT_SIZE}
+    first_baseline = LINE_HEIGHT / 2 + FONT_SIZE - 1  # Half a blank line, then the cap height
+
+    for page_number, indexes in enumerate(pages, start=1):
+        page = doc.new_page(width=width, height=height)
+        shape = page.new_shape()
+        shape.insert_text((MARGIN, MARGIN + LINE_HEIGHT), heading, fontsize=FONT_SIZE + 2, fontname="hebo")
+        shape.insert_text((MARGIN, MARGIN + 2 * LINE_HEIGHT + 2), f"{summary} - page {page_number} of {len(pages)}",
+                          fontsize=FONT_SIZE)
+
+        # Header row, then the striped rows: each fill is one batch of rectangles
+        header_bottom = top + 2 * LINE_HEIGHT
+        shape.draw_rect(fitz.Rect(MARGIN, top, width - MARGIN, header_bottom))
+        shape.finish(color=GRID_COLOR, fill=HEADER_FILL, width=0.5)
+        for left, (label, _) in zip(lefts, MANIFEST_COLUMNS):
+            shape.insert_text((left + CELL_PADDING, top + first_baseline), label, fontname="hebo", **text)
+
+        row_tops, y = [], header_bottom
+        for index in indexes:
+            row_tops.append(y)
+            y += row_lines[index] * LINE_HEIGHT
+        for stripe in (0, 1):
+            for i, index in enumerate(indexes):
+                if i % 2 == stripe:
+                    shape.draw_rect(fitz.Rect(MARGIN, row_tops[i], width - MARGIN, row_tops[i] + row_lines[index] * LINE_HEIGHT))
+            shape.finish(color=GRID_COLOR, fill=STRIPE_FILL if stripe == 0 else None, width=0.5)
+        for left in lefts[1:]:
+            shape.draw_line((left, top), (left, y))
+        shape.finish(color=GRID_COLOR, width=0.5)
+
+        # One block of text per column
+        for column, (left, cell_width) in enumerate(zip(lefts, widths)):
+            lines = []
+            for index in indexes:
+                cell = rows[index][column]
+                lines.extend(fit(line, cell_width) for line in cell)
+                lines.extend([""] * (row_lines[index] - len(cell)))
+            shape.insert_text((left + CELL_PADDING, header_bottom + first_baseline), lines, **text)
+
+        shape.commit()
+    return len(pages)